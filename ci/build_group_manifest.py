@@ -11,12 +11,16 @@ def build_manifest(
     spider_names: list[str],
     stats_dir: Path,
     previous_manifest: dict | None,
+    changes: dict | None = None,
 ) -> dict:
     """Build a group manifest by merging current run results with previous manifest.
 
     Spiders that succeeded (non-zero item_scraped_count) get fresh entries.
     Spiders that failed or produced zero items keep their previous entry.
     Spiders no longer in the group are dropped.
+
+    If `changes` (the output of diff_spider_output.py) is given, fresh
+    entries link to the features changed since the spider's previous entry.
     """
     now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
     previous_spiders = (previous_manifest or {}).get("spiders", {})
@@ -45,6 +49,9 @@ def build_manifest(
                     "error_count": error_count,
                     "elapsed_time": elapsed_time,
                 }
+                if spider_changes := (changes or {}).get("spiders", {}).get(spider_name):
+                    spiders[spider_name]["changes_url"] = f"{run_url_prefix}/changes/{spider_name}.ndgeojson"
+                    spiders[spider_name]["changes"] = spider_changes
                 continue
 
         if spider_name in previous_spiders:
@@ -67,6 +74,7 @@ def main():
     parser.add_argument("--spider-list", required=True, help="File with spider names, one per line")
     parser.add_argument("--stats-dir", required=True, help="Directory containing per-spider stats JSON files")
     parser.add_argument("--previous-manifest", help="Path to previous manifest JSON file (optional)")
+    parser.add_argument("--changes", help="Path to change statistics written by diff_spider_output.py (optional)")
     parser.add_argument("--output", required=True, help="Output manifest file path")
 
     args = parser.parse_args()
@@ -78,6 +86,10 @@ def main():
     if args.previous_manifest and Path(args.previous_manifest).exists():
         previous_manifest = json.loads(Path(args.previous_manifest).read_text())
 
+    changes = None
+    if args.changes and Path(args.changes).exists():
+        changes = json.loads(Path(args.changes).read_text())
+
     manifest = build_manifest(
         group=args.group,
         run_id=args.run_id,
@@ -85,6 +97,7 @@ def main():
         spider_names=spider_names,
         stats_dir=stats_dir,
         previous_manifest=previous_manifest,
+        changes=changes,
     )
 
     Path(args.output).write_text(json.dumps(manifest, indent=2))
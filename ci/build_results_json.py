@@ -0,0 +1,125 @@
+import argparse
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_SECONDS_PREFIX = "atp/profile/pipeline_seconds/"
+
+
+def spider_filenames(spider_names: list[str] | None = None) -> dict[str, str]:
+    """
+    Map spider names to the path of their source file relative to the
+    current directory, for all spiders or for the given spiders, as printed
+    by "scrapy spider_filename".
+    """
+    from scrapy.spiderloader import SpiderLoader
+    from scrapy.utils.project import get_project_settings
+
+    spider_loader = SpiderLoader.from_settings(get_project_settings())
+    filenames = {}
+    for spider_name in spider_names if spider_names is not None else spider_loader.list():
+        try:
+            spidercls = spider_loader.load(spider_name)
+        except KeyError:
+            logger.warning(f"Spider not found: {spider_name}")
+            continue
+        filenames[spider_name] = os.path.relpath(sys.modules[spidercls.__module__].__file__.replace(".pyc", ".py"))
+    return filenames
+
+
+def read_stats(stats_file: Path) -> dict | None:
+    try:
+        return json.loads(stats_file.read_text())
+    except FileNotFoundError:
+        logger.warning(f"Couldn't find {stats_file}")
+    except (OSError, ValueError) as e:
+        logger.warning(f"Couldn't read {stats_file}: {e}")
+    return None
+
+
+def count_lines(path: Path) -> int:
+    lines = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            lines += chunk.count(b"\n")
+    return lines
+
+
+def build_results(filenames: dict[str, str], stats_dir: Path, workers: int = 16) -> dict:
+    """
+    Build the summary of a run from the stats file of each spider. Spiders
+    without a stats file are omitted from the results.
+    """
+    with ThreadPoolExecutor(workers) as executor:
+        all_stats = dict(zip(filenames, executor.map(read_stats, (stats_dir / f"{s}.json" for s in filenames))))
+
+    results = []
+    pipeline_seconds = {}
+    for spider_name, filename in filenames.items():
+        if (stats := all_stats[spider_name]) is None:
+            continue
+        results.append(
+            {
+                "spider": spider_name,
+                "filename": filename,
+                "errors": stats.get("log_count/ERROR") or 0,
+                "features": stats.get("item_scraped_count") or 0,
+                "elapsed_time": stats.get("elapsed_time_seconds") or 0,
+                "peak_rss_bytes": (stats.get("atp/profile/peak_rss_bytes") or 0)
+                + (stats.get("atp/profile/peak_children_rss_bytes") or 0),
+                "cpu_time": (stats.get("atp/profile/cpu_user_seconds") or 0)
+                + (stats.get("atp/profile/cpu_system_seconds") or 0),
+            }
+        )
+        for key, value in stats.items():
+            if key.startswith(PIPELINE_SECONDS_PREFIX):
+                name = key.removeprefix(PIPELINE_SECONDS_PREFIX)
+                pipeline_seconds[name] = pipeline_seconds.get(name, 0) + value
+
+    return {
+        "count": len(filenames),
+        "results": results,
+        "pipeline_seconds": dict(sorted(pipeline_seconds.items())),
+        "peak_rss_bytes": max((result["peak_rss_bytes"] for result in results), default=0),
+        "cpu_time": sum(result["cpu_time"] for result in results),
+    }
+
+
+def count_output_lines(output_dir: Path, workers: int = 16) -> int:
+    """The total number of lines of all GeoJSON files in `output_dir`."""
+    with ThreadPoolExecutor(workers) as executor:
+        return sum(executor.map(count_lines, sorted(output_dir.glob("*.geojson"))))
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+    parser = argparse.ArgumentParser(
+        description="Write _results.json summarising a run, and print the total number of lines of GeoJSON output"
+    )
+    parser.add_argument("--stats-dir", required=True, help="Directory containing per-spider stats JSON files")
+    parser.add_argument("--output-dir", help="Directory containing GeoJSON output, to count lines of")
+    parser.add_argument("--spider-list", help="File with spider names, one per line (default: all spiders)")
+    parser.add_argument("--output", help="Output file path (default: _results.json in the stats directory)")
+    parser.add_argument("--workers", type=int, default=16, help="Number of files to read at once")
+
+    args = parser.parse_args()
+
+    spider_names = None
+    if args.spider_list:
+        spider_names = [s for s in Path(args.spider_list).read_text().strip().splitlines() if s]
+    stats_dir = Path(args.stats_dir)
+
+    results = build_results(spider_filenames(spider_names), stats_dir, args.workers)
+    if args.output_dir:
+        results["total_lines"] = count_output_lines(Path(args.output_dir), args.workers)
+        sys.stdout.write(f"{results['total_lines']}\n")
+    Path(args.output or stats_dir / "_results.json").write_text(json.dumps(results, separators=(",", ":")))
+
+
+if __name__ == "__main__":
+    main()
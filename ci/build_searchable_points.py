@@ -0,0 +1,39 @@
+import logging
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+
+from locations.searchable_points import PACKED_POINTS_FILENAME, get_searchable_points_path, write_packed_points
+
+logger = logging.getLogger(__name__)
+
+
+def searchable_points_files() -> list[str]:
+    """
+    Paths, relative to locations/searchable_points, of every CSV file of
+    latitude/longitude points.
+    """
+    directory = Path(get_searchable_points_path(""))
+    return sorted(str(path.relative_to(directory)) for path in directory.rglob("*.csv"))
+
+
+def main() -> None:
+    parser = ArgumentParser(
+        description="Pack the CSV files of locations/searchable_points into a single memory mappable binary file"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=get_searchable_points_path(PACKED_POINTS_FILENAME),
+        help="Path of the packed binary file to write",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+    filenames = searchable_points_files()
+    write_packed_points(filenames, args.output)
+    logger.info("Packed %d searchable points files into %s", len(filenames), args.output)
+
+
+if __name__ == "__main__":
+    main()
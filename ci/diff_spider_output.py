@@ -0,0 +1,219 @@
+import hashlib
+import json
+import logging
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Iterator
+
+import ijson
+import requests
+
+logger = logging.getLogger(__name__)
+
+ADDED = "added"
+CHANGED = "changed"
+REMOVED = "removed"
+
+
+def previous_sources(
+    spider_names: list[str], previous_manifest: dict | None = None, previous_run: str | None = None
+) -> dict[str, tuple[str, str | None]]:
+    """
+    Find the previous GeoJSON output (a path or URL) of each spider, and the
+    run it came from: the spider's entry in the previous group manifest, or
+    otherwise its output in `previous_run`, the URL prefix or directory of
+    the previous run.
+    """
+    manifest_spiders = (previous_manifest or {}).get("spiders", {})
+    sources = {}
+    for spider_name in spider_names:
+        if entry := manifest_spiders.get(spider_name):
+            sources[spider_name] = (entry["geojson_url"], entry.get("run_id"))
+        elif previous_run:
+            # Runs are named by their timestamp, the last part of their URL.
+            run_id = previous_run.rstrip("/").rsplit("/", 1)[-1]
+            sources[spider_name] = (f"{previous_run.rstrip('/')}/output/{spider_name}.geojson", run_id)
+    return sources
+
+
+def fetch(source: str, temp_dir: Path) -> Path | None:
+    """A local copy of `source`, downloaded if it is a URL, or None if there is none."""
+    if not source.startswith(("http://", "https://")):
+        return Path(source) if Path(source).exists() else None
+    path = temp_dir / hashlib.sha256(source.encode()).hexdigest()
+    try:
+        with requests.get(source, stream=True, timeout=60) as response:
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            with open(path, "wb") as f:
+                for chunk in response.iter_content(1024 * 1024):
+                    f.write(chunk)
+    except requests.RequestException as e:
+        logger.warning(f"Couldn't download {source}: {e}")
+        return None
+    return path
+
+
+def iter_features(geojson_path: Path) -> Iterator[dict]:
+    if geojson_path.stat().st_size == 0:
+        # Spiders which scraped no items write an empty file.
+        return
+    with open(geojson_path, "rb") as f:
+        yield from ijson.items(f, "features.item", use_float=True)
+
+
+def read_dataset_attributes(geojson_path: Path) -> dict:
+    if geojson_path.stat().st_size == 0:
+        return {}
+    with open(geojson_path, "rb") as f:
+        # The exporter writes dataset_attributes before the features.
+        return next(ijson.items(f, "dataset_attributes", use_float=True), {})
+
+
+def feature_digest(feature: dict) -> bytes:
+    """
+    A digest of what a consumer sees of a feature. Its id is a hash of its
+    ref and spider only, and dataset_attributes (which include the
+    collection time) are shared by all the spider's features.
+    """
+    content = json.dumps(
+        [feature.get("properties"), feature.get("geometry")], sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha1(content.encode("utf-8")).digest()
+
+
+def diff_spider(current_path: Path, previous_path: Path | None, changes_path: Path) -> dict:
+    """
+    Compare the current and previous GeoJSON output of a spider, feature by
+    feature by id, writing the features added, changed or removed to
+    `changes_path` as ndgeojson, with a "change" member giving which.
+    Removed features are written as they were previously.
+
+    Only the digests of the previous features are held in memory, so the
+    previous output is read twice if any features were removed.
+    """
+    previous_digests = {}
+    if previous_path is not None:
+        for feature in iter_features(previous_path):
+            previous_digests[feature.get("id")] = feature_digest(feature)
+
+    stats = {"previous": len(previous_digests), "current": 0, ADDED: 0, CHANGED: 0, REMOVED: 0, "unchanged": 0}
+    seen = set()
+    with open(changes_path, "w", encoding="utf-8") as out:
+
+        def write(feature: dict, change: str, dataset_attributes: dict) -> None:
+            change_feature = {**feature, "change": change, "dataset_attributes": dataset_attributes}
+            out.write(json.dumps(change_feature, ensure_ascii=False, separators=(",", ":")))
+            out.write("\n")
+            stats[change] += 1
+
+        dataset_attributes = read_dataset_attributes(current_path)
+        for feature in iter_features(current_path):
+            feature_id = feature.get("id")
+            stats["current"] += 1
+            if feature_id in seen:
+                # Spiders should give each feature a unique ref; a duplicate
+                # would be ambiguous, so only the first is compared.
+                continue
+            seen.add(feature_id)
+            if (previous_digest := previous_digests.get(feature_id)) is None:
+                write(feature, ADDED, dataset_attributes)
+            elif previous_digest != feature_digest(feature):
+                write(feature, CHANGED, dataset_attributes)
+            else:
+                stats["unchanged"] += 1
+
+        if previous_path is not None and len(seen & previous_digests.keys()) < len(previous_digests):
+            dataset_attributes = read_dataset_attributes(previous_path)
+            for feature in iter_features(previous_path):
+                if (feature_id := feature.get("id")) not in seen:
+                    seen.add(feature_id)
+                    write(feature, REMOVED, dataset_attributes)
+
+    return stats
+
+
+def diff_spider_output(
+    spider_name: str, current_path: Path, source: tuple[str, str | None] | None, changes_dir: Path
+) -> dict:
+    previous_path = None
+    with TemporaryDirectory() as temp_dir:
+        if source is not None:
+            previous_path = fetch(source[0], Path(temp_dir))
+            if previous_path is None:
+                logger.warning(f"No previous output for {spider_name} at {source[0]}")
+        stats = diff_spider(current_path, previous_path, changes_dir / f"{spider_name}.ndgeojson")
+    stats["previous_run_id"] = source[1] if source is not None and previous_path is not None else None
+    return stats
+
+
+def diff_outputs(
+    output_dir: Path,
+    changes_dir: Path,
+    previous_manifest: dict | None = None,
+    previous_run: str | None = None,
+    workers: int | None = None,
+) -> dict[str, dict]:
+    """
+    Diff the output of each spider in `output_dir` which scraped any items
+    against its previous output, returning the change statistics of each.
+    Spiders which scraped no items are left out, as build_group_manifest.py
+    keeps their previous output.
+    """
+    changes_dir.mkdir(parents=True, exist_ok=True)
+    current_paths = {path.stem: path for path in sorted(output_dir.glob("*.geojson")) if path.stat().st_size > 0}
+    sources = previous_sources(list(current_paths), previous_manifest, previous_run)
+    with ProcessPoolExecutor(workers) as executor:
+        futures = {
+            spider_name: executor.submit(
+                diff_spider_output, spider_name, current_path, sources.get(spider_name), changes_dir
+            )
+            for spider_name, current_path in current_paths.items()
+        }
+        results = {}
+        for spider_name, future in futures.items():
+            try:
+                results[spider_name] = future.result()
+            except Exception as e:
+                logger.error(f"Couldn't diff the output of {spider_name}: {e}")
+                (changes_dir / f"{spider_name}.ndgeojson").unlink(missing_ok=True)
+    return results
+
+
+def main():
+    parser = ArgumentParser(description="Write the features added, changed and removed since the previous run")
+    parser.add_argument("--output-dir", required=True, help="Directory containing GeoJSON output of this run")
+    parser.add_argument("--changes-dir", required=True, help="Directory to write per-spider ndgeojson changes to")
+    parser.add_argument("--previous-manifest", help="Group manifest of the previous output of each spider")
+    parser.add_argument(
+        "--previous-run", help="URL prefix or directory of the previous run, for spiders not in the manifest"
+    )
+    parser.add_argument("--output", required=True, help="Path to write per-spider change statistics to")
+    parser.add_argument("--run-id", help="Run timestamp ID")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: number of cores)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+
+    previous_manifest = None
+    if args.previous_manifest and Path(args.previous_manifest).exists():
+        previous_manifest = json.loads(Path(args.previous_manifest).read_text())
+
+    spiders = diff_outputs(
+        Path(args.output_dir), Path(args.changes_dir), previous_manifest, args.previous_run, args.workers
+    )
+    totals = {
+        change: sum(stats[change] for stats in spiders.values()) for change in (ADDED, CHANGED, REMOVED, "unchanged")
+    }
+    logger.info(f"Compared the output of {len(spiders)} spiders: {totals}")
+    Path(args.output).write_text(
+        json.dumps({"run_id": args.run_id, **totals, "spiders": spiders}, separators=(",", ":"))
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,24 @@
+import hashlib
 import json
 import logging
 import math
+import multiprocessing
+import os
+import re
 import sys
+import time
 import traceback
 from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from logging import getLogger
 from pathlib import Path
 from tempfile import TemporaryDirectory
+from typing import NamedTuple
 
 import duckdb
 import psutil
+import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
 
 logger = getLogger(__name__)
@@ -51,21 +60,54 @@ def cgroup_memory_limit_bytes() -> int | None:
     return None
 
 
-def duckdb_memory_limit() -> str:
+def memory_budget_bytes() -> int:
     total_bytes = cgroup_memory_limit_bytes() or psutil.virtual_memory().total
     # Reserve 2 GB for Python, pyarrow, and OS overhead
     reserved_bytes = 2 * 1024**3
-    duckdb_bytes = max(total_bytes - reserved_bytes, reserved_bytes)
-    duckdb_gb = math.floor(duckdb_bytes / 1024**3)
+    return max(total_bytes - reserved_bytes, reserved_bytes)
+
+
+def duckdb_memory_limit() -> str:
+    duckdb_gb = math.floor(memory_budget_bytes() / 1024**3)
     return f"{duckdb_gb}GB"
 
 
-# ST_Hilbert() returns a UINTEGER (32-bit) curve position. Used to split the
-# table into spatially-contiguous batches so no single ORDER BY has to sort/
-# materialize the whole dataset at once.
-HILBERT_RANGE = 2**32
+# Each worker process gets an equal share of the memory budget, so there are
+# no more workers than there are shares of at least this size.
+MIN_WORKER_MEMORY_BYTES = 1024**3
+
+# DuckDB's memory_limit only covers its buffer manager, so leave part of each
+# worker's share for the Python interpreter and DuckDB's own overhead.
+WORKER_DUCKDB_MEMORY_FRACTION = 0.75
+
+
+def worker_count(memory_bytes: int, cpu_count: int | None = None) -> int:
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return max(1, min(cpu_count, memory_bytes // MIN_WORKER_MEMORY_BYTES))
+
+
+def worker_memory_limit(memory_bytes: int, workers: int) -> str:
+    worker_mb = math.floor(memory_bytes / workers * WORKER_DUCKDB_MEMORY_FRACTION / 1024**2)
+    return f"{worker_mb}MB"
 
-# Sorting and writing the whole table in one COPY holds the full row set
+
+# Staged files are keyed by a hash of the ndgeojson content and this version,
+# which must be bumped whenever the staged schema or conversion changes so
+# that files staged by an older version are not reused.
+STAGING_VERSION = 3
+
+# The collection time is set afresh by every crawl of a spider, so it is left
+# out of the content hash and the staged files, and set from the current
+# ndgeojson file when the staged files are merged.
+COLLECTION_TIME_KEY = "spider:collection_time"
+COLLECTION_TIME_PATTERN = re.compile(rb'"spider:collection_time": *"[^"]*"')
+
+# Staged files which no run has used for this long are deleted. Runs of
+# different groups of spiders may share a staging directory, so files which
+# this run didn't use may still be in use by others.
+STAGED_FILE_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+
+# Sorting and writing the whole dataset in one COPY holds the full row set
 # (geometry + properties + dataset_attributes) in memory during the sort. On
 # a ~43M row dataset that has been observed to exceed the container's memory
 # limit and get silently OOM-killed (see #14341/#16158). Splitting into
@@ -73,130 +115,474 @@ HILBERT_RANGE = 2**32
 # regardless of total dataset size.
 TARGET_ROWS_PER_BATCH = 2_000_000
 
+# Row groups of the output are cut at roughly this many bytes of uncompressed
+# data (target 64-256 MB), however many rows that is.
+TARGET_ROW_GROUP_BYTES = 128 * 1024**2
+READ_BATCH_ROWS = 65_536
 
-def to_parquet(input_dir_path: Path, output_file_path: Path) -> None:
-    output_file_path.parent.mkdir(parents=True, exist_ok=True)
-    if output_file_path.exists():
-        output_file_path.unlink()
+# Columns with statistics and page indexes, which readers use to skip row
+# groups and pages. Statistics of the other columns are of no use for that.
+STATISTICS_COLUMNS = ["id", "@spider", "bbox.xmin", "bbox.ymin", "bbox.xmax", "bbox.ymax"]
 
-    input_files_pattern = str(input_dir_path / "*.ndgeojson")
-    logger.info(f"Processing ndgeojson files matching: {input_files_pattern}")
 
-    with TemporaryDirectory() as temp_dir:
-        db_path = Path(temp_dir) / "temp.db"
-        logger.info(f"Using DuckDB version: {duckdb.__version__}")
-        logger.info(f"Creating temporary database at: {db_path}")
-        with duckdb.connect(db_path.as_posix()) as con:
-            logger.info("Installing spatial extension...")
-            con.install_extension("spatial")
-            con.load_extension("spatial")
-            logger.info("Spatial extension loaded successfully")
-
-            logger.info("Configuring DuckDB settings...")
-            cgroup_limit = cgroup_memory_limit_bytes()
-            memory_limit = duckdb_memory_limit()
-            source = "cgroup limit" if cgroup_limit is not None else "total system RAM"
-            detected_bytes = cgroup_limit if cgroup_limit is not None else psutil.virtual_memory().total
-            logger.info(f"Setting DuckDB memory limit to {memory_limit} ({source}: {detected_bytes / 1024**3:.1f} GB)")
-            con.execute(f"SET temp_directory='{temp_dir}'")
-            con.execute(f"SET memory_limit='{memory_limit}'")
-            con.execute("SET threads=2")
-            con.execute("SET preserve_insertion_order=false")
-
-            logger.info("Creating geojson_data table from ndgeojson files...")
-            con.execute(f"""
-            CREATE TABLE geojson_data AS
-                SELECT
-                    id,
-                    type,
-                    dataset_attributes,
-                    properties,
-                    ST_GeomFromGeoJSON(geometry) AS geom
-                FROM read_ndjson(
-                    '{input_files_pattern}',
-                    columns={{
-                        'type': 'VARCHAR' ,
-                        'id': 'VARCHAR',
-                        'dataset_attributes': 'MAP(VARCHAR, VARCHAR)',
-                        'properties' : 'MAP(VARCHAR, VARCHAR)',
-                        'geometry': 'JSON',
-                        }}
-                    );
-            """)
-            logger.info("Table created successfully")
-
-            # compute overall bbox and geometry types from the created table
-            logger.info("Computing bounding box...")
-            bbox_res = con.execute(
-                "SELECT min(ST_XMin(geom)), min(ST_YMin(geom)), max(ST_XMax(geom)), max(ST_YMax(geom)) FROM geojson_data"
-            ).fetchone()
-            logger.info(f"Bounding box: {bbox_res}")
+class StagedFile(NamedTuple):
+    path: Path
+    row_count: int
+    bbox: tuple[float | None, float | None, float | None, float | None]
+    geometry_types: list[str]
+    reused: bool
+    collection_time: str | None
 
-            logger.info("Computing geometry types...")
-            geom_types_raw = con.execute("SELECT DISTINCT ST_GeometryType(geom) FROM geojson_data").fetchall()
-            geom_types = [t[0] for t in geom_types_raw if t and t[0] is not None]
-            logger.info(f"Found geometry types: {geom_types}")
 
-            row_count = con.execute("SELECT count(*) FROM geojson_data").fetchone()[0]
-            num_batches = max(1, math.ceil(row_count / TARGET_ROWS_PER_BATCH))
-            logger.info(f"Table has {row_count:,} rows; writing in {num_batches} spatial batch(es)")
-
-            if num_batches > 1:
-                # Bucket rows into spatially-contiguous ranges of the Hilbert curve so each
-                # batch can be sorted and written independently, without needing the whole
-                # table's rows in memory at once. Buckets won't be perfectly balanced (data
-                # is denser in some regions than others), but this bounds the *typical* peak
-                # memory of any single sort to a small fraction of the full dataset.
-                con.execute("ALTER TABLE geojson_data ADD COLUMN batch_id INTEGER")
-                con.execute(f"""
-                    UPDATE geojson_data
-                    SET batch_id = LEAST(
-                        CAST(FLOOR(ST_Hilbert(geom) / ({HILBERT_RANGE} / {num_batches})) AS INTEGER),
-                        {num_batches - 1}
-                    )
-                """)
+def sql_string(value: str | Path) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def sql_list(values: list[str | Path]) -> str:
+    return "[" + ", ".join(sql_string(value) for value in values) + "]"
+
+
+def sql_identifier(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+
+def columnar_property_keys() -> list[str]:
+    """
+    The property keys promoted to columns of their own by the columnar
+    properties option: those set from Feature fields by the GeoJSON
+    exporter, and the top level category tags.
+    """
+    from locations.categories import top_level_tags
+    from locations.exporters.geojson import mapping
+
+    return list(dict.fromkeys(["ref", "@source_uri", *(key for _, key in mapping), *top_level_tags]))
+
+
+def properties_columns(property_columns: list[str] | None) -> str:
+    """
+    The columns selected from the properties map: each of `property_columns`
+    as a column of its own, and a residual map of all other properties.
+    """
+    if not property_columns:
+        return "properties"
+    columns = [f"properties[{sql_string(key)}] AS {sql_identifier(key)}" for key in property_columns]
+    columns.append(
+        "map_from_entries(list_filter(map_entries(properties), "
+        f"lambda e: NOT list_contains({sql_list(property_columns)}, e.key))) AS properties"
+    )
+    return ",\n".join(columns)
 
-            # write parquet with a larger row group size (target 64-256 MB). 128MB chosen here.
-            row_group_size = 134217728
 
-            batch_paths = []
-            for batch_num in range(num_batches):
-                batch_path = Path(temp_dir) / f"batch_{batch_num}.parquet"
-                where_clause = f"WHERE batch_id = {batch_num}" if num_batches > 1 else ""
-                logger.info(f"Writing batch {batch_num + 1}/{num_batches} to {batch_path}...")
+def file_digest(path: Path, property_columns: list[str] | None = None) -> str:
+    digest = hashlib.sha256(f"{STAGING_VERSION}\n{json.dumps(property_columns or [])}\n".encode())
+    with open(path, "rb") as f:
+        for line in f:
+            digest.update(COLLECTION_TIME_PATTERN.sub(b"", line))
+    return digest.hexdigest()
+
+
+def collection_time(path: Path) -> str | None:
+    """The collection time of the features of an ndgeojson file, from the first of them."""
+    with open(path, "rb") as f:
+        try:
+            feature = json.loads(f.readline())
+        except ValueError:
+            return None
+    if not isinstance(feature, dict) or not isinstance(feature.get("dataset_attributes"), dict):
+        return None
+    return feature["dataset_attributes"].get(COLLECTION_TIME_KEY)
+
+
+def dataset_attributes_column(collection_times: dict[Path, str | None]) -> str:
+    """
+    The dataset attributes of the staged rows, with the collection time of
+    the ndgeojson file each row was staged from in this run. Requires the
+    staged files to be read with their filename.
+    """
+    entries = [
+        f"{sql_string(path)}: MAP {{{sql_string(COLLECTION_TIME_KEY)}: {sql_string(value)}}}"
+        for path, value in collection_times.items()
+        if value is not None
+    ]
+    if not entries:
+        return "dataset_attributes"
+    # map_concat ignores the NULL looked up for files without a collection time.
+    return f"map_concat(dataset_attributes, (MAP {{{', '.join(entries)}}})[filename])"
+
+
+def connect(memory_limit: str, threads: int, temp_dir: Path) -> duckdb.DuckDBPyConnection:
+    con = duckdb.connect()
+    con.load_extension("spatial")
+    con.execute(f"SET temp_directory={sql_string(temp_dir)}")
+    con.execute(f"SET memory_limit='{memory_limit}'")
+    con.execute(f"SET threads={threads}")
+    con.execute("SET preserve_insertion_order=false")
+    return con
+
+
+def stage_file(
+    input_file_path: Path,
+    staging_dir: Path,
+    memory_limit: str,
+    threads: int,
+    temp_dir: Path,
+    property_columns: list[str] | None = None,
+) -> StagedFile:
+    """
+    Convert one ndgeojson file to a parquet file in `staging_dir` sorted by
+    its position on the Hilbert curve, unless a file staged from identical
+    content (see file_digest) already exists there.
+    """
+    staged_path = staging_dir / f"{file_digest(input_file_path, property_columns)}.parquet"
+    reused = staged_path.exists()
+    with connect(memory_limit, threads, temp_dir) as con:
+        if reused:
+            # Record the use, so that the file isn't evicted as unused.
+            os.utime(staged_path)
+        else:
+            partial_path = staged_path.with_suffix(f".{os.getpid()}.tmp")
+            try:
                 con.execute(f"""
                 COPY (
                     SELECT
                         id,
                         type,
-                        dataset_attributes,
-                        properties,
+                        dataset_attributes['@spider'] AS "@spider",
+                        map_from_entries(list_filter(map_entries(dataset_attributes),
+                            lambda e: e.key != {sql_string(COLLECTION_TIME_KEY)})) AS dataset_attributes,
+                        {properties_columns(property_columns)},
                         geom,
                         {{
                             'xmin': ST_XMin(geom),
                             'ymin': ST_YMin(geom),
                             'xmax': ST_XMax(geom),
                             'ymax': ST_YMax(geom)
-                        }} as bbox
-                    FROM geojson_data
-                    {where_clause}
-                    ORDER BY ST_Hilbert(geom)
-                ) TO '{str(batch_path)}'
-                (FORMAT PARQUET, COMPRESSION 'ZSTD', ROW_GROUP_SIZE {row_group_size});
+                        }} as bbox,
+                        ST_Hilbert(geom) AS hilbert
+                    FROM (
+                        SELECT
+                            id,
+                            type,
+                            dataset_attributes,
+                            properties,
+                            ST_GeomFromGeoJSON(geometry) AS geom
+                        FROM read_ndjson(
+                            {sql_string(input_file_path)},
+                            columns={{
+                                'type': 'VARCHAR' ,
+                                'id': 'VARCHAR',
+                                'dataset_attributes': 'MAP(VARCHAR, VARCHAR)',
+                                'properties' : 'MAP(VARCHAR, VARCHAR)',
+                                'geometry': 'JSON',
+                                }}
+                            )
+                    )
+                    ORDER BY hilbert
+                ) TO {sql_string(partial_path)}
+                (FORMAT PARQUET, COMPRESSION 'ZSTD');
                 """)
-                batch_paths.append(batch_path)
+            except BaseException:
+                partial_path.unlink(missing_ok=True)
+                raise
+            # Only complete files are ever visible under the staged name, so
+            # an interrupted run can't leave a truncated file to be reused.
+            os.replace(partial_path, staged_path)
+
+        row_count, xmin, ymin, xmax, ymax, geometry_types = con.execute(f"""
+            SELECT
+                count(*),
+                min(bbox.xmin),
+                min(bbox.ymin),
+                max(bbox.xmax),
+                max(bbox.ymax),
+                list(DISTINCT ST_GeometryType(geom)::VARCHAR)
+            FROM read_parquet({sql_string(staged_path)})
+        """).fetchone()
+    return StagedFile(
+        staged_path,
+        row_count,
+        (xmin, ymin, xmax, ymax),
+        [t for t in geometry_types or [] if t],
+        reused,
+        collection_time(input_file_path),
+    )
+
+
+def evict_staged_files(
+    staging_dir: Path, staged_paths: list[Path], max_age: float = STAGED_FILE_MAX_AGE_SECONDS
+) -> None:
+    """
+    Delete the staged files in `staging_dir` other than `staged_paths` which
+    no run has used for `max_age` seconds.
+    """
+    evict_before = time.time() - max_age
+    for path in set(staging_dir.glob("*.parquet")) - set(staged_paths):
+        try:
+            if path.stat().st_mtime < evict_before:
+                path.unlink()
+        except FileNotFoundError:
+            # Evicted by another run at the same time.
+            pass
+
+
+def hilbert_boundaries(con: duckdb.DuckDBPyConnection, staged_paths: list[Path], num_batches: int) -> list[int]:
+    """
+    Positions on the Hilbert curve which split the staged rows into batches
+    of roughly equal size. Rows are far denser in some regions than others,
+    so equal ranges of the curve would give very unequal batches.
+    """
+    if num_batches <= 1:
+        return []
+    fractions = [i / num_batches for i in range(1, num_batches)]
+    (boundaries,) = con.execute(
+        f"SELECT quantile_disc(hilbert, {fractions}) FROM read_parquet({sql_list(staged_paths)})"
+    ).fetchone()
+    return sorted({boundary for boundary in boundaries or [] if boundary is not None})
+
+
+def hilbert_range_filter(lower: int | None, upper: int | None) -> str:
+    """
+    The WHERE clause selecting the rows of a batch, from `lower` inclusive to
+    `upper` exclusive. Rows without a geometry (and so without a position on
+    the curve) go in the last batch.
+    """
+    conditions = []
+    if lower is not None:
+        conditions.append(f"hilbert >= {lower}")
+    if upper is not None:
+        conditions.append(f"hilbert < {upper}")
+    else:
+        conditions = [f"({' AND '.join(conditions) or 'true'} OR hilbert IS NULL)"]
+    return " AND ".join(conditions)
+
+
+def write_batch(
+    collection_times: dict[Path, str | None],
+    where_clause: str,
+    batch_path: Path,
+    memory_limit: str,
+    threads: int,
+    temp_dir: Path,
+) -> Path:
+    """
+    Write the rows of the staged files (the keys of `collection_times`)
+    selected by `where_clause` to a batch file, sorted by their position on
+    the Hilbert curve.
+    """
+    with connect(memory_limit, threads, temp_dir) as con:
+        con.execute(f"""
+        COPY (
+            SELECT * EXCLUDE (filename) REPLACE ({dataset_attributes_column(collection_times)} AS dataset_attributes)
+            FROM read_parquet({sql_list(list(collection_times))}, filename=true)
+            WHERE {where_clause}
+            ORDER BY hilbert
+        ) TO {sql_string(batch_path)}
+        (FORMAT PARQUET, COMPRESSION 'ZSTD');
+        """)
+    return batch_path
+
+
+def index_path(output_file_path: Path) -> Path:
+    return output_file_path.with_suffix(".index.json")
+
+
+def to_ranges(values: list[int]) -> list[list[int]]:
+    """Collapse sorted integers into inclusive [first, last] ranges of consecutive values."""
+    ranges = []
+    for value in values:
+        if ranges and ranges[-1][1] == value - 1:
+            ranges[-1][1] = value
+        else:
+            ranges.append([value, value])
+    return ranges
+
+
+def write_output(
+    batch_paths: list[Path],
+    output_file_path: Path,
+    geo_meta: dict,
+    statistics_columns: list[str] = STATISTICS_COLUMNS,
+) -> dict:
+    """
+    Merge the batch files, in order, into the final output, in row groups of
+    around TARGET_ROW_GROUP_BYTES with page indexes for `statistics_columns`.
+
+    Returns an index of the output for the sidecar file: the range of the
+    Hilbert curve and bounding box of each row group, and the row groups
+    containing each spider's features. Rows are in curve order, so a
+    spider's features are spread across row groups, and the statistics of
+    the "@spider" column alone can rarely rule one out.
+    """
+    schema = pq.ParquetFile(str(batch_paths[0])).schema_arrow
+    # The curve position is only needed to order rows and build the index.
+    schema = schema.remove(schema.get_field_index("hilbert"))
+    schema = schema.with_metadata(
+        {**(schema.metadata or {}), b"geo": json.dumps(geo_meta, ensure_ascii=False).encode("utf-8")}
+    )
+    index = {"row_groups": [], "spiders": {}}
+    spider_row_groups = {}
+
+    # Read the batch files a slice at a time so we never need to hold more
+    # than a row group in memory (unlike a read_table/write_table round trip
+    # over the whole file, which was itself a prior OOM risk).
+    with pq.ParquetWriter(
+        str(output_file_path),
+        schema,
+        compression="ZSTD",
+        write_statistics=statistics_columns,
+        write_page_index=True,
+    ) as writer:
+        buffered = []
+        buffered_bytes = 0
+
+        def write_row_group():
+            table = pa.Table.from_batches(buffered)
+            bbox = table["bbox"].combine_chunks()
+            hilbert = pc.min_max(table["hilbert"])
+            index["row_groups"].append(
+                {
+                    "num_rows": table.num_rows,
+                    "hilbert": [hilbert["min"].as_py(), hilbert["max"].as_py()],
+                    "bbox": [
+                        pc.min(bbox.field("xmin")).as_py(),
+                        pc.min(bbox.field("ymin")).as_py(),
+                        pc.max(bbox.field("xmax")).as_py(),
+                        pc.max(bbox.field("ymax")).as_py(),
+                    ],
+                }
+            )
+            for spider in pc.unique(table["@spider"]).drop_null().to_pylist():
+                spider_row_groups.setdefault(spider, []).append(len(index["row_groups"]) - 1)
+            writer.write_table(table.drop_columns(["hilbert"]), row_group_size=table.num_rows)
+            buffered.clear()
+
+        for batch_path in batch_paths:
+            for record_batch in pq.ParquetFile(str(batch_path)).iter_batches(READ_BATCH_ROWS):
+                buffered.append(record_batch)
+                buffered_bytes += record_batch.nbytes
+                if buffered_bytes >= TARGET_ROW_GROUP_BYTES:
+                    write_row_group()
+                    buffered_bytes = 0
+        if buffered:
+            write_row_group()
+
+    index["spiders"] = {spider: to_ranges(row_groups) for spider, row_groups in sorted(spider_row_groups.items())}
+    return index
+
+
+def to_parquet(
+    input_dir_path: Path,
+    output_file_path: Path,
+    staging_dir: Path | None = None,
+    workers: int | None = None,
+    columnar_properties: bool = False,
+) -> None:
+    """
+    Convert the ndgeojson files in `input_dir_path` to one GeoParquet file
+    sorted along the Hilbert curve.
+
+    Each file is first staged as its own sorted parquet file by a pool of
+    worker processes, each with its own share of the memory budget. The
+    staged files are then merged in batches of contiguous ranges of the
+    curve, again in parallel. If `staging_dir` is given, staged files are
+    kept there and reused by later runs for files with identical content,
+    other than their collection time, until unused for a while.
+
+    An index of the output's row groups is written alongside it, see
+    write_output.
+
+    If `columnar_properties` is set, the properties most often read (see
+    columnar_property_keys) are written as columns of their own, with
+    statistics, rather than as entries of the properties map, which keeps
+    the remaining properties.
+    """
+    output_file_path.parent.mkdir(parents=True, exist_ok=True)
+    if output_file_path.exists():
+        output_file_path.unlink()
+
+    input_file_paths = sorted(input_dir_path.glob("*.ndgeojson"))
+    logger.info(f"Processing {len(input_file_paths)} ndgeojson files in: {input_dir_path}")
+    property_columns = columnar_property_keys() if columnar_properties else []
+
+    memory_bytes = memory_budget_bytes()
+    workers = workers or worker_count(memory_bytes)
+    memory_limit = worker_memory_limit(memory_bytes, workers)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    logger.info(f"Using DuckDB version: {duckdb.__version__}")
+    logger.info(f"Using {workers} worker(s), each with a DuckDB memory limit of {memory_limit} and {threads} thread(s)")
+
+    with TemporaryDirectory() as temp_dir:
+        if staging_dir is None:
+            staging_dir = Path(temp_dir) / "staged"
+        staging_dir.mkdir(parents=True, exist_ok=True)
+
+        # Install once up front, rather than in each worker at once.
+        logger.info("Installing spatial extension...")
+        duckdb.install_extension("spatial")
+
+        # DuckDB isn't safe to fork once its threads are running, so workers
+        # are always started afresh.
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = {
+                executor.submit(
+                    stage_file, input_file_path, staging_dir, memory_limit, threads, Path(temp_dir), property_columns
+                ): input_file_path
+                for input_file_path in input_file_paths
+            }
+            staged_files = []
+            for future in as_completed(futures):
+                try:
+                    staged_files.append(future.result())
+                except Exception as e:
+                    # One malformed file shouldn't prevent every other spider's
+                    # output from being published.
+                    logger.error(f"Failed to stage {futures[future]}, omitting it: {e}")
+            if not staged_files:
+                raise ValueError(f"No ndgeojson files in {input_dir_path} could be staged")
+            staged_files.sort(key=lambda staged_file: staged_file.path)
+            reused_count = sum(staged_file.reused for staged_file in staged_files)
+            logger.info(f"Staged {len(staged_files)} files, reusing {reused_count} staged by a previous run")
+
+            # Staged files of output which has since changed will never be
+            # reused, so don't let them accumulate.
+            staged_paths = [staged_file.path for staged_file in staged_files]
+            evict_staged_files(staging_dir, staged_paths)
+
+            xmins, ymins, xmaxs, ymaxs = zip(*(staged_file.bbox for staged_file in staged_files))
+            bbox_res = (
+                min((v for v in xmins if v is not None), default=None),
+                min((v for v in ymins if v is not None), default=None),
+                max((v for v in xmaxs if v is not None), default=None),
+                max((v for v in ymaxs if v is not None), default=None),
+            )
+            logger.info(f"Bounding box: {bbox_res}")
+            geom_types = sorted({t for staged_file in staged_files for t in staged_file.geometry_types})
+            logger.info(f"Found geometry types: {geom_types}")
+
+            row_count = sum(staged_file.row_count for staged_file in staged_files)
+            num_batches = max(1, math.ceil(row_count / TARGET_ROWS_PER_BATCH))
+            with connect(memory_limit, threads, Path(temp_dir)) as con:
+                boundaries = hilbert_boundaries(con, staged_paths, num_batches)
+            ranges = list(zip([None] + boundaries, boundaries + [None]))
+            logger.info(f"Dataset has {row_count:,} rows; writing in {len(ranges)} spatial batch(es)")
+
+            collection_times = {staged_file.path: staged_file.collection_time for staged_file in staged_files}
+            batch_paths = list(
+                executor.map(
+                    write_batch,
+                    [collection_times] * len(ranges),
+                    [hilbert_range_filter(lower, upper) for lower, upper in ranges],
+                    [Path(temp_dir) / f"batch_{batch_num}.parquet" for batch_num in range(len(ranges))],
+                    [memory_limit] * len(ranges),
+                    [threads] * len(ranges),
+                    [Path(temp_dir)] * len(ranges),
+                )
+            )
             logger.info("All batches written successfully")
 
-        # DuckDB connection is now closed, releasing its memory before pyarrow runs.
-        # Merge the batch files into the final output one row group at a time so we
-        # never need to hold the full dataset in memory (unlike a read_table/write_table
-        # round trip over the whole file, which was itself a prior OOM risk).
         logger.info("Merging batches into final parquet file with GeoParquet metadata...")
 
-        if bbox_res is None:
-            xmin, ymin, xmax, ymax = None, None, None, None
-        else:
-            xmin, ymin, xmax, ymax = bbox_res
+        xmin, ymin, xmax, ymax = bbox_res
         geo_meta = {
             "version": "1.1.0",
             "primary_column": "geom",
@@ -205,36 +591,27 @@ def to_parquet(input_dir_path: Path, output_file_path: Path) -> None:
             # "EPSG:4326" would be wrong here - that CRS formally specifies lat/lon axis
             # order, the opposite of what's actually stored, which readers (e.g. DuckDB)
             # correctly reject.
-            "columns": {"geom": {"encoding": "WKB", "geometry_types": geom_types or ["Unknown"]}},
+            "columns": {
+                "geom": {
+                    "encoding": "WKB",
+                    "geometry_types": geom_types or ["Unknown"],
+                    # Readers can filter on the bbox column's statistics rather
+                    # than decoding geometries.
+                    "covering": {
+                        "bbox": {
+                            "xmin": ["bbox", "xmin"],
+                            "ymin": ["bbox", "ymin"],
+                            "xmax": ["bbox", "xmax"],
+                            "ymax": ["bbox", "ymax"],
+                        }
+                    },
+                }
+            },
             "bbox": [xmin, ymin, xmax, ymax],
         }
-
-        writer = None
-        try:
-            for batch_path in batch_paths:
-                parquet_file = pq.ParquetFile(str(batch_path))
-                for row_group_idx in range(parquet_file.num_row_groups):
-                    row_group_table = parquet_file.read_row_group(row_group_idx)
-                    if writer is None:
-                        schema = row_group_table.schema.with_metadata(
-                            {
-                                **(row_group_table.schema.metadata or {}),
-                                b"geo": json.dumps(geo_meta, ensure_ascii=False).encode("utf-8"),
-                            }
-                        )
-                        writer = pq.ParquetWriter(str(output_file_path), schema, compression="ZSTD")
-                    writer.write_table(row_group_table)
-
-            if writer is None:
-                # No rows in any batch (empty dataset) - still emit a valid, empty parquet
-                # file with the right schema and GeoParquet metadata rather than nothing.
-                schema = pq.ParquetFile(str(batch_paths[0])).schema_arrow.with_metadata(
-                    {b"geo": json.dumps(geo_meta, ensure_ascii=False).encode("utf-8")}
-                )
-                writer = pq.ParquetWriter(str(output_file_path), schema, compression="ZSTD")
-        finally:
-            if writer is not None:
-                writer.close()
+        index = write_output(batch_paths, output_file_path, geo_meta, STATISTICS_COLUMNS + property_columns)
+        index_path(output_file_path).write_text(json.dumps(index, separators=(",", ":")))
+        logger.info(f"Wrote {len(index['row_groups'])} row groups, indexed in {index_path(output_file_path)}")
 
     file_size = output_file_path.stat().st_size
     logger.info(f"✓ Created {output_file_path} ({file_size:,} bytes)")
@@ -246,6 +623,17 @@ def main() -> None:
         "-d", "--directory", type=str, required=True, nargs="?", help="Directory containing NdGeoJSON files"
     )
     parser.add_argument("-o", "--output", type=str, required=True, nargs="?", help="Output Parquet file path")
+    parser.add_argument(
+        "--staging-dir",
+        type=str,
+        help="Directory to keep per-file parquet files in, to reuse for unchanged files in later runs",
+    )
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: based on cores and memory)")
+    parser.add_argument(
+        "--columnar-properties",
+        action="store_true",
+        help="Write the most used properties as columns of their own rather than in the properties map",
+    )
 
     args = parser.parse_args()
     input_directory = Path(args.directory)
@@ -257,7 +645,13 @@ def main() -> None:
             raise FileNotFoundError(f"No NdGeoJSON files found in directory: {input_directory}")
 
         logger.info(f"Found {len(ndgeojson_file_paths)} ndgeojson files to process")
-        to_parquet(input_directory, output_file_path)
+        to_parquet(
+            input_directory,
+            output_file_path,
+            staging_dir=Path(args.staging_dir) if args.staging_dir else None,
+            workers=args.workers,
+            columnar_properties=args.columnar_properties,
+        )
     except Exception as e:
         logger.error(f"Failed to create parquet file: {e}")
         logger.error(traceback.format_exc())
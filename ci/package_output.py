@@ -0,0 +1,257 @@
+import hashlib
+import json
+import logging
+import os
+import struct
+import sys
+import time
+import zlib
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import BinaryIO, Iterator, NamedTuple
+
+from ci.repair_truncated_geojson import GEOJSON_TRAILER
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# The default level of zip(1) and zipfile.
+COMPRESSION_LEVEL = 6
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_COUNT_LIMIT = 0xFFFF
+ZIP_DEFLATED = 8
+ZIP_VERSION = 20
+ZIP64_VERSION = 45
+# Made by: Unix, so that the external attributes are read as permissions.
+ZIP_CREATE_SYSTEM = 3
+
+
+class CompressedFile(NamedTuple):
+    arcname: str
+    compressed_path: Path
+    date_time: tuple[int, int, int, int, int, int]
+    size: int
+    compressed_size: int
+    crc32: int
+    sha256: str
+    # False for GeoJSON output without the trailer written by a spider which
+    # closed cleanly, which repair_truncated_geojson.py couldn't repair.
+    complete: bool
+
+
+def compress_file(path: Path, arcname: str, temp_dir: Path, level: int = COMPRESSION_LEVEL) -> CompressedFile:
+    """
+    Deflate a file into a temporary file, as it will be stored in the zip,
+    computing its checksums in the same pass.
+    """
+    compressed_path = temp_dir / f"{hashlib.sha256(arcname.encode()).hexdigest()}.deflate"
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    sha256 = hashlib.sha256()
+    crc32 = 0
+    size = 0
+    tail = b""
+    with open(path, "rb") as f, open(compressed_path, "wb") as out:
+        while chunk := f.read(CHUNK_SIZE):
+            size += len(chunk)
+            crc32 = zlib.crc32(chunk, crc32)
+            sha256.update(chunk)
+            tail = (tail + chunk)[-len(GEOJSON_TRAILER) :]
+            out.write(compressor.compress(chunk))
+        out.write(compressor.flush())
+        compressed_size = out.tell()
+    complete = path.suffix != ".geojson" or size == 0 or tail == GEOJSON_TRAILER
+    date_time = time.localtime(os.stat(path).st_mtime)[:6]
+    return CompressedFile(
+        arcname, compressed_path, date_time, size, compressed_size, crc32, sha256.hexdigest(), complete
+    )
+
+
+def dos_date_time(date_time: tuple[int, int, int, int, int, int]) -> tuple[int, int]:
+    year, month, day, hour, minute, second = date_time
+    # The DOS epoch is 1980.
+    if year < 1980:
+        year, month, day, hour, minute, second = 1980, 1, 1, 0, 0, 0
+    return (year - 1980) << 9 | month << 5 | day, hour << 11 | minute << 5 | second // 2
+
+
+class PrecompressedZipWriter:
+    """
+    Write a zip file from members deflated in advance, which zipfile can't
+    do, so that members can be compressed by many processes at once. The
+    SHA-256 and size of the zip file are computed as it is written.
+    """
+
+    def __init__(self, fileobj: BinaryIO):
+        self.fileobj = fileobj
+        self.offset = 0
+        self.sha256 = hashlib.sha256()
+        self.central_directory = []
+
+    def write(self, data: bytes) -> None:
+        self.fileobj.write(data)
+        self.sha256.update(data)
+        self.offset += len(data)
+
+    def add(self, member: CompressedFile) -> None:
+        name = member.arcname.encode("utf-8")
+        date, time_ = dos_date_time(member.date_time)
+        header_offset = self.offset
+
+        zip64 = member.size >= ZIP64_LIMIT or member.compressed_size >= ZIP64_LIMIT
+        extra = struct.pack("<HHQQ", 1, 16, member.size, member.compressed_size) if zip64 else b""
+        self.write(
+            struct.pack(
+                "<IHHHHHIIIHH",
+                0x04034B50,
+                ZIP64_VERSION if zip64 else ZIP_VERSION,
+                0x800,
+                ZIP_DEFLATED,
+                time_,
+                date,
+                member.crc32,
+                ZIP64_LIMIT if zip64 else member.compressed_size,
+                ZIP64_LIMIT if zip64 else member.size,
+                len(name),
+                len(extra),
+            )
+        )
+        self.write(name)
+        self.write(extra)
+        with open(member.compressed_path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                self.write(chunk)
+
+        # In the central directory, only the values which don't fit go in
+        # the zip64 extra field.
+        zip64_values = [value for value in (member.size, member.compressed_size, header_offset) if value >= ZIP64_LIMIT]
+        extra = (
+            struct.pack(f"<HH{len(zip64_values)}Q", 1, 8 * len(zip64_values), *zip64_values) if zip64_values else b""
+        )
+        self.central_directory.append(
+            struct.pack(
+                "<IHHHHHHIIIHHHHHII",
+                0x02014B50,
+                ZIP_CREATE_SYSTEM << 8 | (ZIP64_VERSION if zip64_values else ZIP_VERSION),
+                ZIP64_VERSION if zip64_values else ZIP_VERSION,
+                0x800,
+                ZIP_DEFLATED,
+                time_,
+                date,
+                member.crc32,
+                min(member.compressed_size, ZIP64_LIMIT),
+                min(member.size, ZIP64_LIMIT),
+                len(name),
+                len(extra),
+                0,
+                0,
+                0,
+                0o100644 << 16,
+                min(header_offset, ZIP64_LIMIT),
+            )
+            + name
+            + extra
+        )
+
+    def close(self) -> None:
+        start = self.offset
+        for record in self.central_directory:
+            self.write(record)
+        size = self.offset - start
+        count = len(self.central_directory)
+
+        if count >= ZIP_COUNT_LIMIT or start >= ZIP64_LIMIT or size >= ZIP64_LIMIT:
+            zip64_end = self.offset
+            self.write(
+                struct.pack(
+                    "<IQHHIIQQQQ", 0x06064B50, 44, ZIP64_VERSION, ZIP64_VERSION, 0, 0, count, count, size, start
+                )
+            )
+            self.write(struct.pack("<IIQI", 0x07064B50, 0, zip64_end, 1))
+        self.write(
+            struct.pack(
+                "<IHHHHIIH",
+                0x06054B50,
+                0,
+                0,
+                min(count, ZIP_COUNT_LIMIT),
+                min(count, ZIP_COUNT_LIMIT),
+                min(size, ZIP64_LIMIT),
+                min(start, ZIP64_LIMIT),
+                0,
+            )
+        )
+
+
+def compress_files(
+    paths: list[tuple[Path, str]], temp_dir: Path, workers: int | None = None
+) -> Iterator[CompressedFile]:
+    """
+    Compress files with a process pool, yielding them in the order given.
+    Only a few files per worker are compressed ahead of the one being
+    yielded, to bound the space taken by compressed files waiting to be
+    written.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for path, arcname in paths:
+            pending.append(executor.submit(compress_file, path, arcname, temp_dir))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def package_directory(directory: Path, zip_path: Path, workers: int | None = None) -> dict:
+    """
+    Zip all files under `directory`, as members named by their path from
+    its parent, like "zip -r" run from there.
+
+    Returns a manifest of the zip file's size and SHA-256, and the size and
+    SHA-256 of each member, for latest.json.
+    """
+    paths = [
+        (path, path.relative_to(directory.parent).as_posix()) for path in sorted(directory.rglob("*")) if path.is_file()
+    ]
+    members = {}
+    incomplete = []
+    with TemporaryDirectory(dir=zip_path.parent) as temp_dir, open(zip_path, "wb") as f:
+        writer = PrecompressedZipWriter(f)
+        for member in compress_files(paths, Path(temp_dir), workers):
+            writer.add(member)
+            member.compressed_path.unlink()
+            members[member.arcname] = {"size_bytes": member.size, "sha256": member.sha256}
+            if not member.complete:
+                logger.warning(f"{member.arcname} is incomplete GeoJSON")
+                incomplete.append(member.arcname)
+        writer.close()
+
+    return {
+        "size_bytes": writer.offset,
+        "sha256": writer.sha256.hexdigest(),
+        "incomplete": incomplete,
+        "files": members,
+    }
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Zip a directory of output, compressing files in parallel")
+    parser.add_argument("-d", "--directory", required=True, help="Directory to zip")
+    parser.add_argument("-o", "--output", required=True, help="Output zip file path")
+    parser.add_argument("--manifest", help="Path to write a JSON manifest of the zip file's sizes and hashes to")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: number of cores)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+    manifest = package_directory(Path(args.directory), Path(args.output), args.workers)
+    logger.info(f"Wrote {len(manifest['files'])} files to {args.output} ({manifest['size_bytes']:,} bytes)")
+    if args.manifest:
+        Path(args.manifest).write_text(json.dumps(manifest, separators=(",", ":")))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
+import itertools
 import json
 import logging
+import os
 import sys
 from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterator
+
+import psutil
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +17,15 @@ logger = logging.getLogger(__name__)
 # Scrapy's spider_closed signal ever fired.
 GEOJSON_TRAILER = b"\n]}\n"
 
+# The end of an ndgeojson file is read in blocks of this size until its last
+# line is found.
+TAIL_READ_BYTES = 64 * 1024
+
+# Files are rebuilt a feature at a time, so each worker process needs little
+# more than the interpreter, but workers are still limited to one per share
+# of memory of this size.
+WORKER_MEMORY_BYTES = 256 * 1024**2
+
 
 def _looks_complete(geojson_path: Path) -> bool:
     size = geojson_path.stat().st_size
@@ -24,33 +39,68 @@ def _looks_complete(geojson_path: Path) -> bool:
         return f.read() == GEOJSON_TRAILER
 
 
-def _split_ndgeojson_lines(ndgeojson_path: Path) -> tuple[list[str], list[dict], int]:
-    """Read a newline-delimited GeoJSON file, separating lines that parse as
-    valid JSON objects from malformed ones. Each line is written
-    independently and carries its own "dataset_attributes", so a process
-    killed mid-crawl can only ever leave a trailing line half-written -
-    every earlier line is unaffected.
+def _last_line(path: Path) -> tuple[int, bytes]:
+    """The offset and content of the last non-blank line of a file, read
+    backwards from its end so that the rest of the file is never read.
+    """
+    with path.open("rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        tail = b""
+        while position > 0:
+            read_size = min(TAIL_READ_BYTES, position)
+            position -= read_size
+            f.seek(position)
+            tail = f.read(read_size) + tail
+            newline = tail.rstrip().rfind(b"\n")
+            if newline != -1:
+                return position + newline + 1, tail[newline + 1 :].rstrip()
+    return 0, tail.rstrip()
+
+
+def _truncated_line_offset(ndgeojson_path: Path) -> int | None:
+    """The offset of the last line of a newline-delimited GeoJSON file if it
+    was left half-written. Each line is written independently and carries
+    its own "dataset_attributes", so a process killed mid-crawl can only ever
+    leave the last line half-written - every earlier line is unaffected.
     """
-    valid_lines = []
-    valid_features = []
-    dropped = 0
+    offset, line = _last_line(ndgeojson_path)
+    if not line:
+        return None
+    try:
+        json.loads(line)
+    except ValueError:
+        return offset
+    return None
+
+
+def needs_repair(geojson_path: Path, ndgeojson_path: Path) -> bool:
+    if not (geojson_path.exists() and _looks_complete(geojson_path)):
+        return True
+    return _truncated_line_offset(ndgeojson_path) is not None
+
+
+def _iter_features(ndgeojson_path: Path) -> Iterator[dict]:
     with ndgeojson_path.open("r", encoding="utf-8") as f:
         for raw_line in f:
             line = raw_line.strip()
             if not line:
                 continue
             try:
-                feature = json.loads(line)
+                yield json.loads(line)
             except json.JSONDecodeError:
-                dropped += 1
-                continue
-            valid_lines.append(line)
-            valid_features.append(feature)
-    return valid_lines, valid_features, dropped
+                logger.warning("Skipping malformed line of %s", ndgeojson_path.name)
 
 
-def _rebuild_geojson(geojson_path: Path, features: list[dict]) -> None:
-    dataset_attributes = features[0].get("dataset_attributes", {})
+def _rebuild_geojson(geojson_path: Path, ndgeojson_path: Path) -> int:
+    """Rewrite a GeoJSON file from the features of its ndgeojson file, one
+    feature at a time. Returns the number of features written.
+    """
+    features = _iter_features(ndgeojson_path)
+    first_feature = next(features, None)
+    if first_feature is None:
+        return 0
+    dataset_attributes = first_feature.get("dataset_attributes", {})
+    count = 0
     with geojson_path.open("w", encoding="utf-8") as out:
         out.write('{"type":"FeatureCollection","dataset_attributes":')
         json.dump(
@@ -61,53 +111,78 @@ def _rebuild_geojson(geojson_path: Path, features: list[dict]) -> None:
             sort_keys=True,
         )
         out.write(',"features":[\n')
-        for i, feature in enumerate(features):
-            if i:
+        for feature in itertools.chain([first_feature], features):
+            if count:
                 out.write(",\n")
             cleaned = {k: v for k, v in feature.items() if k != "dataset_attributes"}
             json.dump(cleaned, out, ensure_ascii=False, separators=(",", ":"))
+            count += 1
         out.write("\n]}\n")
+    return count
 
 
 def repair_spider_output(geojson_path: Path, ndgeojson_path: Path) -> None:
     geojson_complete = geojson_path.exists() and _looks_complete(geojson_path)
 
-    valid_lines, valid_features, dropped = _split_ndgeojson_lines(ndgeojson_path)
-
-    if dropped:
-        with ndgeojson_path.open("w", encoding="utf-8") as f:
-            for line in valid_lines:
-                f.write(line + "\n")
-        logger.info(
-            "Dropped %d malformed trailing line(s) from %s",
-            dropped,
-            ndgeojson_path.name,
-        )
+    truncated_at = _truncated_line_offset(ndgeojson_path)
+    if truncated_at is not None:
+        os.truncate(ndgeojson_path, truncated_at)
+        logger.info("Dropped malformed trailing line from %s", ndgeojson_path.name)
 
     if geojson_complete:
         return
 
-    if not valid_features:
+    count = _rebuild_geojson(geojson_path, ndgeojson_path)
+    if not count:
         logger.warning(
             "%s is incomplete and %s has no usable features to rebuild from",
             geojson_path.name,
             ndgeojson_path.name,
         )
         return
-
-    _rebuild_geojson(geojson_path, valid_features)
     logger.info(
         "Rebuilt %s from %s (%d feature(s))",
         geojson_path.name,
         ndgeojson_path.name,
-        len(valid_features),
+        count,
     )
 
 
-def repair_directory(directory: Path) -> None:
-    for ndgeojson_path in sorted(directory.glob("*.ndgeojson")):
-        geojson_path = ndgeojson_path.with_suffix(".geojson")
-        repair_spider_output(geojson_path, ndgeojson_path)
+def memory_limit_bytes() -> int:
+    # As in ndgeojsons_to_parquet.py, the container can be allocated less
+    # memory than the host's physical memory.
+    total_bytes = psutil.virtual_memory().total
+    for path in (
+        Path("/sys/fs/cgroup/memory.max"),  # cgroup v2
+        Path("/sys/fs/cgroup/memory/memory.limit_in_bytes"),  # cgroup v1
+    ):
+        try:
+            return min(int(path.read_text().strip()), total_bytes)
+        except (OSError, ValueError):
+            continue
+    return total_bytes
+
+
+def worker_count(memory_bytes: int, cpu_count: int | None = None) -> int:
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return max(1, min(cpu_count, memory_bytes // WORKER_MEMORY_BYTES))
+
+
+def repair_directory(directory: Path, workers: int | None = None) -> None:
+    # Output which is complete is only checked at the end of each file, so
+    # only files left incomplete are read in full, by a pool of processes.
+    paths = [
+        (ndgeojson_path.with_suffix(".geojson"), ndgeojson_path)
+        for ndgeojson_path in sorted(directory.glob("*.ndgeojson"))
+        if needs_repair(ndgeojson_path.with_suffix(".geojson"), ndgeojson_path)
+    ]
+    if not paths:
+        return
+    workers = min(workers or worker_count(memory_limit_bytes()), len(paths))
+    logger.info("Repairing %d spider output(s) with %d worker(s)", len(paths), workers)
+    with ProcessPoolExecutor(workers) as executor:
+        for _ in executor.map(repair_spider_output, *zip(*paths)):
+            pass
 
 
 def main() -> None:
@@ -120,10 +195,11 @@ def main() -> None:
         required=True,
         help="Directory containing .geojson/.ndgeojson output files",
     )
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: based on cores and memory)")
     args = parser.parse_args()
 
     logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
-    repair_directory(Path(args.directory))
+    repair_directory(Path(args.directory), args.workers)
 
 
 if __name__ == "__main__":
@@ -27,16 +27,23 @@ RUN_URL_PREFIX="https://alltheplaces-data.openaddresses.io/${RUN_KEY_PREFIX}"
 SPIDER_RUN_DIR="${GITHUB_WORKSPACE}/output"
 PARALLELISM=${PARALLELISM:-12}
 SPIDER_TIMEOUT=${SPIDER_TIMEOUT:-28800} # default to 8 hours
+# Requests to hosts shared by many spiders are throttled across all spider
+# processes, see locations/middlewares/host_rate_limit.py
+HOST_RATE_LIMIT_DIR=$(mktemp -d)
 
 mkdir -p "${SPIDER_RUN_DIR}"
 
+# Pack the searchable points CSV files once so that spiders map them into
+# memory rather than each parsing the CSV files again.
+uv run python -m ci.build_searchable_points
+
 (>&2 echo "Writing to ${SPIDER_RUN_DIR}")
 for spider in $(uv run scrapy list -s REQUESTS_CACHE_ENABLED=False)
 do
     # The CLOSESPIDER_TIMEOUT setting is used to limit the maximum run time of each spider.
     # Sometimes spiders can hang during network operations, so we use the timeout command to enforce
     # a hard limit slightly longer than CLOSESPIDER_TIMEOUT to ensure the spider is killed.
-    echo "timeout -k 15m 495m uv run scrapy crawl --output ${SPIDER_RUN_DIR}/output/${spider}.geojson:geojson --output ${SPIDER_RUN_DIR}/output/${spider}.ndgeojson:ndgeojson --logfile ${SPIDER_RUN_DIR}/logs/${spider}.txt --loglevel ERROR --set TELNETCONSOLE_ENABLED=0 --set CLOSESPIDER_TIMEOUT=${SPIDER_TIMEOUT} --set LOGSTATS_FILE=${SPIDER_RUN_DIR}/stats/${spider}.json ${spider}" >> ${SPIDER_RUN_DIR}/commands.txt
+    echo "timeout -k 15m 495m uv run scrapy crawl --output ${SPIDER_RUN_DIR}/output/${spider}.geojson:geojson --output ${SPIDER_RUN_DIR}/output/${spider}.ndgeojson:ndgeojson --logfile ${SPIDER_RUN_DIR}/logs/${spider}.txt --loglevel ERROR --set TELNETCONSOLE_ENABLED=0 --set CLOSESPIDER_TIMEOUT=${SPIDER_TIMEOUT} --set LOGSTATS_FILE=${SPIDER_RUN_DIR}/stats/${spider}.json --set HOST_RATE_LIMIT_DIR=${HOST_RATE_LIMIT_DIR} ${spider}" >> ${SPIDER_RUN_DIR}/commands.txt
 done
 
 mkdir -p "${SPIDER_RUN_DIR}/logs"
@@ -73,12 +80,35 @@ else
     }' EXIT
 fi
 
-(>&2 echo "Running ${SPIDER_COUNT} spiders ${PARALLELISM} at a time")
-xargs -P "${PARALLELISM}" -a "${SPIDER_RUN_DIR}/commands.txt" -I CMD sh -c "CMD || true"
+# Start the longest running spiders first, using the elapsed times of spiders
+# in the previous few runs, so that a slow spider doesn't start last and
+# extend the whole run.
+PREVIOUS_RESULTS_ARGS=()
+for stats_url in $(curl --silent "https://data.alltheplaces.xyz/runs/history.json" | jq --raw-output '.[-3:][].stats_url // empty')
+do
+    PREVIOUS_RESULTS_ARGS+=(--results "${stats_url}")
+done
+
+uv run python -m ci.schedule_spiders plan \
+    --commands "${SPIDER_RUN_DIR}/commands.txt" \
+    "${PREVIOUS_RESULTS_ARGS[@]}" \
+    --output "${SPIDER_RUN_DIR}/schedule.txt"
+
+retval=$?
+if [ ! $retval -eq 0 ]; then
+    (>&2 echo "Couldn't schedule spiders, running ${SPIDER_COUNT} spiders ${PARALLELISM} at a time in list order")
+    xargs -P "${PARALLELISM}" -a "${SPIDER_RUN_DIR}/commands.txt" -I CMD sh -c "CMD || true"
+else
+    (>&2 echo "Running ${SPIDER_COUNT} spiders ${PARALLELISM} at a time")
+    uv run python -m ci.schedule_spiders run \
+        "${SPIDER_RUN_DIR}/schedule.txt" \
+        --parallelism "${PARALLELISM}" \
+        --report "${SPIDER_RUN_DIR}/stats/_schedule.json"
+fi
 
 retval=$?
 if [ ! $retval -eq 0 ]; then
-    (>&2 echo "xargs failed with exit code ${retval}")
+    (>&2 echo "Running spiders failed with exit code ${retval}")
     exit 1
 fi
 (>&2 echo "Done running spiders")
@@ -91,7 +121,17 @@ fi
 (>&2 echo "Repairing any GeoJSON output left incomplete by a killed spider")
 uv run python ci/repair_truncated_geojson.py --directory "${SPIDER_RUN_DIR}/output"
 
-OUTPUT_LINECOUNT=$(cat "${SPIDER_RUN_DIR}"/output/*.geojson | wc -l | tr -d ' ')
+(>&2 echo "Writing out summary JSON")
+OUTPUT_LINECOUNT=$(uv run python -m ci.build_results_json \
+    --stats-dir "${SPIDER_RUN_DIR}/stats" \
+    --output-dir "${SPIDER_RUN_DIR}/output")
+
+retval=$?
+if [ ! $retval -eq 0 ]; then
+    (>&2 echo "Couldn't write summary JSON")
+    exit 1
+fi
+(>&2 echo "Wrote out summary JSON")
 (>&2 echo "Generated ${OUTPUT_LINECOUNT} lines")
 
 tippecanoe --cluster-distance=25 \
@@ -114,9 +154,21 @@ else
     include_pmtiles=true
 fi
 
-uv run python ci/ndgeojsons_to_parquet.py \
+# Per-spider parquet files are staged in PARQUET_STAGING_DIR if set, and
+# reused by later runs for spiders whose output hasn't changed.
+PARQUET_ARGS=()
+if [ -n "${PARQUET_STAGING_DIR}" ]; then
+    PARQUET_ARGS+=(--staging-dir "${PARQUET_STAGING_DIR}")
+fi
+# Set PARQUET_COLUMNAR_PROPERTIES=true to write the most used properties as
+# columns of their own rather than in the properties map.
+if [ "${PARQUET_COLUMNAR_PROPERTIES}" = true ]; then
+    PARQUET_ARGS+=(--columnar-properties)
+fi
+uv run python -m ci.ndgeojsons_to_parquet \
     --directory "${SPIDER_RUN_DIR}/output" \
-    --output "${SPIDER_RUN_DIR}/output.parquet"
+    --output "${SPIDER_RUN_DIR}/output.parquet" \
+    "${PARQUET_ARGS[@]}"
 retval=$?
 if [ ! $retval -eq 0 ]; then
     (>&2 echo "Couldn't create parquet file from ndgeojsons, won't include in output")
@@ -133,52 +185,33 @@ rm "${SPIDER_RUN_DIR}"/output/*.ndgeojson
 uv run scrapy insights --atp-nsi-osm "${SPIDER_RUN_DIR}/output" --outfile "${SPIDER_RUN_DIR}/stats/_insights.json"
 (>&2 echo "Done comparing against Name Suggestion Index and OpenStreetMap")
 
-(>&2 echo "Writing out summary JSON")
-echo "{\"count\": ${SPIDER_COUNT}, \"results\": []}" >> "${SPIDER_RUN_DIR}/stats/_results.json"
-for spider in $(uv run scrapy list)
-do
-    statistics_json="${SPIDER_RUN_DIR}/stats/${spider}.json"
-
-    if [ ! -f "${statistics_json}" ]; then
-        (>&2 echo "Couldn't find ${statistics_json}")
-        continue
-    fi
-
-    feature_count=$(jq --raw-output '.item_scraped_count' "${statistics_json}")
-    retval=$?
-    if [ ! $retval -eq 0 ] || [ "${feature_count}" == "null" ]; then
-        feature_count="0"
-    fi
-
-    error_count=$(jq --raw-output '."log_count/ERROR"' "${statistics_json}")
-    retval=$?
-    if [ ! $retval -eq 0 ] || [ "${error_count}" == "null" ]; then
-        error_count="0"
-    fi
-
-    elapsed_time=$(jq --raw-output '.elapsed_time_seconds' "${statistics_json}")
-    retval=$?
-    if [ ! $retval -eq 0 ] || [ "${elapsed_time}" == "null" ]; then
-        elapsed_time="0"
-    fi
-
-    spider_filename=$(uv run scrapy spider_filename "${spider}")
-
-    # use JQ to create an overall results JSON
-    jq --compact-output \
-        --arg spider_name "${spider}" \
-        --arg spider_feature_count ${feature_count} \
-        --arg spider_error_count ${error_count} \
-        --arg spider_elapsed_time ${elapsed_time} \
-        --arg spider_filename ${spider_filename} \
-        '.results += [{"spider": $spider_name, "filename": $spider_filename, "errors": $spider_error_count | tonumber, "features": $spider_feature_count | tonumber, "elapsed_time": $spider_elapsed_time | tonumber}]' \
-        "${SPIDER_RUN_DIR}/stats/_results.json" > "${SPIDER_RUN_DIR}/stats/_results.json.tmp"
-    mv "${SPIDER_RUN_DIR}/stats/_results.json.tmp" "${SPIDER_RUN_DIR}/stats/_results.json"
-done
-(>&2 echo "Wrote out summary JSON")
+# Write the features each spider added, changed and removed since the
+# previous run, so that consumers can apply those rather than download all of
+# the output again
+(>&2 echo "Comparing output with the previous run")
+CHANGES_ARGS=(
+    --output-dir "${SPIDER_RUN_DIR}/output"
+    --changes-dir "${SPIDER_RUN_DIR}/changes"
+    --output "${SPIDER_RUN_DIR}/stats/_changes.json"
+    --run-id "${RUN_TIMESTAMP}"
+)
+PREVIOUS_RUN_URL_PREFIX=$(curl --silent "https://data.alltheplaces.xyz/runs/history.json" | jq --raw-output '.[-1].output_url // empty' | sed 's|/output.zip$||')
+if [ -n "${PREVIOUS_RUN_URL_PREFIX}" ]; then
+    CHANGES_ARGS+=(--previous-run "${PREVIOUS_RUN_URL_PREFIX}")
+fi
+uv run python -m ci.diff_spider_output "${CHANGES_ARGS[@]}"
+retval=$?
+if [ ! $retval -eq 0 ]; then
+    (>&2 echo "Couldn't compare output with the previous run, won't include changes")
+fi
 
+# Files are compressed in parallel, and the size and SHA-256 of the zip and
+# of each file in it recorded for latest.json.
 (>&2 echo "Compressing output files")
-(cd "${SPIDER_RUN_DIR}" && zip -qr output.zip output)
+uv run python -m ci.package_output \
+    --directory "${SPIDER_RUN_DIR}/output" \
+    --output "${SPIDER_RUN_DIR}/output.zip" \
+    --manifest "${SPIDER_RUN_DIR}/stats/_output_manifest.json"
 
 retval=$?
 if [ ! $retval -eq 0 ]; then
@@ -187,7 +220,9 @@ if [ ! $retval -eq 0 ]; then
 fi
 
 (>&2 echo "Compressing log files")
-(cd "${SPIDER_RUN_DIR}" && zip -qr logs.zip logs)
+uv run python -m ci.package_output \
+    --directory "${SPIDER_RUN_DIR}/logs" \
+    --output "${SPIDER_RUN_DIR}/logs.zip"
 
 retval=$?
 if [ ! $retval -eq 0 ]; then
@@ -223,7 +258,8 @@ if [ ! $retval -eq 0 ]; then
 fi
 
 (>&2 echo "Saving embed to https://data.alltheplaces.xyz/runs/latest/info_embed.html")
-OUTPUT_FILESIZE=$(du -b "${SPIDER_RUN_DIR}/output.zip"  | awk '{ print $1 }')
+OUTPUT_FILESIZE=$(jq .size_bytes "${SPIDER_RUN_DIR}/stats/_output_manifest.json")
+OUTPUT_SHA256=$(jq -r .sha256 "${SPIDER_RUN_DIR}/stats/_output_manifest.json")
 OUTPUT_FILESIZE_PRETTY=$(echo "$OUTPUT_FILESIZE" | numfmt --to=si --format=%0.1f)
 cat > "${SPIDER_RUN_DIR}/info_embed.html" << EOF
 <html><body>
@@ -259,9 +295,10 @@ jq -n --compact-output \
     --arg run_start_time "${RUN_START}" \
     --arg run_end_time "${RUN_END}" \
     --arg run_output_size "${OUTPUT_FILESIZE}" \
+    --arg run_output_sha256 "${OUTPUT_SHA256}" \
     --arg run_spider_count "${SPIDER_COUNT}" \
     --arg run_line_count "${OUTPUT_LINECOUNT}" \
-    '{"run_id": $run_id, "output_url": $run_output_url, "pmtiles_url": $run_pmtiles_url, "parquet_url": $run_parquet_url, "stats_url": $run_stats_url, "insights_url": $run_insights_url, "start_time": $run_start_time, "end_time": $run_end_time, "size_bytes": $run_output_size | tonumber, "spiders": $run_spider_count | tonumber, "total_lines": $run_line_count | tonumber }' \
+    '{"run_id": $run_id, "output_url": $run_output_url, "pmtiles_url": $run_pmtiles_url, "parquet_url": $run_parquet_url, "stats_url": $run_stats_url, "insights_url": $run_insights_url, "start_time": $run_start_time, "end_time": $run_end_time, "size_bytes": $run_output_size | tonumber, "sha256": $run_output_sha256, "spiders": $run_spider_count | tonumber, "total_lines": $run_line_count | tonumber }' \
     > latest.json
 
 retval=$?
@@ -97,7 +97,18 @@ fi
 (>&2 echo "Repairing any GeoJSON output left incomplete by a killed spider")
 uv run python ci/repair_truncated_geojson.py --directory "${SPIDER_RUN_DIR}/output"
 
-OUTPUT_LINECOUNT=$(cat "${SPIDER_RUN_DIR}"/output/*.geojson | wc -l | tr -d ' ')
+(>&2 echo "Writing out summary JSON")
+OUTPUT_LINECOUNT=$(uv run python -m ci.build_results_json \
+    --stats-dir "${SPIDER_RUN_DIR}/stats" \
+    --spider-list "${SPIDER_RUN_DIR}/spider_list.txt" \
+    --output-dir "${SPIDER_RUN_DIR}/output")
+
+retval=$?
+if [ ! $retval -eq 0 ]; then
+    (>&2 echo "Couldn't write summary JSON")
+    exit 1
+fi
+(>&2 echo "Wrote out summary JSON")
 (>&2 echo "Generated ${OUTPUT_LINECOUNT} lines")
 
 # Generate pmtiles
@@ -122,9 +133,21 @@ else
 fi
 
 # Generate parquet
-uv run python ci/ndgeojsons_to_parquet.py \
+# Per-spider parquet files are staged in PARQUET_STAGING_DIR if set, and
+# reused by later runs for spiders whose output hasn't changed.
+PARQUET_ARGS=()
+if [ -n "${PARQUET_STAGING_DIR}" ]; then
+    PARQUET_ARGS+=(--staging-dir "${PARQUET_STAGING_DIR}")
+fi
+# Set PARQUET_COLUMNAR_PROPERTIES=true to write the most used properties as
+# columns of their own rather than in the properties map.
+if [ "${PARQUET_COLUMNAR_PROPERTIES}" = true ]; then
+    PARQUET_ARGS+=(--columnar-properties)
+fi
+uv run python -m ci.ndgeojsons_to_parquet \
     --directory "${SPIDER_RUN_DIR}/output" \
-    --output "${SPIDER_RUN_DIR}/${RUN_GROUP}.parquet"
+    --output "${SPIDER_RUN_DIR}/${RUN_GROUP}.parquet" \
+    "${PARQUET_ARGS[@]}"
 retval=$?
 if [ ! $retval -eq 0 ]; then
     (>&2 echo "Couldn't create parquet file from ndgeojsons, won't include in output")
@@ -138,52 +161,41 @@ rm "${SPIDER_RUN_DIR}"/output/*.ndgeojson
 
 (>&2 echo "Done creating parquet file")
 
-# Summarize stats from spider_list.txt instead of calling scrapy list again
-(>&2 echo "Writing out summary JSON")
-echo "{\"count\": ${SPIDER_COUNT}, \"results\": []}" >> "${SPIDER_RUN_DIR}/stats/_results.json"
-while IFS= read -r spider; do
-    statistics_json="${SPIDER_RUN_DIR}/stats/${spider}.json"
-
-    if [ ! -f "${statistics_json}" ]; then
-        (>&2 echo "Couldn't find ${statistics_json}")
-        continue
-    fi
-
-    feature_count=$(jq --raw-output '.item_scraped_count' "${statistics_json}")
-    retval=$?
-    if [ ! $retval -eq 0 ] || [ "${feature_count}" == "null" ]; then
-        feature_count="0"
-    fi
-
-    error_count=$(jq --raw-output '."log_count/ERROR"' "${statistics_json}")
-    retval=$?
-    if [ ! $retval -eq 0 ] || [ "${error_count}" == "null" ]; then
-        error_count="0"
-    fi
-
-    elapsed_time=$(jq --raw-output '.elapsed_time_seconds' "${statistics_json}")
-    retval=$?
-    if [ ! $retval -eq 0 ] || [ "${elapsed_time}" == "null" ]; then
-        elapsed_time="0"
-    fi
-
-    spider_filename=$(uv run scrapy spider_filename "${spider}")
-
-    jq --compact-output \
-        --arg spider_name "${spider}" \
-        --arg spider_feature_count ${feature_count} \
-        --arg spider_error_count ${error_count} \
-        --arg spider_elapsed_time ${elapsed_time} \
-        --arg spider_filename ${spider_filename} \
-        '.results += [{"spider": $spider_name, "filename": $spider_filename, "errors": $spider_error_count | tonumber, "features": $spider_feature_count | tonumber, "elapsed_time": $spider_elapsed_time | tonumber}]' \
-        "${SPIDER_RUN_DIR}/stats/_results.json" > "${SPIDER_RUN_DIR}/stats/_results.json.tmp"
-    mv "${SPIDER_RUN_DIR}/stats/_results.json.tmp" "${SPIDER_RUN_DIR}/stats/_results.json"
-done < "${SPIDER_RUN_DIR}/spider_list.txt"
-(>&2 echo "Wrote out summary JSON")
+# Download the previous manifest (if it exists), which links to the previous
+# output of each spider, to compare against and to update below
+PREVIOUS_MANIFEST=$(mktemp)
+uv run aws s3 cp \
+    --only-show-errors \
+    "s3://${S3_BUCKET}/runs/latest/${RUN_GROUP}.manifest.json" \
+    "${PREVIOUS_MANIFEST}" || true
+
+# Write the features each spider added, changed and removed since its
+# previous output, so that consumers can apply those rather than download
+# all of the output again
+(>&2 echo "Comparing output with the previous run")
+CHANGES_ARGS=(
+    --output-dir "${SPIDER_RUN_DIR}/output"
+    --changes-dir "${SPIDER_RUN_DIR}/changes"
+    --output "${SPIDER_RUN_DIR}/stats/_changes.json"
+    --run-id "${RUN_TIMESTAMP}"
+)
+if [ -s "${PREVIOUS_MANIFEST}" ]; then
+    CHANGES_ARGS+=(--previous-manifest "${PREVIOUS_MANIFEST}")
+fi
+uv run python -m ci.diff_spider_output "${CHANGES_ARGS[@]}"
+retval=$?
+if [ ! $retval -eq 0 ]; then
+    (>&2 echo "Couldn't compare output with the previous run, won't include changes")
+fi
 
 # Create per-group zip
+# Files are compressed in parallel, and the size and SHA-256 of the zip and
+# of each file in it recorded for latest.json.
 (>&2 echo "Compressing output files")
-(cd "${SPIDER_RUN_DIR}" && zip -qr "${RUN_GROUP}.zip" output)
+uv run python -m ci.package_output \
+    --directory "${SPIDER_RUN_DIR}/output" \
+    --output "${SPIDER_RUN_DIR}/${RUN_GROUP}.zip" \
+    --manifest "${SPIDER_RUN_DIR}/stats/_output_manifest.json"
 
 retval=$?
 if [ ! $retval -eq 0 ]; then
@@ -221,7 +233,8 @@ if [ ! $retval -eq 0 ]; then
 fi
 
 RUN_END=$(date -u +%Y-%m-%dT%H:%M:%SZ)
-OUTPUT_FILESIZE=$(du -b "${SPIDER_RUN_DIR}/${RUN_GROUP}.zip" | awk '{ print $1 }')
+OUTPUT_FILESIZE=$(jq .size_bytes "${SPIDER_RUN_DIR}/stats/_output_manifest.json")
+OUTPUT_SHA256=$(jq -r .sha256 "${SPIDER_RUN_DIR}/stats/_output_manifest.json")
 
 # Create per-group latest.json
 (>&2 echo "Creating per-group latest.json")
@@ -236,9 +249,10 @@ jq -n --compact-output \
     --arg run_start_time "${RUN_START}" \
     --arg run_end_time "${RUN_END}" \
     --arg run_output_size "${OUTPUT_FILESIZE}" \
+    --arg run_output_sha256 "${OUTPUT_SHA256}" \
     --arg run_spider_count "${SPIDER_COUNT}" \
     --arg run_line_count "${OUTPUT_LINECOUNT}" \
-    '{"run_id": $run_id, "group": $run_group, "output_url": $run_output_url, "pmtiles_url": $run_pmtiles_url, "parquet_url": $run_parquet_url, "stats_url": $run_stats_url, "start_time": $run_start_time, "end_time": $run_end_time, "size_bytes": $run_output_size | tonumber, "spiders": $run_spider_count | tonumber, "total_lines": $run_line_count | tonumber }' \
+    '{"run_id": $run_id, "group": $run_group, "output_url": $run_output_url, "pmtiles_url": $run_pmtiles_url, "parquet_url": $run_parquet_url, "stats_url": $run_stats_url, "start_time": $run_start_time, "end_time": $run_end_time, "size_bytes": $run_output_size | tonumber, "sha256": $run_output_sha256, "spiders": $run_spider_count | tonumber, "total_lines": $run_line_count | tonumber }' \
     > latest.json
 
 retval=$?
@@ -331,12 +345,6 @@ fi
 # Build group manifest
 (>&2 echo "Building group manifest for ${RUN_GROUP}")
 
-# Download previous manifest (if it exists)
-uv run aws s3 cp \
-    --only-show-errors \
-    "s3://${S3_BUCKET}/runs/latest/${RUN_GROUP}.manifest.json" \
-    "${SPIDER_RUN_DIR}/previous_manifest.json" || true
-
 MANIFEST_ARGS=(
     --group "${RUN_GROUP}"
     --run-id "${RUN_TIMESTAMP}"
@@ -346,8 +354,12 @@ MANIFEST_ARGS=(
     --output "${SPIDER_RUN_DIR}/${RUN_GROUP}.manifest.json"
 )
 
-if [ -s "${SPIDER_RUN_DIR}/previous_manifest.json" ]; then
-    MANIFEST_ARGS+=(--previous-manifest "${SPIDER_RUN_DIR}/previous_manifest.json")
+if [ -s "${PREVIOUS_MANIFEST}" ]; then
+    MANIFEST_ARGS+=(--previous-manifest "${PREVIOUS_MANIFEST}")
+fi
+
+if [ -s "${SPIDER_RUN_DIR}/stats/_changes.json" ]; then
+    MANIFEST_ARGS+=(--changes "${SPIDER_RUN_DIR}/stats/_changes.json")
 fi
 
 uv run python ci/build_group_manifest.py "${MANIFEST_ARGS[@]}"
@@ -0,0 +1,271 @@
+import heapq
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser, ArgumentTypeError
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+BROWSER = "browser"
+PROXY = "proxy"
+HTTP = "http"
+# Browser spiders each run a browser, so far fewer of them fit in memory at
+# once than other spiders.
+DEFAULT_CLASS_LIMITS = {BROWSER: 4}
+
+
+class Job(NamedTuple):
+    spider: str
+    resource_class: str
+    predicted_seconds: float
+    command: str
+
+
+def load_runtimes(results_sources: Iterable[str], stats_dir: Path | None = None) -> dict[str, list[float]]:
+    """
+    Collect the elapsed time of each spider from previous runs, from
+    `_results.json` files (paths or URLs) and from a directory of per-spider
+    stats JSON files. Spiders which did not record an elapsed time are
+    ignored.
+    """
+    runtimes = {}
+    for source in results_sources:
+        try:
+            if source.startswith(("http://", "https://")):
+                results = requests.get(source, timeout=60).json()
+            else:
+                results = json.loads(Path(source).read_text())
+        except (requests.RequestException, OSError, ValueError) as e:
+            logger.warning(f"Couldn't read previous results from {source}: {e}")
+            continue
+        for result in results.get("results", []):
+            if elapsed_time := result.get("elapsed_time"):
+                runtimes.setdefault(result["spider"], []).append(float(elapsed_time))
+    if stats_dir is not None:
+        for stats_file in stats_dir.glob("*.json"):
+            if stats_file.name.startswith("_"):
+                continue
+            try:
+                elapsed_time = json.loads(stats_file.read_text()).get("elapsed_time_seconds")
+            except (OSError, ValueError):
+                continue
+            if elapsed_time:
+                runtimes.setdefault(stats_file.stem, []).append(float(elapsed_time))
+    return runtimes
+
+
+def classify_spider(spidercls: type) -> str:
+    """
+    The resource class of a spider: BROWSER for spiders using Playwright or
+    Camoufox, PROXY for spiders using the Zyte API proxy and otherwise HTTP.
+    """
+    from locations.playwright_spider import PlaywrightSpider
+
+    custom_settings = getattr(spidercls, "custom_settings", None) or {}
+    if issubclass(spidercls, PlaywrightSpider) or any(
+        key.startswith(("PLAYWRIGHT_", "CAMOUFOX_")) for key in custom_settings
+    ):
+        return BROWSER
+    if getattr(spidercls, "requires_proxy", False):
+        return PROXY
+    return HTTP
+
+
+def predict_runtimes(spider_classes: dict[str, str], runtimes: dict[str, list[float]]) -> dict[str, float]:
+    """
+    Predict the runtime of each spider as the median of its previous
+    runtimes. Spiders without previous runtimes, such as new spiders, are
+    predicted to take the median runtime of other spiders of the same
+    resource class.
+    """
+    predictions = {spider: statistics.median(runtimes[spider]) for spider in spider_classes if runtimes.get(spider)}
+    class_medians = {}
+    for resource_class in set(spider_classes.values()):
+        known = [predictions[s] for s, c in spider_classes.items() if c == resource_class and s in predictions]
+        class_medians[resource_class] = statistics.median(known) if known else 0.0
+    for spider, resource_class in spider_classes.items():
+        predictions.setdefault(spider, class_medians[resource_class])
+    return predictions
+
+
+def check_limits(parallelism: int, class_limits: dict[str, int]) -> None:
+    # A limit below 1 would leave jobs which can never be started.
+    if parallelism < 1:
+        raise ValueError(f"parallelism must be at least 1, not {parallelism}")
+    for resource_class, limit in class_limits.items():
+        if limit < 1:
+            raise ValueError(f"The limit of resource class {resource_class} must be at least 1, not {limit}")
+
+
+def class_limit(value: str) -> tuple[str, int]:
+    resource_class, _, limit = value.partition("=")
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ArgumentTypeError(f"expected class=limit, not {value!r}")
+    if limit < 1:
+        raise ArgumentTypeError(f"the limit of {resource_class} must be at least 1, not {limit}")
+    return resource_class, limit
+
+
+def next_job(pending: list[Job], running: dict[str, int], class_limits: dict[str, int]) -> Job | None:
+    """
+    Remove and return the longest pending job whose resource class is below
+    its concurrency limit. `pending` must be sorted longest first.
+    """
+    for i, job in enumerate(pending):
+        if running.get(job.resource_class, 0) < class_limits.get(job.resource_class, sys.maxsize):
+            return pending.pop(i)
+    return None
+
+
+def simulate(jobs: list[Job], parallelism: int, class_limits: dict[str, int]) -> float:
+    """
+    Predict the makespan of running `jobs` with `run`, assuming each job
+    takes its predicted runtime.
+    """
+    check_limits(parallelism, class_limits)
+    pending = sorted(jobs, key=lambda job: job.predicted_seconds, reverse=True)
+    running = {}
+    finishing = []
+    now = 0.0
+    while pending or finishing:
+        while len(finishing) < parallelism and (job := next_job(pending, running, class_limits)):
+            running[job.resource_class] = running.get(job.resource_class, 0) + 1
+            heapq.heappush(finishing, (now + job.predicted_seconds, len(pending), job.resource_class))
+        now, _, resource_class = heapq.heappop(finishing)
+        running[resource_class] -= 1
+    return now
+
+
+def run(jobs: list[Job], parallelism: int, class_limits: dict[str, int]) -> dict:
+    """
+    Run the command of each job, at most `parallelism` at a time, starting
+    the longest jobs first (longest processing time first scheduling),
+    subject to the concurrency limit of each resource class. The exit code
+    of a command is ignored. Returns a report of predicted and actual
+    runtimes.
+    """
+    check_limits(parallelism, class_limits)
+    pending = sorted(jobs, key=lambda job: job.predicted_seconds, reverse=True)
+    running = {}
+    processes = {}
+    report = {
+        "parallelism": parallelism,
+        "class_limits": class_limits,
+        "predicted_makespan_seconds": simulate(jobs, parallelism, class_limits),
+        "jobs": [],
+    }
+    start = time.monotonic()
+    while pending or processes:
+        while len(processes) < parallelism and (job := next_job(pending, running, class_limits)):
+            running[job.resource_class] = running.get(job.resource_class, 0) + 1
+            process = subprocess.Popen(job.command, shell=True)
+            processes[process.pid] = (process, job, time.monotonic())
+        pid, status = os.wait()
+        if pid not in processes:
+            continue
+        process, job, job_start = processes.pop(pid)
+        # The process was reaped by os.wait() rather than by Popen.
+        process.returncode = os.waitstatus_to_exitcode(status)
+        running[job.resource_class] -= 1
+        report["jobs"].append(
+            {
+                "spider": job.spider,
+                "resource_class": job.resource_class,
+                "predicted_seconds": job.predicted_seconds,
+                "start_seconds": round(job_start - start, 1),
+                "elapsed_seconds": round(time.monotonic() - job_start, 1),
+            }
+        )
+    report["actual_makespan_seconds"] = round(time.monotonic() - start, 1)
+    return report
+
+
+def read_jobs(schedule: Path) -> list[Job]:
+    jobs = []
+    for line in schedule.read_text().splitlines():
+        if line:
+            spider, resource_class, predicted_seconds, command = line.split("\t", 3)
+            jobs.append(Job(spider, resource_class, float(predicted_seconds), command))
+    return jobs
+
+
+def plan_command(args) -> None:
+    from scrapy.spiderloader import SpiderLoader
+    from scrapy.utils.project import get_project_settings
+
+    spider_loader = SpiderLoader.from_settings(get_project_settings())
+    # The spider is the last argument of each command.
+    commands = {line.split()[-1]: line for line in Path(args.commands).read_text().splitlines() if line.strip()}
+    spider_classes = {spider: classify_spider(spider_loader.load(spider)) for spider in commands}
+    predictions = predict_runtimes(
+        spider_classes, load_runtimes(args.results, Path(args.stats_dir) if args.stats_dir else None)
+    )
+    jobs = sorted(
+        (Job(spider, spider_classes[spider], predictions[spider], command) for spider, command in commands.items()),
+        key=lambda job: job.predicted_seconds,
+        reverse=True,
+    )
+    with open(args.output, "w") as f:
+        for job in jobs:
+            f.write(f"{job.spider}\t{job.resource_class}\t{job.predicted_seconds}\t{job.command}\n")
+    class_counts = {c: sum(1 for job in jobs if job.resource_class == c) for c in (BROWSER, PROXY, HTTP)}
+    logger.info(f"Scheduled {len(jobs)} spiders: {class_counts}")
+
+
+def run_command(args) -> None:
+    class_limits = DEFAULT_CLASS_LIMITS | dict(args.class_limit)
+    jobs = read_jobs(Path(args.schedule))
+    logger.info(
+        f"Running {len(jobs)} spiders {args.parallelism} at a time, predicted makespan {simulate(jobs, args.parallelism, class_limits):.0f} seconds"
+    )
+    report = run(jobs, args.parallelism, class_limits)
+    logger.info(
+        f"Predicted makespan {report['predicted_makespan_seconds']:.0f} seconds, actual makespan {report['actual_makespan_seconds']:.0f} seconds"
+    )
+    if args.report:
+        Path(args.report).write_text(json.dumps(report))
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+    parser = ArgumentParser(description="Schedule spiders longest first using runtimes from previous runs")
+    subparsers = parser.add_subparsers(required=True)
+
+    plan_parser = subparsers.add_parser("plan", help="Order spider commands by predicted runtime")
+    plan_parser.add_argument("--commands", required=True, help="File of spider commands, one per line")
+    plan_parser.add_argument(
+        "--results", action="append", default=[], help="_results.json of a previous run (path or URL, repeatable)"
+    )
+    plan_parser.add_argument("--stats-dir", help="Directory of per-spider stats JSON files of a previous run")
+    plan_parser.add_argument("--output", required=True, help="Schedule file to write")
+    plan_parser.set_defaults(func=plan_command)
+
+    run_parser = subparsers.add_parser("run", help="Run a schedule file")
+    run_parser.add_argument("schedule", help="Schedule file written by plan")
+    run_parser.add_argument("--parallelism", type=int, default=12, help="Number of spiders to run at once")
+    run_parser.add_argument(
+        "--class-limit",
+        action="append",
+        default=[],
+        type=class_limit,
+        help=f"Maximum number of spiders of a resource class ({BROWSER}, {PROXY}, {HTTP}) to run at once, as class=limit (repeatable)",
+    )
+    run_parser.add_argument("--report", help="File to write a JSON report of predicted and actual runtimes to")
+    run_parser.set_defaults(func=run_command)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
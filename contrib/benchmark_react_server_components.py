@@ -0,0 +1,53 @@
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+from locations.react_server_components import LazyRSC, parse_rsc
+
+
+def synthetic_payload(stores: int = 5000) -> bytes:
+    """
+    A React Flight stream similar to those of Next.js store finders, with
+    many small component rows and one large row of store data.
+    """
+    rows = ['{:x}:I["{}",["static/chunks/{}.js"],"Component{}"]'.format(i, i, i, i).encode() for i in range(1, 200)]
+    stores_json = json.dumps(
+        [
+            {
+                "id": i,
+                "name": "Store {}".format(i),
+                "lat": 51.5 + i / 1e4,
+                "lng": -0.1,
+                "address": "{} High St".format(i),
+            }
+            for i in range(stores)
+        ]
+    )
+    rows.append('c8:["$","div",null,{{"stores":{}}}]'.format(stores_json).encode())
+    text = "Lorem ipsum dolor sit amet. " * 100
+    # Length prefixed rows are not newline terminated.
+    return b"\n".join(rows) + "\nc9:T{:x},{}".format(len(text.encode()), text).encode()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark parsing React Flight (RSC) payloads")
+    parser.add_argument("payloads", nargs="*", type=Path, help="Captured RSC payload files (default: synthetic)")
+    parser.add_argument("-n", "--number", type=int, default=20, help="Number of parses per payload")
+    args = parser.parse_args()
+
+    payloads = {path.name: path.read_bytes() for path in args.payloads} or {"synthetic": synthetic_payload()}
+    for name, payload in payloads.items():
+        last_row_id = list(LazyRSC(payload))[-1]
+        results = {
+            "parse_rsc": timeit.timeit(lambda: dict(parse_rsc(payload)), number=args.number),
+            "LazyRSC (one row)": timeit.timeit(lambda: LazyRSC(payload)[last_row_id], number=args.number),
+        }
+        sys.stdout.write("{} ({} bytes)\n".format(name, len(payload)))
+        for method, elapsed in results.items():
+            sys.stdout.write("  {}: {:.2f} ms\n".format(method, elapsed / args.number * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import csv
+import shutil
+from io import TextIOWrapper
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import IO, Any, AsyncIterator, Iterable
+from zipfile import ZipFile
+
+import pyarrow
+import requests
+import requests_cache
+from pyarrow import csv as pyarrow_csv
+from scrapy import Spider
+from scrapy.http import Response
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet.threads import deferToThread
+
+from locations.items import CompactFeature, Feature
+
+
+def read_next_batch(reader: pyarrow.RecordBatchReader) -> pyarrow.RecordBatch | None:
+    # StopIteration can't be raised through a Deferred converted to a Future.
+    try:
+        return reader.read_next_batch()
+    except StopIteration:
+        return None
+
+
+class BulkCSVSpider(Spider):
+    """
+    A BulkCSVSpider extracts features from very large CSV files, or ZIP
+    archives of CSV files, such as national address registers.
+
+    Each URL of `csv_urls` is downloaded to a temporary file in a background
+    thread, and then each CSV file is read in columnar batches with
+    pyarrow.csv, also in a background thread. Scrapy remains responsive while
+    files are downloaded and parsed, and a file is never held in memory in
+    its entirety.
+
+    Feature fields are populated from CSV columns declared with
+    `field_mapping` (Feature field name: column name) and `extras_mapping`
+    (extras key: column name). Empty values are omitted. DictParser is not
+    used. All values are read as strings. Items are CompactFeature instances
+    to reduce the memory used by each item.
+
+    To use this spider:
+      1. Specify `csv_urls`, and `csv_delimiter` if the delimiter is not a
+         comma.
+      2. Specify `field_mapping` and `extras_mapping`.
+      3. Optionally override `filter_batch` to drop rows from each batch of
+         rows using pyarrow.compute, which is much faster than filtering
+         rows individually.
+      4. Optionally override `post_process_item` to modify each item,
+         with access to the full row as a dictionary.
+    """
+
+    start_urls = ["data:,"]
+    csv_urls: list[str] = []
+    csv_delimiter: str = ","
+    csv_encoding: str = "utf8"
+    # Number of bytes of CSV parsed into each batch of rows.
+    csv_block_size: int = 16 * 1024 * 1024
+    field_mapping: dict[str, str] = {}
+    extras_mapping: dict[str, str] = {}
+
+    async def parse(self, response: Response, **kwargs: Any) -> AsyncIterator[Feature]:
+        for url in self.csv_urls:
+            with TemporaryDirectory() as tmp_dir:
+                self.logger.info(f"Downloading {url}")
+                filepath = await maybe_deferred_to_future(deferToThread(self.download_file, url, Path(tmp_dir)))
+                if filepath.suffix.lower() == ".zip":
+                    with ZipFile(filepath, "r") as zip_file:
+                        for csv_file in zip_file.namelist():
+                            if not csv_file.lower().endswith(".csv"):
+                                continue
+                            self.logger.info(f"Processing CSV file: {csv_file}")
+                            columns = self.read_column_names(zip_file.open(csv_file, "r"))
+                            async for item in self.parse_csv_file(zip_file.open(csv_file, "r"), columns):
+                                yield item
+                else:
+                    columns = self.read_column_names(open(filepath, "rb"))
+                    async for item in self.parse_csv_file(open(filepath, "rb"), columns):
+                        yield item
+
+    def download_file(self, url: str, directory: Path) -> Path:
+        """
+        Download `url` to a file in `directory`, streaming to disk. This runs
+        in a background thread.
+        """
+        filepath = directory / url.split("?", 1)[0].rsplit("/", 1)[-1]
+        with requests_cache.disabled():
+            with requests.get(url, stream=True, timeout=self.settings.getint("DOWNLOAD_TIMEOUT")) as r:
+                r.raise_for_status()
+                with open(filepath, "wb") as f:
+                    shutil.copyfileobj(r.raw, f)
+        if "Content-Length" in r.headers and int(r.headers["Content-Length"]) != filepath.stat().st_size:
+            raise Exception("Incomplete download")
+        return filepath
+
+    def read_column_names(self, file: IO[bytes]) -> list[str]:
+        with file:
+            return next(csv.reader(TextIOWrapper(file, encoding=self.csv_encoding), delimiter=self.csv_delimiter))
+
+    async def parse_csv_file(self, file: IO[bytes], columns: list[str]) -> AsyncIterator[Feature]:
+        with file:
+            # Read every column as a string (as csv.DictReader would) rather
+            # than inferring types, so that references such as "0012" are not
+            # converted to integers.
+            reader = pyarrow_csv.open_csv(
+                file,
+                read_options=pyarrow_csv.ReadOptions(
+                    encoding=self.csv_encoding, block_size=self.csv_block_size, use_threads=True
+                ),
+                parse_options=pyarrow_csv.ParseOptions(delimiter=self.csv_delimiter),
+                convert_options=pyarrow_csv.ConvertOptions(
+                    column_types={column: pyarrow.string() for column in columns}, strings_can_be_null=False
+                ),
+            )
+            while (batch := await maybe_deferred_to_future(deferToThread(read_next_batch, reader))) is not None:
+                batch = self.filter_batch(batch)
+                for row in batch.to_pylist():
+                    for item in self.post_process_item(self.map_row(row), row):
+                        yield item
+
+    def filter_batch(self, batch: pyarrow.RecordBatch) -> pyarrow.RecordBatch:
+        """Override to drop rows from a batch of rows, ie using `batch.filter(...)`"""
+        return batch
+
+    def map_row(self, row: dict) -> Feature:
+        item = CompactFeature()
+        for field, column in self.field_mapping.items():
+            if value := row.get(column):
+                item[field] = value
+        if extras := {key: value for key, column in self.extras_mapping.items() if (value := row.get(column))}:
+            item["extras"] = extras
+        return item
+
+    def post_process_item(self, item: Feature, row: dict) -> Iterable[Feature]:
+        """Override with any post process on the item"""
+        yield item
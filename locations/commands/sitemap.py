@@ -1,5 +1,8 @@
 import argparse
 import re
+import re._parser as sre_parse
+import sys
+from collections import Counter
 from typing import Iterable
 from urllib.parse import urlparse
 
@@ -13,10 +16,53 @@ from scrapy.utils.sitemap import Sitemap, sitemap_urls_from_robots
 from locations.user_agents import BROWSER_DEFAULT
 
 
+def required_literal(pattern: str) -> str:
+    """
+    Return the longest run of literal characters which must appear in any
+    string matched by the regular expression pattern, or an empty string if
+    no such run can be determined cheaply.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return ""
+    if parsed.state.flags & re.IGNORECASE:
+        return ""
+    longest = current = ""
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            current += chr(av)
+            if len(current) > len(longest):
+                longest = current
+        else:
+            current = ""
+    return longest
+
+
+class SitemapPatternMatcher:
+    """
+    Match URLs against a large list of regular expressions, reporting every
+    pattern that matched. Each pattern is compiled once, and is only evaluated
+    when the literal text it requires is present in the URL, which avoids
+    running most of the patterns against most of the URLs.
+    """
+
+    def __init__(self, patterns: list[str]):
+        self.patterns = [(pattern, required_literal(pattern), re.compile(pattern)) for pattern in patterns]
+
+    def matches(self, url: str) -> list[str]:
+        return [
+            pattern
+            for pattern, literal, regex in self.patterns
+            if (not literal or literal in url) and regex.search(url)
+        ]
+
+
 class MySitemapSpider(SitemapSpider):
     name = "my_sitemap_spider"
     custom_settings = {"ROBOTSTXT_OBEY": False, "DOWNLOAD_DELAY": 0.5, "USER_AGENT": BROWSER_DEFAULT}
     pages = False
+    summary = False
     requires_proxy = False
     # Generated from the codebase, see https://github.com/alltheplaces/alltheplaces/issues/7723
     common_sitemap_patterns = [
@@ -316,17 +362,23 @@ class MySitemapSpider(SitemapSpider):
         r"stores\.(.*)/fl/\w+/$",
         r"stores\.(.*)\/\w-\-.*$",
     ]
-    matched_patterns = {}
+    matched_patterns: Counter[str] = Counter()
+    _matcher: SitemapPatternMatcher | None = None
+
+    @property
+    def matcher(self) -> SitemapPatternMatcher:
+        if self._matcher is None:
+            self._matcher = SitemapPatternMatcher(self.common_sitemap_patterns)
+        return self._matcher
 
     # Examine a url and highlight possible store pages, store finder pages of interest
     def extract_possible_store(self, url: str) -> None:
-        print(url)
-        for pattern in self.common_sitemap_patterns:
-            if re.search(pattern, url):
-                if pattern in self.matched_patterns:
-                    self.matched_patterns[pattern] = self.matched_patterns[pattern] + 1
-                else:
-                    self.matched_patterns[pattern] = 1
+        self.matched_patterns.update(self.matcher.matches(url))
+
+    def print_matched_patterns(self) -> None:
+        if len(self.matched_patterns) > 0:
+            print("Possible patterns")
+            print(dict(self.matched_patterns.most_common()))
 
     def _parse_sitemap(self, response: Response) -> Iterable[Request]:
         if response.url.endswith("/robots.txt"):
@@ -350,13 +402,24 @@ class MySitemapSpider(SitemapSpider):
                             print(loc)
                         yield Request(loc, callback=self._parse_sitemap)
             elif s.type == "urlset":
+                if not self.pages:
+                    return
+                # Buffer the page URLs of each sitemap and write them in one go
+                # rather than printing them one at a time.
+                output = []
                 for loc in iterloc(it, self.sitemap_alternate_links):
-                    if self.pages:
-                        self.extract_possible_store(loc)
+                    self.extract_possible_store(loc)
+                    if not self.summary:
+                        output.append(loc)
+                if output:
+                    sys.stdout.write("\n".join(output) + "\n")
+
+                if not self.summary:
+                    self.print_matched_patterns()
 
-                if len(self.matched_patterns) > 0:
-                    print("Possible patterns")
-                    print(self.matched_patterns)
+    def closed(self, reason: str) -> None:
+        if self.summary:
+            self.print_matched_patterns()
 
 
 class SitemapCommand(BaseRunSpiderCommand):
@@ -381,6 +444,11 @@ class SitemapCommand(BaseRunSpiderCommand):
             action="store_true",
             help="print HTTP page links rather than sitemap XML links, helps identify POI pages",
         )
+        parser.add_argument(
+            "--summary",
+            action="store_true",
+            help="with --pages, print only the aggregated pattern match counts once the crawl completes",
+        )
         parser.add_argument(
             "--stats",
             action="store_true",
@@ -399,6 +467,7 @@ class SitemapCommand(BaseRunSpiderCommand):
         MySitemapSpider.sitemap_urls = [url]
         MySitemapSpider.requires_proxy = opts.requires_proxy
         MySitemapSpider.pages = opts.pages
+        MySitemapSpider.summary = opts.summary
 
         if crawler_process := self.crawler_process:
             crawler = crawler_process.create_crawler(MySitemapSpider, **opts.spargs)
@@ -0,0 +1,209 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable
+
+from scrapy import signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+
+TIMERS = "timers"
+CPROFILE = "cprofile"
+SAMPLE = "sample"
+PROFILE_MODES = {TIMERS, CPROFILE, SAMPLE}
+
+
+def parse_profile_modes(value: str | bool | None) -> set[str]:
+    """
+    Parse the ATP_PROFILE setting, a comma separated list of profile modes.
+    "1" or "true" enables timers only.
+    """
+    if not value or str(value).lower() in ("0", "false"):
+        return set()
+    if value is True or str(value).lower() in ("1", "true"):
+        return {TIMERS}
+    modes = {mode.strip().lower() for mode in str(value).split(",") if mode.strip()}
+    if unknown := modes - PROFILE_MODES:
+        raise ValueError(f"Unknown ATP_PROFILE modes: {', '.join(sorted(unknown))}")
+    return modes
+
+
+class StackSampler:
+    """
+    A statistical profiler which periodically samples the stack of a thread
+    from a background thread, counting identical stacks. Stacks are written
+    in the "folded" format read by flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self, interval: float, thread_id: int | None = None):
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="StackSampler", daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if stack:
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def write_folded(self, path: Path) -> None:
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilerExtension:
+    """
+    Profile a crawl, enabled with "-s ATP_PROFILE=<modes>" or the ATP_PROFILE
+    environment variable, where modes is a comma separated list of:
+      * timers: time spent in each spider middleware, recorded in the stats
+        as "atp/profile/spider_middleware_seconds/<middleware>". Time spent
+        in each item pipeline and callback is always recorded, see
+        ResourceProfileExtension.
+      * cprofile: profile the crawl with cProfile, writing a pstats file
+        (<name>.prof), which can be viewed with snakeviz or converted to a
+        flamegraph with flameprof.
+      * sample: sample the stack of the crawl every ATP_PROFILE_INTERVAL
+        seconds, writing folded stacks (<name>.folded) for flamegraph.pl or
+        speedscope.
+
+    Files are written next to LOGSTATS_FILE if set, or otherwise to
+    ATP_PROFILE_DIR, named after the stats file or spider. Only the main
+    thread is profiled.
+    """
+
+    crawler: Crawler
+
+    def __init__(self, crawler: Crawler, modes: set[str]):
+        self.crawler = crawler
+        self.modes = modes
+        self.middleware_seconds = {}
+        self.profiler = None
+        self.sampler = None
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        if not (modes := parse_profile_modes(crawler.settings.get("ATP_PROFILE"))):
+            raise NotConfigured()
+        ext = cls(crawler, modes)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def output_path(self, suffix: str) -> Path:
+        if stats_file := self.crawler.settings.get("LOGSTATS_FILE"):
+            return Path(stats_file).with_suffix(suffix)
+        name = getattr(self.crawler.spider, "name", None) or "crawl"
+        return Path(self.crawler.settings.get("ATP_PROFILE_DIR", ".")) / f"{name}{suffix}"
+
+    def spider_opened(self) -> None:
+        if TIMERS in self.modes and self.crawler.engine and self.crawler.engine.scraper:
+            self.wrap_spider_middlewares(self.crawler.engine.scraper.spidermw)
+        if CPROFILE in self.modes:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        if SAMPLE in self.modes:
+            self.sampler = StackSampler(self.crawler.settings.getfloat("ATP_PROFILE_INTERVAL", 0.01))
+            self.sampler.start()
+
+    def spider_closed(self) -> None:
+        if self.profiler:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.output_path(".prof"))
+        if self.sampler:
+            self.sampler.stop()
+            self.sampler.write_folded(self.output_path(".folded"))
+            if self.crawler.stats:
+                self.crawler.stats.set_value("atp/profile/sample_count", self.sampler.stacks.total())
+        if self.crawler.stats:
+            for name, seconds in self.middleware_seconds.items():
+                self.crawler.stats.set_value(f"atp/profile/spider_middleware_seconds/{name}", round(seconds, 3))
+
+    def wrap_spider_middlewares(self, spidermw: Any) -> None:
+        """Time the process_spider_input and process_spider_output methods of each spider middleware."""
+        requiring_spider = getattr(spidermw, "_mw_methods_requiring_spider", set())
+        for method_name, wrap in [
+            ("process_spider_input", self.timed_input),
+            ("process_spider_output", self.timed_output),
+        ]:
+            methods = spidermw.methods[method_name]
+            for i, method in enumerate(methods):
+                if method is None:
+                    continue
+                wrapped = wrap(method, type(getattr(method, "__self__", method)).__name__)
+                if method in requiring_spider:
+                    requiring_spider.add(wrapped)
+                methods[i] = wrapped
+
+    def add_time(self, name: str, seconds: float) -> None:
+        self.middleware_seconds[name] = self.middleware_seconds.get(name, 0.0) + seconds
+
+    def timed_input(self, method: Callable, name: str) -> Callable:
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.add_time(name, time.perf_counter() - start)
+
+        return wrapper
+
+    def timed_output(self, method: Callable, name: str) -> Callable:
+        # The time spent by a middleware producing each output is the time
+        # taken to produce it, less the time spent waiting for the middleware's
+        # own input from the middlewares and callback before it.
+        @wraps(method)
+        def wrapper(*args, result: AsyncIterator, **kwargs):
+            waiting = [0.0]
+
+            async def timed_input(iterable: AsyncIterator) -> AsyncIterator:
+                iterator = aiter(iterable)
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        x = await anext(iterator)
+                    except StopAsyncIteration:
+                        return
+                    finally:
+                        waiting[0] += time.perf_counter() - start
+                    yield x
+
+            async def timed_output(iterable: AsyncIterator) -> AsyncIterator:
+                iterator = aiter(iterable)
+                while True:
+                    start = time.perf_counter()
+                    waited = waiting[0]
+                    try:
+                        x = await anext(iterator)
+                    except StopAsyncIteration:
+                        return
+                    finally:
+                        self.add_time(name, time.perf_counter() - start - (waiting[0] - waited))
+                    yield x
+
+            return timed_output(method(*args, result=timed_input(result), **kwargs))
+
+        return wrapper
@@ -0,0 +1,190 @@
+import logging
+import resource
+import time
+from collections.abc import Mapping, MutableSequence
+from functools import wraps
+from typing import Any, AsyncIterator, Callable, Iterable
+
+import psutil
+from scrapy import signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Request, Response
+from scrapy.item import Item
+from twisted.internet import task
+
+logger = logging.getLogger(__name__)
+
+
+def callback_name(response: Response) -> str:
+    callback = response.request.callback if response.request else None
+    return getattr(callback, "__name__", None) or "parse"
+
+
+class ResourceProfileExtension:
+    """
+    Record the resources used by a spider in its stats: peak resident memory
+    of the spider process and of its child processes (such as browsers), CPU
+    user and system time, time spent in each item pipeline, and the number of
+    responses received and items scraped in each minute of the crawl.
+
+    Time spent in each callback is recorded by CallbackProfileMiddleware.
+    Disable with "-s RESOURCE_PROFILE_ENABLED=False".
+    """
+
+    crawler: Crawler
+
+    def __init__(self, crawler: Crawler):
+        self.crawler = crawler
+        self.sample_interval = crawler.settings.getfloat("RESOURCE_PROFILE_SAMPLE_INTERVAL", 10)
+        self.process = psutil.Process()
+        self.peak_children_rss = 0
+        self.start_time = time.monotonic()
+        self.responses_per_minute = []
+        self.items_per_minute = []
+        self.pipeline_seconds = {}
+        self.sampler = None
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        if not crawler.settings.getbool("RESOURCE_PROFILE_ENABLED", True):
+            raise NotConfigured()
+        ext = cls(crawler)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        crawler.signals.connect(ext.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self) -> None:
+        self.start_time = time.monotonic()
+        if self.crawler.engine and self.crawler.engine.scraper:
+            self.wrap_pipelines(self.crawler.engine.scraper.itemproc)
+        self.sampler = task.LoopingCall(self.sample_children_rss)
+        self.sampler.start(self.sample_interval, now=True)
+
+    def wrap_pipelines(self, itemproc: Any) -> None:
+        """
+        Time the process_item method of each item pipeline. This relies on
+        internals of Scrapy's ItemPipelineManager (the methods registered for
+        each pipeline method, and the set of those which take a spider
+        argument), so pipelines are left untimed if those have changed.
+        """
+        methods = getattr(itemproc, "methods", None)
+        requiring_spider = getattr(itemproc, "_mw_methods_requiring_spider", None)
+        if (
+            not isinstance(methods, Mapping)
+            or not isinstance(methods.get("process_item"), MutableSequence)
+            or not isinstance(requiring_spider, set)
+        ):
+            logger.debug(f"Not timing item pipelines of unexpected item processor {type(itemproc).__name__}")
+            return
+        methods = methods["process_item"]
+        for i, method in enumerate(methods):
+            if method is None:
+                continue
+            wrapped = self.timed(method, type(getattr(method, "__self__", method)).__name__)
+            if method in requiring_spider:
+                requiring_spider.add(wrapped)
+            methods[i] = wrapped
+
+    def timed(self, method: Callable, name: str) -> Callable:
+        # Asynchronous pipelines are only timed until they return an awaitable.
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.pipeline_seconds[name] = self.pipeline_seconds.get(name, 0.0) + time.perf_counter() - start
+
+        return wrapper
+
+    def sample_children_rss(self) -> None:
+        try:
+            rss = sum(child.memory_info().rss for child in self.process.children(recursive=True))
+        except psutil.Error:
+            return
+        self.peak_children_rss = max(self.peak_children_rss, rss)
+
+    def count(self, histogram: list[int]) -> None:
+        minute = int((time.monotonic() - self.start_time) // 60)
+        if len(histogram) <= minute:
+            histogram.extend([0] * (minute + 1 - len(histogram)))
+        histogram[minute] += 1
+
+    def response_received(self) -> None:
+        self.count(self.responses_per_minute)
+
+    def item_scraped(self) -> None:
+        self.count(self.items_per_minute)
+
+    def spider_closed(self) -> None:
+        if self.sampler and self.sampler.running:
+            self.sampler.stop()
+        self.sample_children_rss()
+        if not self.crawler.stats:
+            return
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        stats = {
+            # ru_maxrss is in kilobytes on Linux.
+            "atp/profile/peak_rss_bytes": usage.ru_maxrss * 1024,
+            "atp/profile/peak_children_rss_bytes": self.peak_children_rss,
+            "atp/profile/cpu_user_seconds": round(usage.ru_utime, 3),
+            "atp/profile/cpu_system_seconds": round(usage.ru_stime, 3),
+            "atp/profile/responses_per_minute": self.responses_per_minute,
+            "atp/profile/items_per_minute": self.items_per_minute,
+        }
+        for name, seconds in self.pipeline_seconds.items():
+            stats[f"atp/profile/pipeline_seconds/{name}"] = round(seconds, 3)
+        for key, value in stats.items():
+            self.crawler.stats.set_value(key, value)
+
+
+class CallbackProfileMiddleware:
+    """
+    Record the time spent in each spider callback in the spider stats, as
+    "atp/profile/callback_seconds/<callback name>". For asynchronous
+    callbacks, this includes time spent awaiting.
+    """
+
+    crawler: Crawler
+
+    def __init__(self, crawler: Crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        if not crawler.settings.getbool("RESOURCE_PROFILE_ENABLED", True):
+            raise NotConfigured()
+        return cls(crawler)
+
+    def _record(self, response: Response, seconds: float) -> None:
+        if self.crawler.stats:
+            self.crawler.stats.inc_value(f"atp/profile/callback_seconds/{callback_name(response)}", seconds)
+
+    def process_spider_output(self, response: Response, result: Iterable[Item | Request]) -> Iterable[Item | Request]:
+        iterator = iter(result)
+        while True:
+            start = time.perf_counter()
+            try:
+                x = next(iterator)
+            except StopIteration:
+                self._record(response, time.perf_counter() - start)
+                return
+            self._record(response, time.perf_counter() - start)
+            yield x
+
+    async def process_spider_output_async(
+        self, response: Response, result: AsyncIterator[Item | Request]
+    ) -> AsyncIterator[Item | Request]:
+        iterator = aiter(result)
+        while True:
+            start = time.perf_counter()
+            try:
+                x = await anext(iterator)
+            except StopAsyncIteration:
+                self._record(response, time.perf_counter() - start)
+                return
+            self._record(response, time.perf_counter() - start)
+            yield x
@@ -1,15 +1,12 @@
-import csv
-import gzip
-import json
 import math
-from io import TextIOWrapper
+from functools import lru_cache
 from itertools import groupby
-from typing import Any, Iterable
+from typing import Any, Iterable, Sequence
 
 import geonamescache
 from pyproj import Transformer
 
-from locations.searchable_points import get_searchable_points_path, open_searchable_points
+from locations.searchable_points import NO_AREA, read_points, read_records
 
 # Radius of the Earth in kilometers
 EARTH_RADIUS = 6378.1
@@ -40,6 +37,20 @@ def vincenty_distance(lat: float, lon: float, distance_km: float, bearing_deg: f
     return math.degrees(lat2), math.degrees(lon2)
 
 
+def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Returns the great-circle distance in kilometres between two WGS84
+    coordinates.
+    """
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    a = (
+        math.sin((lat2_rad - lat1_rad) / 2) ** 2
+        + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
 def country_iseadgg_centroids(country_codes: list[str] | str, radius: int) -> list[tuple[float, float]]:
     """
     Get WGS84 ISEADGG point locations for one or more countries at a specified
@@ -89,12 +100,8 @@ def country_iseadgg_centroids(country_codes: list[str] | str, radius: int) -> li
     all_points = []
     for country_code in country_codes:
         try:
-            with open_searchable_points(
-                "iseadgg/{}_centroids_iseadgg_{}km_radius.csv".format(country_code.lower(), str(radius))
-            ) as file:
-                rows = csv.DictReader(file)
-                for row in rows:
-                    all_points.append((float(row["latitude"]), float(row["longitude"])))
+            filename = "iseadgg/{}_centroids_iseadgg_{}km_radius.csv".format(country_code.lower(), str(radius))
+            all_points.extend(read_points(filename).points)
         except FileNotFoundError:
             raise ValueError(
                 "Invalid ISO-3166 alpha-2 country code supplied. Ensure supplied code is represented in the locations/searchable_points/iseadgg/ path."
@@ -122,38 +129,22 @@ def point_locations(
 
     """
 
-    def get_key(row, keys):
-        for key in keys:
-            if row.get(key):
-                return row[key]
-        return None
-
     if isinstance(areas_csv_file, str):
         areas_csv_file = [areas_csv_file]
     if area_field_filter and isinstance(area_field_filter, str):
         area_field_filter = [area_field_filter]
     for csv_file in areas_csv_file:
-        with open_searchable_points("{}".format(csv_file)) as file:
-            for row in csv.DictReader(file):
-                try:
-                    lat, lon = float(row["latitude"]), float(row["longitude"])
-                except ValueError:
-                    raise Exception(
-                        "Invalid latitude/longitude in searchable points file {} where latitude = {} and longitude = {}.".format(
-                            csv_file, row["latitude"], row["longitude"]
-                        )
+        table = read_points(csv_file)
+        if area_field_filter:
+            if table.area_runs is None or NO_AREA in table.area_runs:
+                raise Exception(
+                    "Searchable points file {} does not support area field filters (columns named 'country', 'territory' and 'state').".format(
+                        csv_file
                     )
-                area = get_key(row, ["country", "territory", "state"])
-                if area_field_filter:
-                    if not area:
-                        raise Exception(
-                            "Searchable points file {} does not support area field filters (columns named 'country', 'territory' and 'state').".format(
-                                csv_file
-                            )
-                        )
-                    if area not in area_field_filter:
-                        continue
-                yield lat, lon
+                )
+            yield from table.area_points(area_field_filter)
+        else:
+            yield from table.points
 
 
 def city_locations(country_code: str, min_population: int = 0) -> Iterable[dict]:
@@ -189,15 +180,14 @@ def postal_regions(country_code: str, min_population: int = 0, consolidate_citie
     :return: post code regions with possible extras
     """
     if country_code == "GB":
-        with gzip.open(get_searchable_points_path("postcodes/outward_gb.json.gz"), mode="rb") as points:
-            for outward_code in json.load(TextIOWrapper(points)):
-                yield {
-                    "postal_region": outward_code["postcode"],
-                    "city": outward_code["town"],
-                    "state": outward_code["country_string"],
-                    "latitude": outward_code["latitude"],
-                    "longitude": outward_code["longitude"],
-                }
+        for outward_code in read_records("postcodes/outward_gb.json.gz"):
+            yield {
+                "postal_region": outward_code["postcode"],
+                "city": outward_code["town"],
+                "state": outward_code["country_string"],
+                "latitude": outward_code["latitude"],
+                "longitude": outward_code["longitude"],
+            }
     elif country_code == "US":
         # US zip code database from https://simplemaps.com/data/us-zips
         # From their licence.txt:
@@ -209,42 +199,40 @@ def postal_regions(country_code: str, min_population: int = 0, consolidate_citie
         # easily found though links on the root domain. The link must be clearly visible to the human eye.
         # The backlink must be placed before the Customer uses the Database in production.
         #
-        with gzip.open(get_searchable_points_path("postcodes/uszips.csv.gz"), mode="rb") as points:
-
-            def create_postcode_output_dict(postcode: dict) -> dict:
-                return {
-                    "postal_region": postcode["zip"],
-                    "city": postcode["city"],
-                    "state": postcode["state_id"],
-                    "latitude": postcode["lat"],
-                    "longitude": postcode["lng"],
-                }
-
-            postcode_data = filter(
-                lambda x: not (x["population"].isnumeric() and int(x["population"]) < min_population),
-                csv.DictReader(TextIOWrapper(points)),
-            )
-            if consolidate_cities:
-                postcode_data = sorted(postcode_data, key=lambda x: (x["state_name"], x["county_name"], x["city"]))
-                for city, postcodes_in_city in groupby(
-                    postcode_data, lambda x: (x["state_name"], x["county_name"], x["city"])
-                ):
-                    largest_postcode = max(list(postcodes_in_city), key=lambda x: x["population"])
-                    yield create_postcode_output_dict(largest_postcode)
-            else:
-                for postcode in postcode_data:
-                    yield create_postcode_output_dict(postcode)
+
+        def create_postcode_output_dict(postcode: dict) -> dict:
+            return {
+                "postal_region": postcode["zip"],
+                "city": postcode["city"],
+                "state": postcode["state_id"],
+                "latitude": postcode["lat"],
+                "longitude": postcode["lng"],
+            }
+
+        postcode_data = filter(
+            lambda x: not (x["population"].isnumeric() and int(x["population"]) < min_population),
+            read_records("postcodes/uszips.csv.gz"),
+        )
+        if consolidate_cities:
+            postcode_data = sorted(postcode_data, key=lambda x: (x["state_name"], x["county_name"], x["city"]))
+            for city, postcodes_in_city in groupby(
+                postcode_data, lambda x: (x["state_name"], x["county_name"], x["city"])
+            ):
+                largest_postcode = max(list(postcodes_in_city), key=lambda x: x["population"])
+                yield create_postcode_output_dict(largest_postcode)
+        else:
+            for postcode in postcode_data:
+                yield create_postcode_output_dict(postcode)
 
     elif country_code == "FR":
         # French postal code database from https://datanova.legroupe.laposte.fr
 
-        with gzip.open(get_searchable_points_path("postcodes/frzips.csv.gz"), mode="rb") as points:
-            for row in csv.DictReader(TextIOWrapper(points)):
-                yield {
-                    "postal_region": row["Code_postal"],
-                    "latitude": row["lat"],
-                    "longitude": row["lng"],
-                }
+        for row in read_records("postcodes/frzips.csv.gz"):
+            yield {
+                "postal_region": row["Code_postal"],
+                "latitude": row["lat"],
+                "longitude": row["lng"],
+            }
     else:
         raise Exception("country code not supported: " + country_code)
 
@@ -438,11 +426,11 @@ def country_coordinates(return_lookup: bool = False) -> dict:
     :return A list of ISO 3166-2 alpha-2 country codes with corresponding latitude and longitude for each country.
             If return_lookup is True, return a dict of ISO 3166-2 alpha-2 to (lat, lon) instead.
     """
-    file = json.load(open_searchable_points("country_coordinates.json"))
+    records = read_records("country_coordinates.json")
     if return_lookup:
-        return {row["isocode"]: (row["lat"], row["lon"]) for row in file}
+        return {row["isocode"]: (row["lat"], row["lon"]) for row in records}
     else:
-        return file
+        return [dict(row) for row in records]
 
 
 def extract_geojson_point_geometry(geometry: dict) -> dict | None:  # noqa: C901
@@ -524,6 +512,47 @@ def extract_geojson_point_geometry(geometry: dict) -> dict | None:  # noqa: C901
     return None
 
 
+@lru_cache(maxsize=None)
+def get_transformer(source_crs: int | str, target_crs: int | str = 4326) -> Transformer:
+    """
+    Get a pyproj Transformer from `source_crs` to `target_crs`, reusing the
+    same Transformer for every call with the same pair of CRSs within this
+    process. Creating a Transformer is many times slower than transforming
+    coordinates with it.
+
+    As with `Transformer.from_crs`, coordinates are given and returned in the
+    axis order of each CRS, which for EPSG:4326 is latitude then longitude.
+
+    :param source_crs: CRS of supplied coordinates, such as 2056 or "EPSG:2056".
+    :param target_crs: CRS to transform coordinates to, defaulting to EPSG:4326.
+    :return: cached pyproj Transformer.
+    """
+    return Transformer.from_crs(source_crs, target_crs)
+
+
+def transform_coordinates(
+    first: Sequence[float], second: Sequence[float], source_crs: int | str, target_crs: int | str = 4326
+) -> tuple[list[float], list[float]]:
+    """
+    Transform many coordinates from `source_crs` to `target_crs` in a single
+    call, which is much faster than transforming each coordinate separately.
+
+    Usage example:
+        lats, lons = transform_coordinates(eastings, northings, 25833)
+
+    :param first: first axis of each coordinate in the axis order of `source_crs`.
+    :param second: second axis of each coordinate in the axis order of `source_crs`.
+    :param source_crs: CRS of supplied coordinates, such as 2056 or "EPSG:2056".
+    :param target_crs: CRS to transform coordinates to, defaulting to EPSG:4326.
+    :return: lists of the first and second axis of each transformed coordinate
+             in the axis order of `target_crs`.
+    """
+    if not first:
+        return [], []
+    first_transformed, second_transformed = get_transformer(source_crs, target_crs).transform(list(first), list(second))
+    return list(first_transformed), list(second_transformed)
+
+
 def convert_gj2008_to_rfc7946_point_geometry(geometry: dict) -> dict | None:  # noqa: C901
     """
     Convert GJ2008 Point geometry with a projection other than EPSG:4326
@@ -584,7 +613,7 @@ def convert_gj2008_to_rfc7946_point_geometry(geometry: dict) -> dict | None:  #
             lat = geometry["coordinates"][1]
             lon = geometry["coordinates"][0]
         else:
-            lat, lon = Transformer.from_crs(original_projection, 4326).transform(
+            lat, lon = get_transformer(original_projection).transform(
                 geometry["coordinates"][0], geometry["coordinates"][1]
             )
     else:
@@ -0,0 +1,395 @@
+import heapq
+import math
+from typing import AsyncIterator, Iterable, NamedTuple
+
+from scrapy import Request
+from scrapy.http import Response
+from scrapy.statscollectors import StatsCollector
+
+from locations.geo import haversine_distance
+
+SEARCH_CELL_META_KEY = "geo_search_cell"
+
+
+class SearchCell(NamedTuple):
+    """
+    A rectangular cell of an adaptive geographic search. Bounds are
+    (xmin, ymin, xmax, ymax), the same as `make_subdivisions` in
+    locations/geo.py, and never cross the antimeridian.
+    """
+
+    bounds: tuple[float, float, float, float]
+    depth: int = 0
+
+    @property
+    def centroid(self) -> tuple[float, float]:
+        """
+        (lat, lon) of the centre of the cell.
+        """
+        xmin, ymin, xmax, ymax = self.bounds
+        return (ymin + ymax) / 2, (xmin + xmax) / 2
+
+    @property
+    def corners(self) -> list[tuple[float, float]]:
+        """
+        (lat, lon) of each corner of the cell.
+        """
+        xmin, ymin, xmax, ymax = self.bounds
+        return [(ymin, xmin), (ymin, xmax), (ymax, xmin), (ymax, xmax)]
+
+    @property
+    def radius_km(self) -> float:
+        """
+        Radius in kilometres of the smallest circle around the centroid which
+        contains the whole cell, for APIs which search a radius around a point.
+        """
+        lat, lon = self.centroid
+        return max(haversine_distance(lat, lon, corner_lat, corner_lon) for corner_lat, corner_lon in self.corners)
+
+    def quadrants(self) -> list["SearchCell"]:
+        xmin, ymin, xmax, ymax = self.bounds
+        xmid = (xmin + xmax) / 2
+        ymid = (ymin + ymax) / 2
+        return [
+            SearchCell((xmin, ymin, xmid, ymid), self.depth + 1),
+            SearchCell((xmid, ymin, xmax, ymid), self.depth + 1),
+            SearchCell((xmin, ymid, xmid, ymax), self.depth + 1),
+            SearchCell((xmid, ymid, xmax, ymax), self.depth + 1),
+        ]
+
+
+def initial_search_cells(bounds: tuple[float, float, float, float], num_tiles: int = 1) -> list[SearchCell]:
+    """
+    Divide bounds into num_tiles*num_tiles search cells. Bounds where xmin is
+    greater than xmax are taken to cross the antimeridian, and are split at
+    the antimeridian first.
+
+    :param bounds: A tuple representing a lat/lon bounding box. Uses (xmin, ymin, xmax, ymax).
+    :param num_tiles: The number of cells to create in the X and Y direction.
+    :return: A list of search cells.
+    """
+    xmin, ymin, xmax, ymax = bounds
+    if xmin > xmax:
+        parts = [(xmin, ymin, 180.0, ymax), (-180.0, ymin, xmax, ymax)]
+    else:
+        parts = [bounds]
+
+    cells = []
+    for pxmin, pymin, pxmax, pymax in parts:
+        tile_width = (pxmax - pxmin) / num_tiles
+        tile_height = (pymax - pymin) / num_tiles
+        for i in range(num_tiles):
+            for j in range(num_tiles):
+                x0 = pxmin + i * tile_width
+                y0 = pymin + j * tile_height
+                cells.append(SearchCell((x0, y0, x0 + tile_width, y0 + tile_height)))
+    return cells
+
+
+class AdaptiveGeoSearchMixin:
+    """
+    Mixin for spiders of geographic search APIs which return at most
+    `search_result_cap` results per query. Instead of sweeping a fixed grid of
+    searches, the search starts with a coarse grid of `search_initial_tiles`
+    by `search_initial_tiles` cells over `search_bounds`, and only cells whose
+    search returned `search_result_cap` (or more) results are divided into
+    four quadrants and searched again. All searches are yielded at once so
+    they are downloaded concurrently.
+
+    To use this mixin:
+      1. Set `search_result_cap` to the maximum number of results the API
+         returns for a single search, and optionally `search_bounds` (which
+         may cross the antimeridian, for example (170, -50, -170, -30)),
+         `search_initial_tiles` and `search_max_depth`.
+      2. Implement `make_search_request(cell)` to return a request searching
+         the given `SearchCell`. For bounding box APIs use `cell.bounds`. For
+         radius APIs use `cell.centroid` and `cell.radius_km` and set
+         `search_by_radius = True`.
+      3. In the callback, parse the results as usual and then call
+         `yield from self.refine_search(response, result_count)`.
+
+    For radius APIs, a quadrant is skipped if it lies entirely within the
+    circle of a previous search which was not capped, as every result within
+    the quadrant has already been returned.
+
+    Override `start` and yield from `initial_search_requests()` if other
+    requests are needed before searching.
+    """
+
+    search_bounds: tuple[float, float, float, float] = (-180.0, -90.0, 180.0, 90.0)
+    search_initial_tiles: int = 4
+    search_result_cap: int
+    search_max_depth: int = 12
+    search_by_radius: bool = False
+
+    _completed_searches: list[tuple[float, float, float]]
+
+    async def start(self) -> AsyncIterator[Request]:
+        for request in self.initial_search_requests():
+            yield request
+
+    def make_search_request(self, cell: SearchCell) -> Request:
+        raise NotImplementedError()
+
+    def _inc_value(self, key: str) -> None:
+        if stats := self.crawler.stats:  # ty: ignore[unresolved-attribute]
+            stats.inc_value(f"atp/geo_search/{key}")
+
+    def _make_cell_request(self, cell: SearchCell) -> Request:
+        request = self.make_search_request(cell)
+        request.meta[SEARCH_CELL_META_KEY] = cell
+        return request
+
+    def _is_covered(self, cell: SearchCell) -> bool:
+        if not self.search_by_radius:
+            return False
+        for lat, lon, radius in self._completed_searches:
+            if all(
+                haversine_distance(lat, lon, corner_lat, corner_lon) <= radius
+                for corner_lat, corner_lon in cell.corners
+            ):
+                return True
+        return False
+
+    def initial_search_requests(self) -> Iterable[Request]:
+        self._completed_searches = []
+        for cell in initial_search_cells(self.search_bounds, self.search_initial_tiles):
+            yield self._make_cell_request(cell)
+
+    def refine_search(self, response: Response, result_count: int) -> Iterable[Request]:
+        cell = response.meta[SEARCH_CELL_META_KEY]
+        if not hasattr(self, "_completed_searches"):
+            self._completed_searches = []
+        if result_count == 0:
+            self._inc_value("misses")
+        else:
+            self._inc_value("hits")
+
+        if result_count < self.search_result_cap:
+            if self.search_by_radius:
+                lat, lon = cell.centroid
+                self._completed_searches.append((lat, lon, cell.radius_km))
+            return
+
+        if cell.depth >= self.search_max_depth:
+            self.logger.warning(  # ty: ignore[unresolved-attribute]
+                "Search of {} returned {} results at the maximum search depth of {}. Results have probably been truncated.".format(
+                    cell.bounds, result_count, self.search_max_depth
+                )
+            )
+            self._inc_value("truncated")
+            return
+
+        self._inc_value("subdivided")
+        for quadrant in cell.quadrants():
+            if self._is_covered(quadrant):
+                self._inc_value("skipped")
+                continue
+            yield self._make_cell_request(quadrant)
+
+
+class CentroidScheduler:
+    """
+    Schedule radius searches of a fixed set of centroids, such as those from
+    `country_iseadgg_centroids`, so that centroids whose whole search circle
+    has already been answered by earlier searches are never requested.
+
+    Searches are handed out a few at a time with `next_centroids(count)`, and
+    each response is reported back with `record(...)`. A search proves the
+    circle around its centroid complete:
+      1. out to the searched radius if fewer than `result_cap` results were
+         returned, or
+      2. out to the distance of the furthest result returned if the API
+         ranks results by distance from the centroid. Set
+         `distance_ranked=False` for APIs which rank results by anything
+         else, such that only searches which were not capped count.
+
+    Pending centroids whose search circle lies within the union of the
+    complete circles are skipped, and pending centroids whose search circle
+    overlaps a complete circle are deprioritised behind those which do not.
+    As every centroid is searched with the same radius, a circle within a
+    single complete circle needs a distance ranked search which reached past
+    the radius, but the complete circles of several uncapped searches may
+    together cover one. Pending centroids are held in a grid index so that
+    each recorded search only examines nearby centroids.
+
+    Counts of requested, skipped and deprioritised centroids, and of capped
+    searches which proved nothing complete, are added to the
+    "atp/centroid_scheduler/" crawler stats if `stats` is given.
+
+    Usage example:
+        scheduler = CentroidScheduler(country_iseadgg_centroids("AU", 48), 48, 100, stats=self.crawler.stats)
+        for lat, lon in scheduler.next_centroids(8):
+            yield self.make_request(lat, lon)
+        ...
+        scheduler.record(lat, lon, len(results), furthest_result_km)
+        for lat, lon in scheduler.next_centroids(1):
+            yield self.make_request(lat, lon)
+    """
+
+    # Points of a search circle tested for coverage are on a square grid with
+    # this many points per radius. Each point stands for those within half
+    # a grid diagonal of it, so is only covered with that margin to spare.
+    coverage_grid_points = 4
+
+    def __init__(
+        self,
+        centroids: Iterable[tuple[float, float]],
+        radius_km: float,
+        result_cap: int,
+        distance_ranked: bool = True,
+        stats: StatsCollector | None = None,
+    ):
+        self.radius_km = radius_km
+        self.result_cap = result_cap
+        self.distance_ranked = distance_ranked
+        self.stats = stats
+        self.requested_count = 0
+        self.skipped_count = 0
+
+        # Grid index of pending centroids, with cells twice the search radius.
+        self._cell_degrees = max(2 * radius_km / 111.0, 0.01)
+        self._lon_cells = math.ceil(360.0 / self._cell_degrees)
+        self._index: dict[tuple[int, int], set[tuple[float, float]]] = {}
+        # Points of the search circles of pending centroids which are not
+        # yet within any complete circle, for those overlapping any.
+        self._uncovered: dict[tuple[float, float], list[tuple[float, float]]] = {}
+        # Priority queue of (overlap count, sequence, centroid). Entries are
+        # pushed again with a higher overlap count rather than updated.
+        self._queue: list[tuple[int, int, tuple[float, float]]] = []
+        self._overlaps: dict[tuple[float, float], int] = {}
+        for sequence, centroid in enumerate(centroids):
+            if centroid in self._overlaps:
+                continue
+            self._overlaps[centroid] = 0
+            self._index.setdefault(self._grid_cell(*centroid), set()).add(centroid)
+            heapq.heappush(self._queue, (0, sequence, centroid))
+        self._sequence = len(self._queue)
+
+        # (north, east) offsets in kilometres of the points of a search
+        # circle tested for coverage.
+        spacing = radius_km / self.coverage_grid_points
+        self._coverage_margin_km = spacing * math.sqrt(2) / 2
+        steps = range(-self.coverage_grid_points - 1, self.coverage_grid_points + 2)
+        self._coverage_offsets = [
+            (i * spacing, j * spacing)
+            for i in steps
+            for j in steps
+            if math.hypot(i * spacing, j * spacing) <= radius_km + self._coverage_margin_km
+        ]
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._overlaps)
+
+    def _inc_value(self, key: str, count: int = 1) -> None:
+        if self.stats:
+            self.stats.inc_value(f"atp/centroid_scheduler/{key}", count)
+
+    def _grid_cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return (
+            math.floor((lat + 90.0) / self._cell_degrees),
+            math.floor((lon + 180.0) / self._cell_degrees) % self._lon_cells,
+        )
+
+    def _nearby(self, lat: float, lon: float, distance_km: float) -> list[tuple[float, float]]:
+        lat_delta = distance_km / 111.0
+        cos_lat = math.cos(math.radians(min(abs(lat) + lat_delta, 90.0)))
+        if cos_lat < 1e-6:
+            lon_delta = 180.0
+        else:
+            lon_delta = min(distance_km / (111.0 * cos_lat), 180.0)
+        lat_cells = range(
+            math.floor((max(lat - lat_delta, -90.0) + 90.0) / self._cell_degrees),
+            math.floor((min(lat + lat_delta, 90.0) + 90.0) / self._cell_degrees) + 1,
+        )
+        first_lon_cell = math.floor((lon - lon_delta + 180.0) / self._cell_degrees)
+        last_lon_cell = math.floor((lon + lon_delta + 180.0) / self._cell_degrees)
+        last_lon_cell = min(last_lon_cell, first_lon_cell + self._lon_cells - 1)
+        lon_cells = {i % self._lon_cells for i in range(first_lon_cell, last_lon_cell + 1)}
+        nearby = []
+        for lat_cell in lat_cells:
+            for lon_cell in lon_cells:
+                nearby.extend(self._index.get((lat_cell, lon_cell), ()))
+        return nearby
+
+    def _cover(self, centroid: tuple[float, float], circle_lat: float, circle_lon: float, complete_km: float) -> bool:
+        """
+        Remove the points of the search circle around a centroid which lie
+        within a complete circle, returning whether none are left.
+        """
+        if (points := self._uncovered.get(centroid)) is None:
+            lat, lon = centroid
+            cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+            points = [
+                (min(max(lat + north_km / 111.0, -90.0), 90.0), lon + east_km / (111.0 * cos_lat))
+                for north_km, east_km in self._coverage_offsets
+            ]
+        points = [
+            point
+            for point in points
+            if haversine_distance(*point, circle_lat, circle_lon) + self._coverage_margin_km > complete_km
+        ]
+        self._uncovered[centroid] = points
+        return not points
+
+    def _remove(self, centroid: tuple[float, float]) -> None:
+        del self._overlaps[centroid]
+        self._uncovered.pop(centroid, None)
+        self._index[self._grid_cell(*centroid)].discard(centroid)
+
+    def _skip(self, centroid: tuple[float, float]) -> None:
+        self._remove(centroid)
+        self.skipped_count += 1
+        self._inc_value("skipped")
+
+    def next_centroids(self, count: int = 1) -> list[tuple[float, float]]:
+        """
+        Take up to `count` pending centroids to search next.
+        """
+        centroids = []
+        while self._queue and len(centroids) < count:
+            overlaps, _, centroid = heapq.heappop(self._queue)
+            if self._overlaps.get(centroid) != overlaps:
+                # Stale entry for a centroid which was since skipped,
+                # requested or deprioritised.
+                continue
+            self._remove(centroid)
+            centroids.append(centroid)
+        self.requested_count += len(centroids)
+        if centroids:
+            self._inc_value("requested", len(centroids))
+        return centroids
+
+    def record(self, lat: float, lon: float, result_count: int, furthest_result_km: float | None = None) -> None:
+        """
+        Record the response to the search of a centroid.
+
+        :param lat: latitude of the searched centroid.
+        :param lon: longitude of the searched centroid.
+        :param result_count: number of results returned by the search.
+        :param furthest_result_km: distance in kilometres from the centroid to
+                                   the furthest result returned, if known.
+        """
+        if result_count < self.result_cap:
+            complete_km = self.radius_km
+            if self.distance_ranked and furthest_result_km is not None:
+                complete_km = max(complete_km, furthest_result_km)
+        elif self.distance_ranked and furthest_result_km is not None:
+            complete_km = furthest_result_km
+        else:
+            self._inc_value("capped")
+            return
+
+        for centroid in self._nearby(lat, lon, complete_km + self.radius_km):
+            distance = haversine_distance(lat, lon, *centroid)
+            if distance + self.radius_km <= complete_km:
+                self._skip(centroid)
+            elif distance < complete_km + self.radius_km:
+                if self._cover(centroid, lat, lon, complete_km):
+                    self._skip(centroid)
+                    continue
+                self._overlaps[centroid] += 1
+                self._sequence += 1
+                heapq.heappush(self._queue, (self._overlaps[centroid], self._sequence, centroid))
+                self._inc_value("deprioritised")
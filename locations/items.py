@@ -100,6 +100,48 @@ class Feature(scrapy.Item):
         return None
 
 
+class CompactFeature(Feature):
+    """
+    A Feature with a smaller memory footprint and lower construction cost,
+    for spiders which yield very large numbers of features such as address
+    registers. It is otherwise used exactly the same as a Feature.
+
+    Compared to a Feature:
+      1. Field values are held in a slot rather than in the instance
+         `__dict__`. Instances still have a `__dict__`, as `scrapy.Item` has
+         no `__slots__`, but it is left empty.
+      2. The `extras` dictionary is only created the first time the `extras`
+         field is accessed. Until then, `extras` is not included in the keys
+         of the feature, and `"extras" in item` is False.
+      3. Instances are not tracked by `scrapy.utils.trackref`, so are not
+         reported by the `prefs()` telnet console command.
+    """
+
+    __slots__ = ("_values",)
+
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    def __init__(self, *args, **kwargs):
+        self._values = {}
+        if args or kwargs:
+            for key, value in dict(*args, **kwargs).items():
+                self[key] = value
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self._values[key]
+        except KeyError:
+            if key != "extras":
+                raise
+            extras = self._values["extras"] = {}
+            return extras
+
+    def __contains__(self, key: object) -> bool:
+        # Mapping.__contains__ would call __getitem__, creating extras.
+        return key in self._values
+
+
 def get_lat_lon(item: Feature) -> tuple[float, float] | None:
     """
     Retrieve the latitude and longitude from a Feature if they are defined and
@@ -0,0 +1,87 @@
+from typing import Any
+from weakref import WeakKeyDictionary
+
+from chompjs import parse_js_object
+from scrapy.http import Response, TextResponse
+
+# Located JavaScript text of each response, keyed by the arguments of
+# `find_js_text`, so that repeated lookups do not search the body again.
+_js_text_cache: WeakKeyDictionary[Response, dict[tuple, str | None]] = WeakKeyDictionary()
+
+
+def find_js_text(response: Response, markers: str | list[str], max_length: int | None = None) -> str | None:
+    """
+    Locate JavaScript text embedded in a response by searching the raw
+    response body, without decoding the whole body or building a HTML tree.
+
+    The first marker is searched for from the start of the body. Each
+    subsequent marker is searched for within the inline script containing
+    the first marker, the second from the start of that script and the rest
+    after the previous marker, as when splitting the script text on each in
+    turn. The text following the last marker up to the end of that script
+    (the next "</script"), or up to `max_length` characters, is decoded and
+    returned, with undecodable bytes replaced as by `response.text`. If any
+    marker is not found, None is returned.
+
+    Example:
+    find_js_text(response, ["storeLocator", "stores:"])
+    returns the same text as:
+    response.xpath('//script[contains(text(), "storeLocator")]/text()').get().split("stores:", 1)[1]
+    """
+    if isinstance(markers, str):
+        markers = [markers]
+    body = response.body
+    encoding = response.encoding if isinstance(response, TextResponse) else "utf-8"
+    encoded_markers = [marker.encode(encoding) for marker in markers]
+
+    start = body.find(encoded_markers[0])
+    if start == -1:
+        return None
+    end = body.find(b"</script", start + len(encoded_markers[0]))
+    if end == -1:
+        end = len(body)
+    if len(encoded_markers) > 1:
+        start = max(body.rfind(b"<script", 0, start), 0)
+    else:
+        start += len(encoded_markers[0])
+    for marker in encoded_markers[1:]:
+        start = body.find(marker, start, end)
+        if start == -1:
+            return None
+        start += len(marker)
+    if max_length is not None:
+        # A character is at most four bytes in any encoding used by websites.
+        end = min(end, start + max_length * 4)
+        return body[start:end].decode(encoding, errors="replace")[:max_length]
+    return body[start:end].decode(encoding, errors="replace")
+
+
+def cached_find_js_text(response: Response, markers: str | list[str], max_length: int | None = None) -> str | None:
+    """
+    `find_js_text` for spiders which look up JavaScript text of the same
+    response more than once, such as from both `extract_json` and
+    `post_process_item`. The located text is cached for the lifetime of the
+    response.
+    """
+    key = (markers if isinstance(markers, str) else tuple(markers), max_length)
+    response_cache = _js_text_cache.setdefault(response, {})
+    if key not in response_cache:
+        response_cache[key] = find_js_text(response, markers, max_length)
+    return response_cache[key]
+
+
+def extract_js_object(
+    response: Response, markers: str | list[str], max_length: int | None = None, cached: bool = False, **kwargs
+) -> Any:
+    """
+    Parse the first JavaScript object or array following `markers` in the
+    response with `chompjs.parse_js_object`, to which any other keyword
+    arguments are passed. Text is located with `find_js_text`, or with
+    `cached_find_js_text` if `cached` is set. Objects are parsed afresh for
+    each call, so may be modified by the caller. If any marker is not found,
+    None is returned.
+    """
+    find = cached_find_js_text if cached else find_js_text
+    if (js_text := find(response, markers, max_length)) is None:
+        return None
+    return parse_js_object(js_text, **kwargs)
@@ -1,5 +1,8 @@
+from io import BytesIO
+from itertools import chain
 from typing import AsyncIterator, Iterable
 
+import ijson
 from scrapy import Spider
 from scrapy.http import JsonRequest, Request, TextResponse
 
@@ -37,11 +40,13 @@ class JSONBlobSpider(Spider):
     If a HTML response is received, the `extract_json` function will need to
     be overloaded to extract a JavaScript script from within the HTML response
     and extract a JSON dictionary or array from within the JavaScript script.
-    This may typically include use of `json.loads` or
-    `chompjs.parse_js_object`. Once a dictionary or array of features has been
-    extracted from the HTML response with `extract_json`, it is then handled
-    in the same way as if a JSON response rather than HTML response had been
-    received.
+    This may typically include use of `extract_js_object` (from
+    locations.js_object_utils), which parses a JavaScript object following a
+    marker in the raw response body without building a HTML tree, or of
+    `json.loads` or `chompjs.parse_js_object`. Once a dictionary or array of
+    features has been extracted from the HTML response with `extract_json`,
+    it is then handled in the same way as if a JSON response rather than HTML
+    response had been received.
     """
 
     """
@@ -60,6 +65,18 @@ class JSONBlobSpider(Spider):
     locations_key: str | list[str] | None = None
     needs_json_request = False
 
+    """
+    stream_json:
+    If set then the JSON response is decoded incrementally with ijson instead
+    of `extract_json`, and each feature is parsed as soon as it is decoded,
+    rather than after the whole response has been decoded. Only the features
+    found at `locations_key` are decoded, so memory use is bounded by the
+    size of a single feature rather than the size of the decoded response.
+    Use this for very large JSON responses. Keys of `locations_key` must not
+    contain a "." character.
+    """
+    stream_json: bool = False
+
     async def start(self) -> AsyncIterator[JsonRequest | Request]:
         if self.needs_json_request:
             for url in self.start_urls:
@@ -81,10 +98,7 @@ class JSONBlobSpider(Spider):
         return features_dict
 
         Example 2:
-        data_raw = response.xpath("//script[contains(text(), '},\"places\":[{')]/text()").get()
-        data_raw = data_raw.split('},"places":', 1)[1]
-        features_dict = chompjs.parse_js_object(data_raw)
-        return features_dict
+        return extract_js_object(response, '},"places":')
         """
         json_data = response.json()
         if self.locations_key:
@@ -95,7 +109,35 @@ class JSONBlobSpider(Spider):
                     json_data = json_data[key]
         return json_data
 
+    def parse_json_stream(self, response: TextResponse) -> Iterable[Feature]:
+        """
+        Incrementally decode the dictionary or array of features found at
+        `locations_key`, parsing each feature as soon as it is decoded.
+        """
+        if isinstance(self.locations_key, str):
+            prefix = self.locations_key
+        else:
+            prefix = ".".join(self.locations_key or [])
+        events = ijson.parse(BytesIO(response.body), use_float=True)
+        for event in events:
+            event_prefix, event_name, _ = event
+            if event_prefix != prefix or event_name not in ("start_map", "start_array"):
+                continue
+            events = chain([event], events)
+            if event_name == "start_map":
+                for feature_id, feature in ijson.kvitems(events, prefix):
+                    yield from self.parse_feature_dict(response, {feature_id: feature}) or []
+            else:
+                yield from self.parse_feature_array(
+                    response, ijson.items(events, f"{prefix}.item" if prefix else "item")
+                ) or []
+            return
+        raise KeyError(self.locations_key)
+
     def parse(self, response: TextResponse) -> Iterable[Feature]:
+        if self.stream_json:
+            yield from self.parse_json_stream(response)
+            return
         features = self.extract_json(response)
         if isinstance(features, dict):
             yield from self.parse_feature_dict(response, features) or []
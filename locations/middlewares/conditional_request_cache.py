@@ -0,0 +1,221 @@
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+
+from scrapy import Request, signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Headers, Response
+from scrapy.responsetypes import responsetypes
+
+UNCHANGED_FLAG = "unchanged"
+
+
+def is_unchanged(response: Response) -> bool:
+    """
+    Check whether a response has the same body as the response received for
+    the same request in a previous crawl, either because the server answered
+    a conditional request with "304 Not Modified" or because the body hash is
+    unchanged.
+    """
+    return UNCHANGED_FLAG in response.flags
+
+
+def body_hash(body: bytes) -> str:
+    return hashlib.sha1(body).hexdigest()
+
+
+class ResponseStore:
+    """
+    A compact SQLite store of the last successful response received for each
+    request fingerprint of a spider, along with the validators (ETag and
+    Last-Modified) needed to make a conditional request for it next time.
+    Bodies are stored zlib compressed.
+    """
+
+    commit_interval = 100
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = None
+        self.pending_writes = 0
+
+    def open(self) -> None:
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS responses (
+                spider TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                body_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                PRIMARY KEY (spider, fingerprint)
+            )""")
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+
+    def _written(self) -> None:
+        self.pending_writes += 1
+        if self.pending_writes >= self.commit_interval:
+            self.connection.commit()
+            self.pending_writes = 0
+
+    def validators(self, spider: str, fingerprint: str) -> tuple[str | None, str | None, str] | None:
+        """
+        Return (etag, last_modified, body_hash) of the stored response, or
+        None if there is no stored response.
+        """
+        return self.connection.execute(
+            "SELECT etag, last_modified, body_hash FROM responses WHERE spider = ? AND fingerprint = ?",
+            (spider, fingerprint),
+        ).fetchone()
+
+    def load(self, spider: str, fingerprint: str) -> tuple[str, int, Headers, bytes] | None:
+        row = self.connection.execute(
+            "SELECT url, status, headers, body FROM responses WHERE spider = ? AND fingerprint = ?",
+            (spider, fingerprint),
+        ).fetchone()
+        if row is None:
+            return None
+        url, status, headers, body = row
+        headers = Headers({k: [v.encode("latin-1") for v in values] for k, values in json.loads(headers).items()})
+        return url, status, headers, zlib.decompress(body)
+
+    def save(self, spider: str, fingerprint: str, response: Response, digest: str) -> None:
+        headers = json.dumps(
+            {k.decode("latin-1"): [v.decode("latin-1") for v in values] for k, values in response.headers.items()}
+        )
+        etag = response.headers.get(b"ETag")
+        last_modified = response.headers.get(b"Last-Modified")
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                spider,
+                fingerprint,
+                response.url,
+                response.status,
+                headers,
+                zlib.compress(response.body),
+                digest,
+                etag.decode("latin-1") if etag else None,
+                last_modified.decode("latin-1") if last_modified else None,
+                time.time(),
+            ),
+        )
+        self._written()
+
+    def touch(self, spider: str, fingerprint: str) -> None:
+        self.connection.execute(
+            "UPDATE responses SET stored_at = ? WHERE spider = ? AND fingerprint = ?",
+            (time.time(), spider, fingerprint),
+        )
+        self._written()
+
+
+class ConditionalRequestCacheMiddleware:
+    """
+    Persist the last response received for each request across crawls, and
+    revalidate it on the next crawl with If-None-Match / If-Modified-Since
+    conditional request headers. A "304 Not Modified" answer is replaced with
+    the stored response, so spiders receive the full page as usual. Responses
+    which were served from the store, or whose body hash matches the stored
+    response, are flagged so that spiders can check `is_unchanged(response)`.
+
+    Enable with "-s CONDITIONAL_CACHE_ENABLED=True", optionally setting the
+    SQLite database path with "-s CONDITIONAL_CACHE_DB=path.sqlite". Requests
+    with the "dont_cache" meta key set, and requests rendered by Playwright or
+    Camoufox, are ignored.
+    """
+
+    crawler: Crawler
+    store: ResponseStore
+
+    def __init__(self, crawler: Crawler):
+        self.crawler = crawler
+        self.store = ResponseStore(crawler.settings.get("CONDITIONAL_CACHE_DB", "conditional_cache.sqlite"))
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        if not crawler.settings.getbool("CONDITIONAL_CACHE_ENABLED"):
+            raise NotConfigured()
+        middleware = cls(crawler)
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def spider_opened(self) -> None:
+        self.store.open()
+
+    def spider_closed(self) -> None:
+        self.store.close()
+
+    def _inc_value(self, key: str) -> None:
+        if self.crawler.stats:
+            self.crawler.stats.inc_value(f"atp/conditional_cache/{key}")
+
+    def _should_cache(self, request: Request) -> bool:
+        if request.method != "GET" or request.meta.get("dont_cache"):
+            return False
+        if request.meta.get("playwright") or request.meta.get("camoufox"):
+            return False
+        return True
+
+    def process_request(self, request: Request) -> None:
+        if not self._should_cache(request):
+            return
+        fingerprint = self.crawler.request_fingerprinter.fingerprint(request).hex()
+        request.meta["conditional_cache_fingerprint"] = fingerprint
+        spider_name = self.crawler.spider.name  # ty: ignore[unresolved-attribute]
+        if validators := self.store.validators(spider_name, fingerprint):
+            etag, last_modified, digest = validators
+            request.meta["conditional_cache_body_hash"] = digest
+            if etag:
+                request.headers.setdefault(b"If-None-Match", etag)
+            if last_modified:
+                request.headers.setdefault(b"If-Modified-Since", last_modified)
+
+    def process_response(self, request: Request, response: Response) -> Response:
+        fingerprint = request.meta.get("conditional_cache_fingerprint")
+        if not fingerprint:
+            return response
+        spider_name = self.crawler.spider.name  # ty: ignore[unresolved-attribute]
+
+        if response.status == 304 and request.meta.get("conditional_cache_body_hash"):
+            if cached := self.store.load(spider_name, fingerprint):
+                url, status, headers, body = cached
+                self.store.touch(spider_name, fingerprint)
+                self._inc_value("not_modified")
+                respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+                return respcls(
+                    url=url,
+                    status=status,
+                    headers=headers,
+                    body=body,
+                    request=request,
+                    flags=response.flags + ["cached", UNCHANGED_FLAG],
+                )
+
+        if response.status != 200:
+            return response
+
+        digest = body_hash(response.body)
+        if digest == request.meta.get("conditional_cache_body_hash"):
+            self._inc_value("unchanged")
+            response = response.replace(flags=response.flags + [UNCHANGED_FLAG])
+        elif request.meta.get("conditional_cache_body_hash"):
+            self._inc_value("changed")
+        else:
+            self._inc_value("new")
+        self.store.save(spider_name, fingerprint, response, digest)
+        return response
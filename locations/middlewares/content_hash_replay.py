@@ -0,0 +1,292 @@
+import hashlib
+import pickle
+import sqlite3
+import sys
+import time
+import zlib
+from typing import AsyncIterator, Iterable
+
+from scrapy import Request, Spider, signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Response
+from scrapy.item import Item
+from scrapy.utils.request import request_from_dict
+
+from locations.middlewares.conditional_request_cache import body_hash
+
+REPLAY_META_KEY = "content_hash_replay"
+
+
+def callback_name(request: Request) -> str:
+    # Requests without a callback are parsed by the spider's parse method.
+    return getattr(request.callback, "__name__", "parse")
+
+
+def spider_code_version(spider_cls: type[Spider]) -> str:
+    """
+    A hash of the source of the modules which define a spider class and the
+    classes it inherits from in this project, such as storefinders, so that
+    output recorded before a change to the parsing code is not replayed.
+    """
+    sha1 = hashlib.sha1()
+    for cls in spider_cls.__mro__:
+        if cls.__module__.split(".")[0] != "locations":
+            continue
+        if path := getattr(sys.modules.get(cls.__module__), "__file__", None):
+            with open(path, "rb") as f:
+                sha1.update(f.read())
+    return sha1.hexdigest()
+
+
+class CallbackOutputStore:
+    """
+    A SQLite store of the serialised output (items and requests) of each
+    callback which parsed the last response received for each request
+    fingerprint of a spider, keyed by the hash of that response body and the
+    version of the spider code which produced it.
+    """
+
+    commit_interval = 100
+    # Stored output is discarded when the table layout changes.
+    schema_version = 2
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = None
+        self.pending_writes = 0
+
+    def open(self) -> None:
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != self.schema_version:
+            self.connection.execute("DROP TABLE IF EXISTS callback_outputs")
+            self.connection.execute(f"PRAGMA user_version = {self.schema_version}")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS callback_outputs (
+                spider TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                callback TEXT NOT NULL,
+                code_version TEXT NOT NULL,
+                body_hash TEXT NOT NULL,
+                output BLOB NOT NULL,
+                stored_at REAL NOT NULL,
+                PRIMARY KEY (spider, fingerprint, callback)
+            )""")
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+
+    def delete_other_versions(self, spider: str, code_version: str) -> None:
+        """
+        Delete the output recorded by other versions of a spider's code,
+        which will never be replayed.
+        """
+        self.connection.execute(
+            "DELETE FROM callback_outputs WHERE spider = ? AND code_version != ?", (spider, code_version)
+        )
+        self.connection.commit()
+
+    def load(
+        self, spider: str, fingerprint: str, callback: str, code_version: str, digest: str
+    ) -> list[tuple[str, bytes]] | None:
+        row = self.connection.execute(
+            "SELECT output FROM callback_outputs"
+            " WHERE spider = ? AND fingerprint = ? AND callback = ? AND code_version = ? AND body_hash = ?",
+            (spider, fingerprint, callback, code_version, digest),
+        ).fetchone()
+        if row is None:
+            return None
+        return pickle.loads(zlib.decompress(row[0]))
+
+    def save(
+        self,
+        spider: str,
+        fingerprint: str,
+        callback: str,
+        code_version: str,
+        digest: str,
+        output: list[tuple[str, bytes]],
+    ) -> None:
+        self.connection.execute(
+            "INSERT OR REPLACE INTO callback_outputs VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (spider, fingerprint, callback, code_version, digest, zlib.compress(pickle.dumps(output)), time.time()),
+        )
+        self.pending_writes += 1
+        if self.pending_writes >= self.commit_interval:
+            self.connection.commit()
+            self.pending_writes = 0
+
+
+class ContentHashDownloaderMiddleware:
+    """
+    Hash each response body and look up whether the output of the request's
+    callback for the same request fingerprint and body hash was recorded by
+    a previous crawl. Keying on the fingerprint rather than the URL keeps
+    apart requests which POST different bodies to the same URL. If so,
+    the recorded output is attached to the request meta for
+    `ContentHashReplayMiddleware` to replay.
+
+    Enable with "-s CONTENT_HASH_REPLAY_ENABLED=True", optionally setting the
+    SQLite database path with "-s CONTENT_HASH_REPLAY_DB=path.sqlite".
+    Requests with the "dont_cache" meta key set are ignored.
+
+    Output recorded by a previous version of the spider's code (see
+    `spider_code_version`) is never replayed, and is deleted when the spider
+    is opened.
+
+    Must have a lower priority than `ConditionalRequestCacheMiddleware`, so
+    that it sees the stored response which replaces a "304 Not Modified".
+    """
+
+    crawler: Crawler
+    store: CallbackOutputStore
+    code_version: str
+
+    def __init__(self, crawler: Crawler, store: CallbackOutputStore):
+        self.crawler = crawler
+        self.store = store
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        if not crawler.settings.getbool("CONTENT_HASH_REPLAY_ENABLED"):
+            raise NotConfigured()
+        store = CallbackOutputStore(crawler.settings.get("CONTENT_HASH_REPLAY_DB", "content_hash_replay.sqlite"))
+        middleware = cls(crawler, store)
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(store.close, signal=signals.spider_closed)
+        # Share the store with the spider middleware half of the pair.
+        crawler.content_hash_replay_store = store  # ty: ignore[unresolved-attribute]
+        return middleware
+
+    def spider_opened(self, spider: Spider) -> None:
+        self.code_version = spider_code_version(type(spider))
+        self.store.open()
+        self.store.delete_other_versions(spider.name, self.code_version)
+
+    def process_response(self, request: Request, response: Response) -> Response:
+        # Follow-up requests created with a copy of the meta of a previous
+        # response would otherwise carry its replay state.
+        request.meta.pop(REPLAY_META_KEY, None)
+        if response.status != 200 or request.meta.get("dont_cache"):
+            return response
+        fingerprint = self.crawler.request_fingerprinter.fingerprint(request).hex()
+        callback = callback_name(request)
+        digest = body_hash(response.body)
+        output = self.store.load(
+            self.crawler.spider.name,  # ty: ignore[unresolved-attribute]
+            fingerprint,
+            callback,
+            self.code_version,
+            digest,
+        )
+        request.meta[REPLAY_META_KEY] = {
+            "fingerprint": fingerprint,
+            "callback": callback,
+            "code_version": self.code_version,
+            "body_hash": digest,
+            "output": output,
+        }
+        return response
+
+
+class ContentHashReplayMiddleware:
+    """
+    Replay the recorded callback output for responses which the
+    `ContentHashDownloaderMiddleware` found unchanged since the previous crawl,
+    without running the callback at all. Otherwise record the callback output
+    for the next crawl. Replayed items continue through the item pipelines as
+    normal.
+
+    Output is only recorded when every item can be pickled and every request
+    can be serialised with `Request.to_dict`, which requires callbacks to be
+    spider methods.
+    """
+
+    crawler: Crawler
+
+    def __init__(self, crawler: Crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        if not crawler.settings.getbool("CONTENT_HASH_REPLAY_ENABLED"):
+            raise NotConfigured()
+        return cls(crawler)
+
+    @property
+    def store(self) -> CallbackOutputStore:
+        return self.crawler.content_hash_replay_store  # ty: ignore[unresolved-attribute]
+
+    def _inc_value(self, key: str, count: int = 1) -> None:
+        if self.crawler.stats:
+            self.crawler.stats.inc_value(f"atp/content_hash_replay/{key}", count)
+
+    def _serialise(self, x: Item | Request) -> tuple[str, bytes] | None:
+        try:
+            if isinstance(x, Request):
+                request = x.to_dict(spider=self.crawler.spider)
+                request["meta"].pop(REPLAY_META_KEY, None)
+                return "request", pickle.dumps(request)
+            return "item", pickle.dumps(x)
+        except (ValueError, TypeError, AttributeError, pickle.PicklingError):
+            return None
+
+    def _deserialise(self, kind: str, data: bytes) -> Item | Request:
+        if kind == "request":
+            return request_from_dict(pickle.loads(data), spider=self.crawler.spider)
+        return pickle.loads(data)
+
+    def _replay(self, output: list[tuple[str, bytes]]) -> Iterable[Item | Request]:
+        self._inc_value("replayed_responses")
+        self._inc_value("replayed_outputs", len(output))
+        for kind, data in output:
+            yield self._deserialise(kind, data)
+
+    def _record(self, response: Response, output: list[tuple[str, bytes] | None]) -> None:
+        if None in output:
+            self._inc_value("unserialisable_responses")
+            return
+        replay = response.meta[REPLAY_META_KEY]
+        self.store.save(
+            self.crawler.spider.name,  # ty: ignore[unresolved-attribute]
+            replay["fingerprint"],
+            replay["callback"],
+            replay["code_version"],
+            replay["body_hash"],
+            output,  # ty: ignore[invalid-argument-type]
+        )
+        self._inc_value("recorded_responses")
+
+    def process_spider_output(self, response: Response, result: Iterable[Item | Request]) -> Iterable[Item | Request]:
+        if not (replay := response.meta.get(REPLAY_META_KEY)):
+            yield from result
+            return
+        if replay["output"] is not None:
+            # The callback output is generated lazily, so it is never run.
+            yield from self._replay(replay["output"])
+            return
+        output = []
+        for x in result:
+            output.append(self._serialise(x))
+            yield x
+        self._record(response, output)
+
+    async def process_spider_output_async(
+        self, response: Response, result: AsyncIterator[Item | Request]
+    ) -> AsyncIterator[Item | Request]:
+        if not (replay := response.meta.get(REPLAY_META_KEY)):
+            async for x in result:
+                yield x
+            return
+        if replay["output"] is not None:
+            for x in self._replay(replay["output"]):
+                yield x
+            return
+        output = []
+        async for x in result:
+            output.append(self._serialise(x))
+            yield x
+        self._record(response, output)
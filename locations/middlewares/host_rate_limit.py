@@ -0,0 +1,131 @@
+import fcntl
+import os
+import struct
+import time
+from fnmatch import fnmatch
+
+from scrapy import Request
+from scrapy.core.downloader.handlers import DownloadHandlerProtocol
+from scrapy.crawler import Crawler
+from scrapy.http import Response
+from scrapy.utils.defer import ensure_awaitable, maybe_deferred_to_future
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.misc import build_from_crawler, load_object
+from twisted.internet import reactor
+from twisted.internet.task import deferLater
+
+
+class HostRateCoordinator:
+    """
+    Coordinates requests to a host across processes, so that requests to the
+    host from all processes sharing `directory` are spaced at least an
+    interval apart. Each host has a file in `directory` holding the time from
+    which the next request to that host may be sent. A process reserves the
+    next request slot under an exclusive file lock, and then waits until that
+    slot before sending its request.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def reserve(self, host: str, interval: float) -> float:
+        """
+        Reserve the next request slot for `host`, returning the number of
+        seconds to wait before sending the request.
+        """
+        with open(os.path.join(self.directory, host), "a+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                data = f.read(8)
+                next_slot = struct.unpack("<d", data)[0] if len(data) == 8 else 0.0
+                now = time.time()
+                slot = max(now, next_slot)
+                f.seek(0)
+                f.truncate()
+                f.write(struct.pack("<d", slot + interval))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return slot - now
+
+
+class HostRateLimitDownloadHandler:
+    """
+    Throttle requests to shared hosts, such as storefinder APIs used by many
+    spiders, across all spider processes of a run rather than per spider.
+    Scrapy's DOWNLOAD_DELAY only applies within a single spider, so spiders
+    running in parallel can otherwise all send requests to the same host at
+    once.
+
+    HOST_RATE_LIMITS maps host names, which may include wildcards, to the
+    minimum interval in seconds between requests to each matching host from
+    all processes. Enable by setting HOST_RATE_LIMIT_DIR to a directory shared
+    by the spider processes, ie "-s HOST_RATE_LIMIT_DIR=/tmp/host_rate_limits".
+
+    This wraps the download handler of each scheme, given by
+    HOST_RATE_LIMIT_DOWNLOAD_HANDLERS or otherwise Scrapy's default, rather
+    than being a downloader middleware. Downloader middlewares see requests
+    before they join the queue of their downloader slot, where DOWNLOAD_DELAY
+    holds them back, whereas a download handler is called as each request
+    leaves that queue to be sent. Spiders which set their own
+    DOWNLOAD_HANDLERS, such as those using Playwright or Camoufox, are not
+    throttled.
+    """
+
+    lazy = False
+
+    crawler: Crawler
+    coordinator: HostRateCoordinator | None
+
+    def __init__(self, crawler: Crawler):
+        self.crawler = crawler
+        self.rate_limits = crawler.settings.getdict("HOST_RATE_LIMITS")
+        self.coordinator = None
+        if (directory := crawler.settings.get("HOST_RATE_LIMIT_DIR")) and self.rate_limits:
+            self.coordinator = HostRateCoordinator(directory)
+        self.intervals = {}
+        self.handlers = {}
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        return cls(crawler)
+
+    def interval(self, host: str) -> float | None:
+        if host not in self.intervals:
+            self.intervals[host] = next(
+                (float(interval) for pattern, interval in self.rate_limits.items() if fnmatch(host, pattern)), None
+            )
+        return self.intervals[host]
+
+    def handler(self, scheme: str) -> DownloadHandlerProtocol:
+        if scheme not in self.handlers:
+            path = (
+                self.crawler.settings.getdict("HOST_RATE_LIMIT_DOWNLOAD_HANDLERS").get(scheme)
+                or self.crawler.settings.getdict("DOWNLOAD_HANDLERS_BASE")[scheme]
+            )
+            self.handlers[scheme] = build_from_crawler(load_object(path), self.crawler)
+        return self.handlers[scheme]
+
+    async def wait(self, request: Request) -> None:
+        host = (urlparse_cached(request).hostname or "").lower()
+        if self.coordinator is None or not host or (interval := self.interval(host)) is None:
+            return
+        delay = self.coordinator.reserve(host, interval)
+        if self.crawler.stats:
+            self.crawler.stats.inc_value("atp/host_rate_limit/request_count")
+        if delay > 0:
+            if self.crawler.stats:
+                self.crawler.stats.inc_value("atp/host_rate_limit/delayed_request_count")
+                self.crawler.stats.inc_value("atp/host_rate_limit/delay_seconds", delay)
+            await maybe_deferred_to_future(deferLater(reactor, delay, lambda: None))
+
+    async def download_request(self, request: Request) -> Response:
+        await self.wait(request)
+        return await self.handler(urlparse_cached(request).scheme).download_request(request)
+
+    async def close(self) -> None:
+        for handler in self.handlers.values():
+            if hasattr(handler, "close"):
+                await ensure_awaitable(handler.close())
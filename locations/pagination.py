@@ -0,0 +1,80 @@
+from typing import Any, Iterable
+
+from scrapy import Request
+from scrapy.http import Response
+from scrapy.settings import BaseSettings
+
+FAN_OUT_META_KEY = "page_fan_out"
+
+
+class PageFanOutMixin:
+    """
+    Mixin for spiders of paginated APIs which report the total number of
+    pages or results in the first page of results. Instead of requesting
+    each page only after the previous page has been parsed, all remaining
+    pages are requested at once so that they are downloaded concurrently.
+
+    To use this mixin:
+      1. Implement `make_page_request(page)` to return a request for the
+         given page number (or result offset, depending on the API).
+      2. In the callback parsing each page, call
+         `yield from self.fan_out_pages(response, pages)` where `pages` is an
+         iterable of the remaining page numbers or offsets, typically
+         obtained with `remaining_pages` or `remaining_offsets`. Requests
+         are only yielded when parsing the first page.
+
+    If the API accepts multiple pages in a single request, set
+    `pages_per_request` and implement `make_page_batch_request(pages)`.
+
+    Concurrent requests per domain are limited by `page_concurrency`, which
+    can be set to None to use the project default.
+    """
+
+    page_concurrency: int | None = 4
+    pages_per_request: int = 1
+
+    @classmethod
+    def update_settings(cls, settings: BaseSettings) -> None:
+        # Applied before custom_settings so that spiders can still override
+        # CONCURRENT_REQUESTS_PER_DOMAIN themselves.
+        if cls.page_concurrency:
+            settings.set("CONCURRENT_REQUESTS_PER_DOMAIN", cls.page_concurrency, priority="spider")
+        super().update_settings(settings)  # ty: ignore[unresolved-attribute]
+
+    def make_page_request(self, page: Any) -> Request:
+        raise NotImplementedError()
+
+    def make_page_batch_request(self, pages: list[Any]) -> Request:
+        raise NotImplementedError()
+
+    def fan_out_pages(self, response: Response, pages: Iterable[Any]) -> Iterable[Request]:
+        if response.meta.get(FAN_OUT_META_KEY):
+            # Remaining pages were already requested from the first page.
+            return
+        if self.pages_per_request > 1:
+            pages = list(pages)
+            requests = [
+                self.make_page_batch_request(pages[i : i + self.pages_per_request])
+                for i in range(0, len(pages), self.pages_per_request)
+            ]
+        else:
+            requests = [self.make_page_request(page) for page in pages]
+        for request in requests:
+            request.meta[FAN_OUT_META_KEY] = True
+            yield request
+
+
+def remaining_pages(page: int, page_count: int) -> range:
+    """
+    Page numbers following `page` up to and excluding `page_count`, for APIs
+    where pages are numbered from zero. Add one to both arguments for APIs
+    where pages are numbered from one.
+    """
+    return range(page + 1, page_count)
+
+
+def remaining_offsets(offset: int, page_size: int, total_count: int) -> range:
+    """
+    Result offsets of the pages following the page starting at `offset`.
+    """
+    return range(offset + page_size, total_count, page_size)
@@ -1,51 +1,111 @@
 import array
-import itertools
 import json
-from typing import Any, Iterable, Iterator
+from typing import Any, Iterable, Iterator, Mapping
 
 # Maps from Flight tags to Python array/struct type codes
 ARRAY_TYPES = {"O": "b", "o": "B", "S": "h", "s": "H", "L": "l", "l": "L", "G": "f", "g": "d", "M": "q", "m": "Q"}
+# Tags of rows with a hexadecimal length prefix rather than a newline terminator
+LENGTH_PREFIXED_TAGS = b"AGLMOSTUVglmos"
+# Tags of newline terminated rows. Rows of any other newline terminated tag
+# have no tag, and the first character is part of the row data.
+NEWLINE_TERMINATED_TAGS = b"BCDEFHIJKNPQRWXYZrx"
 
 
-def parse_rsc(data_raw: Iterable[int]) -> Iterator[tuple[int, Any]]:
-    """Parse a React "Flight" stream, used for React Server Components.
-    There is no formal or human-readable specification for this format. The React source code for parsing it is here:
-    https://github.com/facebook/react/blob/e1378902bbb322aa1fe1953780f4b2b5f80d26b1/packages/react-client/src/ReactFlightClient.js
-    This code references that code (start with processBinaryChunk), but simplified to use iterators instead of a state
-    machine, and only returns JSON objects instead of fully deserializing.
+def iter_rsc_rows(data_raw: bytes | Iterable[int]) -> Iterator[tuple[int, str, memoryview]]:
+    """
+    Split a React "Flight" stream into (row ID, row tag, row data) without
+    decoding or copying row data, which is a memoryview of `data_raw`. Rows
+    without a tag have a row tag of "\\0".
     """
-    data = iter(data_raw)
+    data = data_raw if isinstance(data_raw, bytes) else bytes(data_raw)
+    view = memoryview(data)
+    size = len(data)
+    position = 0
     while True:
-        row_id_str = bytes(itertools.takewhile(lambda c: c != ord(":"), data))
-        if len(row_id_str) == 0:
-            row_id = 0
-        else:
-            row_id = int(row_id_str, 16)
-
-        try:
-            row_tag = chr(next(data))
-        except StopIteration:
+        end = data.find(b":", position)
+        if end == -1:
+            end = size
+        row_id = int(data[position:end], 16) if end > position else 0
+        position = end + 1
+        if position >= size:
             break
 
-        if row_tag in "AGLMOSTUVglmos":
-            row_length = int(bytes(itertools.takewhile(lambda c: c != ord(","), data)), 16)
-            row_data = bytes(itertools.islice(data, row_length))
+        row_tag = data[position]
+        position += 1
+        if row_tag in LENGTH_PREFIXED_TAGS:
+            end = data.find(b",", position)
+            if end == -1:
+                end = size
+            row_length = int(data[position:end], 16)
+            start = end + 1
+            position = min(start + row_length, size)
+            yield row_id, chr(row_tag), view[start:position]
         else:
-            row_data = bytes(itertools.takewhile(lambda c: c != ord("\n"), data))
-            if row_tag not in "BCDEFHIJKNPQRWXYZrx":
-                row_data = row_tag.encode() + row_data
-                row_tag = b"\0"
+            end = data.find(b"\n", position)
+            if end == -1:
+                end = size
+            if row_tag in NEWLINE_TERMINATED_TAGS:
+                yield row_id, chr(row_tag), view[position:end]
+            else:
+                yield row_id, "\0", view[position - 1 : end]
+            position = end + 1
+
+
+def decode_rsc_row(row_tag: str, row_data: memoryview) -> Any:
+    """
+    Decode the data of a row from `iter_rsc_rows` into a typed array, a
+    string, a (character, JSON) tuple or JSON, depending on the row tag.
+    """
+    if array_type := ARRAY_TYPES.get(row_tag):
+        row_array = array.array(array_type)
+        row_array.frombytes(row_data)
+        return row_array
+    row_str = str(row_data, "utf-8")
+    if row_tag == "H":
+        return row_str[0], json.loads(row_str[1:])
+    elif row_tag == "T":
+        return row_str
+    else:
+        return json.loads(row_str)
 
-        if array_type := ARRAY_TYPES.get(row_tag):
-            yield row_id, array.array(array_type, row_data)
-        else:
-            row_str = row_data.decode()
 
-            if not row_str:
+def parse_rsc(data_raw: bytes | Iterable[int]) -> Iterator[tuple[int, Any]]:
+    """Parse a React "Flight" stream, used for React Server Components.
+    There is no formal or human-readable specification for this format. The React source code for parsing it is here:
+    https://github.com/facebook/react/blob/e1378902bbb322aa1fe1953780f4b2b5f80d26b1/packages/react-client/src/ReactFlightClient.js
+    This code references that code (start with processBinaryChunk), but simplified to split rows by searching for
+    delimiters instead of a state machine, and only returns JSON objects instead of fully deserializing.
+    """
+    for row_id, row_tag, row_data in iter_rsc_rows(data_raw):
+        if not row_data and row_tag not in ARRAY_TYPES:
+            continue
+        yield row_id, decode_rsc_row(row_tag, row_data)
+
+
+class LazyRSC(Mapping[int, Any]):
+    """
+    A mapping of row IDs to rows of a React "Flight" stream, the same as
+    `dict(parse_rsc(data_raw))`, except that each row is only decoded when
+    it is first accessed. Use this instead of `parse_rsc` to avoid decoding
+    the JSON of every row of a large stream when only a few rows are needed.
+    """
+
+    def __init__(self, data_raw: bytes | Iterable[int]):
+        self._rows = {}
+        for row_id, row_tag, row_data in iter_rsc_rows(data_raw):
+            if not row_data and row_tag not in ARRAY_TYPES:
                 continue
-            if row_tag == "H":
-                yield row_id, (row_str[0], json.loads(row_str[1:]))
-            elif row_tag == "T":
-                yield row_id, row_str
-            else:
-                yield row_id, json.loads(row_str)
+            # Later rows replace earlier rows with the same ID, as with dict().
+            self._rows[row_id] = (row_tag, row_data)
+        self._decoded = {}
+
+    def __getitem__(self, row_id: int) -> Any:
+        if row_id not in self._decoded:
+            self._decoded[row_id] = decode_rsc_row(*self._rows[row_id])
+        return self._decoded[row_id]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
@@ -1,4 +1,23 @@
+import csv
+import gzip
+import json
+import mmap
 import os
+import struct
+from array import array
+from functools import lru_cache
+from typing import NamedTuple
+
+# Packed binary copy of the point CSV files in this directory, generated by
+# ci/build_searchable_points.py. The file starts with PACKED_POINTS_MAGIC, then
+# the length of a JSON index as an unsigned 64-bit integer, the JSON index
+# itself and padding to an 8 byte boundary. The remainder of the file is an
+# array of float64 latitude and longitude pairs.
+PACKED_POINTS_FILENAME = "searchable_points.bin"
+PACKED_POINTS_MAGIC = b"ATPPOINTS2\n"
+AREA_FIELDS = ["country", "territory", "state"]
+# Area of the points of a file with an area column which have no area.
+NO_AREA = ""
 
 
 def open_searchable_points(filename):
@@ -7,3 +26,154 @@ def open_searchable_points(filename):
 
 def get_searchable_points_path(filename):
     return f"{os.path.dirname(os.path.realpath(__file__))}/{filename}"
+
+
+class PointsTable(NamedTuple):
+    """
+    The (latitude, longitude) points of a searchable points CSV file, in file
+    order. If the file has an area column (country, territory or state),
+    `area_runs` maps each area to the (start, stop) index ranges of its points,
+    with any points which have no area under `NO_AREA`.
+    """
+
+    points: tuple[tuple[float, float], ...]
+    area_runs: dict[str, list[tuple[int, int]]] | None
+
+    def area_points(self, areas: list[str]) -> list[tuple[float, float]]:
+        runs = sorted(run for area in areas for run in self.area_runs.get(area, []))
+        return [point for start, stop in runs for point in self.points[start:stop]]
+
+
+def parse_points_csv(filename: str) -> PointsTable:
+    points = []
+    area_runs = {}
+    with open_searchable_points(filename) as file:
+        reader = csv.DictReader(file)
+        has_areas = any(key in reader.fieldnames for key in AREA_FIELDS)
+        for row in reader:
+            try:
+                points.append((float(row["latitude"]), float(row["longitude"])))
+            except ValueError:
+                raise Exception(
+                    "Invalid latitude/longitude in searchable points file {} where latitude = {} and longitude = {}.".format(
+                        filename, row["latitude"], row["longitude"]
+                    )
+                )
+            if not has_areas:
+                continue
+            area = next((row[key] for key in AREA_FIELDS if row.get(key)), NO_AREA)
+            runs = area_runs.setdefault(area, [])
+            index = len(points) - 1
+            if runs and runs[-1][1] == index:
+                runs[-1] = (runs[-1][0], index + 1)
+            else:
+                runs.append((index, index + 1))
+    return PointsTable(tuple(points), area_runs if has_areas else None)
+
+
+def _source_signature(filename: str) -> list[int]:
+    stat = os.stat(get_searchable_points_path(filename))
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def write_packed_points(filenames: list[str], path: str | None = None) -> None:
+    """
+    Pack the points of the given CSV files (paths relative to this
+    directory) into a single binary file which `read_points` maps into
+    memory instead of parsing the CSV files.
+    """
+    index = {}
+    coordinates = array("d")
+    for filename in filenames:
+        table = parse_points_csv(filename)
+        index[filename] = {
+            "offset": len(coordinates) // 2,
+            "count": len(table.points),
+            "area_runs": table.area_runs,
+            "source": _source_signature(filename),
+        }
+        for lat, lon in table.points:
+            coordinates.append(lat)
+            coordinates.append(lon)
+    header = json.dumps(index, separators=(",", ":")).encode()
+    header_size = len(PACKED_POINTS_MAGIC) + 8 + len(header)
+    padding = b" " * (-header_size % 8)
+    path = path or get_searchable_points_path(PACKED_POINTS_FILENAME)
+    # Written alongside and then renamed, so that spiders never map a
+    # partially written file.
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            file.write(PACKED_POINTS_MAGIC)
+            file.write(struct.pack("<Q", len(header + padding)))
+            file.write(header + padding)
+            coordinates.tofile(file)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+@lru_cache(maxsize=None)
+def _packed_points(path: str) -> tuple[dict, memoryview] | None:
+    try:
+        with open(path, "rb") as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None
+    if data[: len(PACKED_POINTS_MAGIC)] != PACKED_POINTS_MAGIC:
+        return None
+    start = len(PACKED_POINTS_MAGIC) + 8
+    try:
+        (header_length,) = struct.unpack_from("<Q", data, len(PACKED_POINTS_MAGIC))
+        index = json.loads(data[start : start + header_length])
+        coordinates = memoryview(data)[start + header_length :].cast("d")
+        # A truncated or corrupt file is ignored, so that the CSV files are
+        # parsed instead.
+        if len(coordinates) != 2 * sum(entry["count"] for entry in index.values()):
+            return None
+    except (struct.error, ValueError, TypeError, KeyError, AttributeError):
+        return None
+    return index, coordinates
+
+
+def read_packed_points(filename: str, path: str | None = None) -> PointsTable | None:
+    """
+    Read the points of a searchable points CSV file from the packed binary
+    file, or return None if the packed binary file is missing or out of date
+    for that CSV file.
+    """
+    if not (packed := _packed_points(path or get_searchable_points_path(PACKED_POINTS_FILENAME))):
+        return None
+    index, coordinates = packed
+    if not (entry := index.get(filename)) or entry["source"] != _source_signature(filename):
+        return None
+    values = coordinates[entry["offset"] * 2 : (entry["offset"] + entry["count"]) * 2].tolist()
+    area_runs = entry["area_runs"]
+    if area_runs is not None:
+        area_runs = {area: [tuple(run) for run in runs] for area, runs in area_runs.items()}
+    return PointsTable(tuple(zip(values[0::2], values[1::2])), area_runs)
+
+
+@lru_cache(maxsize=128)
+def read_points(filename: str) -> PointsTable:
+    """
+    Read the points of a searchable points CSV file, from the packed binary
+    file if it is present and up to date for that CSV file. Parsed files are
+    cached in memory.
+    """
+    return read_packed_points(filename) or parse_points_csv(filename)
+
+
+@lru_cache(maxsize=8)
+def read_records(filename: str) -> tuple[dict, ...]:
+    """
+    Read the records of a (optionally gzip compressed) CSV file or JSON array
+    file in this directory. Parsed files are cached in memory, so callers
+    must not modify the returned records.
+    """
+    opener = gzip.open if filename.endswith(".gz") else open
+    with opener(get_searchable_points_path(filename), mode="rt") as file:
+        if filename.removesuffix(".gz").endswith(".json"):
+            return tuple(json.load(file))
+        return tuple(csv.DictReader(file))
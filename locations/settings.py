@@ -67,14 +67,29 @@ TELNETCONSOLE_ENABLED = False
 # See http://scrapy.readthedocs.org/en/latest/topics/spider-middleware.html
 SPIDER_MIDDLEWARES = {
     "locations.middlewares.track_sources.TrackSourcesMiddleware": 500,
+    # Closest to the spider, so that raw callback output is recorded and
+    # replayed requests are processed by the built-in middlewares.
+    "locations.middlewares.content_hash_replay.ContentHashReplayMiddleware": 950,
+    # Closer to the spider still, so that only time spent in callbacks is
+    # recorded. Output is passed through unchanged.
+    "locations.extensions.resource_profile.CallbackProfileMiddleware": 990,
 }
 
 # Enable or disable downloader middlewares
 # See http://scrapy.readthedocs.org/en/latest/topics/downloader-middleware.html
 DOWNLOADER_MIDDLEWARES = {}
 
+# Requests to shared hosts are throttled as they are sent by wrapping the
+# download handlers, which are given by HOST_RATE_LIMIT_DOWNLOAD_HANDLERS.
+# See locations/middlewares/host_rate_limit.py
+DOWNLOAD_HANDLERS = {
+    "http": "locations.middlewares.host_rate_limit.HostRateLimitDownloadHandler",
+    "https": "locations.middlewares.host_rate_limit.HostRateLimitDownloadHandler",
+}
+HOST_RATE_LIMIT_DOWNLOAD_HANDLERS = {}
+
 if os.environ.get("ZYTE_API_KEY"):
-    DOWNLOAD_HANDLERS = {
+    HOST_RATE_LIMIT_DOWNLOAD_HANDLERS = {
         "http": "scrapy_zyte_api.ScrapyZyteAPIDownloadHandler",
         "https": "scrapy_zyte_api.ScrapyZyteAPIDownloadHandler",
     }
@@ -85,6 +100,12 @@ if os.environ.get("ZYTE_API_KEY"):
     REQUEST_FINGERPRINTER_CLASS = "scrapy_zyte_api.ScrapyZyteAPIRequestFingerprinter"
 
 DOWNLOADER_MIDDLEWARES["locations.middlewares.cdnstats.CDNStatsMiddleware"] = 500
+# Placed after HttpCompressionMiddleware (590) so that decompressed bodies are
+# stored and hashed.
+DOWNLOADER_MIDDLEWARES["locations.middlewares.conditional_request_cache.ConditionalRequestCacheMiddleware"] = 580
+# Placed after ConditionalRequestCacheMiddleware so that it hashes the stored
+# response which replaces a "304 Not Modified".
+DOWNLOADER_MIDDLEWARES["locations.middlewares.content_hash_replay.ContentHashDownloaderMiddleware"] = 575
 
 # Enable or disable extensions
 # See http://scrapy.readthedocs.org/en/latest/topics/extensions.html
@@ -95,6 +116,9 @@ DOWNLOADER_MIDDLEWARES["locations.middlewares.cdnstats.CDNStatsMiddleware"] = 50
 EXTENSIONS = {
     "locations.extensions.add_lineage.AddLineageExtension": 100,
     "locations.extensions.filter_stats.FilterStatsExtension": 150,
+    # Before LogStatsExtension, so that the profile is in the stats file.
+    "locations.extensions.resource_profile.ResourceProfileExtension": 900,
+    "locations.extensions.profiler.ProfilerExtension": 950,
     "locations.extensions.log_stats.LogStatsExtension": 1000,
 }
 
@@ -149,6 +173,47 @@ LOG_FORMATTER = "locations.logformatter.DebugDuplicateLogFormatter"
 # HTTPCACHE_IGNORE_HTTP_CODES = []
 # HTTPCACHE_STORAGE = 'scrapy.extensions.httpcache.FilesystemCacheStorage'
 
+# Persist responses across crawls and revalidate them with conditional
+# requests (If-None-Match / If-Modified-Since). Disabled by default.
+# See locations/middlewares/conditional_request_cache.py
+CONDITIONAL_CACHE_ENABLED = False
+CONDITIONAL_CACHE_DB = "conditional_cache.sqlite"
+
+# Skip callbacks for responses whose body is unchanged since the previous
+# crawl, replaying the items and requests they produced last time instead.
+# Disabled by default. See locations/middlewares/content_hash_replay.py
+CONTENT_HASH_REPLAY_ENABLED = False
+CONTENT_HASH_REPLAY_DB = "content_hash_replay.sqlite"
+
+# Record peak memory, CPU time, time spent in each item pipeline and
+# callback, and throughput per minute in the spider stats.
+# See locations/extensions/resource_profile.py
+RESOURCE_PROFILE_ENABLED = True
+RESOURCE_PROFILE_SAMPLE_INTERVAL = 10
+
+# Profile a crawl with "-s ATP_PROFILE=timers,cprofile,sample" (or any of
+# these modes), or with the ATP_PROFILE environment variable on CI runners.
+# Profiles are written next to LOGSTATS_FILE, or to ATP_PROFILE_DIR.
+# See locations/extensions/profiler.py
+ATP_PROFILE = os.environ.get("ATP_PROFILE", "")
+ATP_PROFILE_DIR = "."
+ATP_PROFILE_INTERVAL = 0.01
+
+# Throttle requests to hosts shared by many spiders across all spider
+# processes of a run, with a minimum interval in seconds between requests to
+# each matching host, counted from when requests are sent. Disabled unless
+# HOST_RATE_LIMIT_DIR is set to a directory shared by the processes. Spiders
+# which set their own DOWNLOAD_HANDLERS, such as Playwright and Camoufox
+# spiders, are not throttled.
+# See locations/middlewares/host_rate_limit.py
+HOST_RATE_LIMIT_DIR = None
+HOST_RATE_LIMITS = {
+    "hosted.where2getit.com": 0.5,
+    "cdn.yextapis.com": 0.25,
+    "*.algolia.net": 0.25,
+    "services*.arcgis.com": 0.5,
+}
+
 DEFAULT_PLAYWRIGHT_SETTINGS = {
     "DOWNLOAD_HANDLERS": {
         "http": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
@@ -1,3 +1,5 @@
+from typing import Iterable
+
 from locations.items import Feature
 from locations.licenses import Licenses
 from locations.spiders.addresses.be.best_addresses_be import BeSTAddressesBESpider
@@ -10,12 +12,12 @@ class BeSTBruAddressesBESpider(BeSTAddressesBESpider):
         "attribution:website": "https://datastore.brussels/web/data/dataset/a8c9ccde-5c2b-11ed-913a-900f0cda5d5c",
         "use:commercial": "permit",
     }
-    region_urls = [
+    csv_urls = [
         "https://opendata.bosa.be/download/best/openaddress-bebru.zip",  # Brussels
     ]
 
-    def post_process_item(self, item: Feature, row: dict) -> Feature:
+    def post_process_item(self, item: Feature, row: dict) -> Iterable[Feature]:
         item["city"] = row.get("municipality_name_fr") or row.get("municipality_name_nl")
         item["street"] = row.get("streetname_fr") or row.get("streetname_nl")
         item["extras"]["addr:district"] = row.get("postname_fr") or row.get("postname_nl")
-        return item
+        yield item
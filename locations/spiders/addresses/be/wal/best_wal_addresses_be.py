@@ -1,3 +1,5 @@
+from typing import Iterable
+
 from locations.items import Feature
 from locations.licenses import Licenses
 from locations.spiders.addresses.be.best_addresses_be import BeSTAddressesBESpider
@@ -10,12 +12,12 @@ class BeSTWalAddressesBESpider(BeSTAddressesBESpider):
         "attribution:website": "https://geodata.wallonie.be/id/2998bccd-dae4-49fb-b6a5-867e6c37680f",
         "use:commercial": "permit",
     }
-    region_urls = [
+    csv_urls = [
         "https://opendata.bosa.be/download/best/openaddress-bewal.zip",  # Wallonia
     ]
 
-    def post_process_item(self, item: Feature, row: dict) -> Feature:
+    def post_process_item(self, item: Feature, row: dict) -> Iterable[Feature]:
         item["city"] = row.get("municipality_name_fr")
         item["street"] = row.get("streetname_fr")
         item["extras"]["addr:district"] = row.get("postname_fr")
-        return item
+        yield item
@@ -1,10 +1,10 @@
 from typing import Any
 
-from pyproj import Transformer
 from scrapy import Spider
 from scrapy.http import Response
 
 from locations.categories import Categories, apply_category
+from locations.geo import transform_coordinates
 from locations.hours import OpeningHours
 from locations.items import Feature
 
@@ -16,11 +16,16 @@ class BringDKSpider(Spider):
     start_urls = ["https://www.bring.dk/en/map/_/service/no.posten.map/enonicUnits?country=DK&englishData=true"]
 
     def parse(self, response: Response, **kwargs: Any) -> Any:
-        transformer = Transformer.from_crs(25832, 4326)
-        for location in response.json()["units"]:
+        locations = response.json()["units"]
+        lats, lons = transform_coordinates(
+            [location["geometry"]["x"] for location in locations],
+            [location["geometry"]["y"] for location in locations],
+            25832,
+        )
+        for location, lat, lon in zip(locations, lats, lons):
             attributes = location["attributes"]
             item = Feature()
-            item["lat"], item["lon"] = transformer.transform(location["geometry"]["x"], location["geometry"]["y"])
+            item["lat"], item["lon"] = lat, lon
             item["ref"] = attributes["enhetsnr"]
             item["website"] = "https://www.bring.dk/en/map?ID={}".format(attributes["enhetsnr"])
             item["name"] = attributes["navn"]
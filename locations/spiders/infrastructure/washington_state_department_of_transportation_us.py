@@ -1,10 +1,10 @@
 from typing import Iterable
 
 from chompjs import parse_js_object
-from pyproj import Transformer
 from scrapy.http import Response
 
 from locations.categories import Categories
+from locations.geo import get_transformer
 from locations.items import Feature
 from locations.json_blob_spider import JSONBlobSpider
 
@@ -33,7 +33,7 @@ class WashingtonStateDepartmentOfTransportationUSSpider(JSONBlobSpider):
             return
         item["ref"] = str(feature["attributes"]["CameraID"])
         item["name"] = feature["attributes"]["CameraTitle"]
-        item["lat"], item["lon"] = Transformer.from_crs("epsg:3857", "epsg:4326").transform(
+        item["lat"], item["lon"] = get_transformer("epsg:3857", "epsg:4326").transform(
             feature["geometry"]["x"], feature["geometry"]["y"]
         )
         item["extras"]["contact:webcam"] = feature["attributes"]["ImageURL"]
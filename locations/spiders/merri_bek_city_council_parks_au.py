@@ -1,11 +1,11 @@
 from typing import AsyncIterator, Iterable
 
-from pyproj import Transformer
 from scrapy.http import Request, Response
 from scrapy.selector import Selector
 from scrapy.spiders import XMLFeedSpider
 
 from locations.categories import Categories, apply_category
+from locations.geo import get_transformer
 from locations.items import Feature
 
 
@@ -55,9 +55,7 @@ class MerriBekCityCouncilParksAUSpider(XMLFeedSpider):
             .get()
             .split(",", 1)
         )
-        properties["lat"], properties["lon"] = Transformer.from_crs(source_projection, 4326).transform(
-            lon_source, lat_source
-        )
+        properties["lat"], properties["lon"] = get_transformer(source_projection).transform(lon_source, lat_source)
         apply_category(Categories.LEISURE_PARK, properties)
         properties["extras"]["access"] = "yes"
         yield Feature(**properties)
@@ -1,5 +1,4 @@
-from chompjs import parse_js_object
-
+from locations.js_object_utils import extract_js_object
 from locations.json_blob_spider import JSONBlobSpider
 
 PAUL_SHARED_ATTRIBUTES = {"brand": "Paul", "brand_wikidata": "Q3370417"}
@@ -11,8 +10,7 @@ class PaulFRSpider(JSONBlobSpider):
     start_urls = ["https://www.paul.fr/stores/"]
 
     def extract_json(self, response):
-        data_raw = response.xpath('//script[contains(text(), "Smile_StoreLocator\\/retailer\\/search")]/text()').get()
-        return parse_js_object(data_raw.split('markers":', 1)[1])
+        return extract_js_object(response, ["Smile_StoreLocator\\/retailer\\/search", 'markers":'])
 
     def post_process_item(self, item, response, location):
         item["branch"] = item.pop("name")
@@ -1,10 +1,10 @@
 from typing import Any
 
-import pyproj
 from scrapy import Spider
 from scrapy.http import Response
 
 from locations.categories import Categories, apply_category, apply_yes_no
+from locations.geo import transform_coordinates
 from locations.hours import OpeningHours
 from locations.items import Feature
 
@@ -15,13 +15,18 @@ class PostenNOSpider(Spider):
     start_urls = ["https://www.posten.no/en/map/_/service/no.posten.map/enonicUnits?country=NO"]
 
     def parse(self, response: Response, **kwargs: Any) -> Any:
-        transformer = pyproj.Transformer.from_crs(25833, 4326)
-        for location in response.json()["units"]:
+        locations = response.json()["units"]
+        lats, lons = transform_coordinates(
+            [location["geometry"]["x"] for location in locations],
+            [location["geometry"]["y"] for location in locations],
+            25833,
+        )
+        for location, lat, lon in zip(locations, lats, lons):
             attributes = location["attributes"]
 
             item = Feature()
             item["ref"] = item["extras"]["ref:posten"] = attributes["enhetsnr"]
-            item["lat"], item["lon"] = transformer.transform(location["geometry"]["x"], location["geometry"]["y"])
+            item["lat"], item["lon"] = lat, lon
 
             # item["extras"]["fixme:description"] = attributes["beliggenhet"]
             item["name"] = attributes["navn"]
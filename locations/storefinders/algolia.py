@@ -5,9 +5,10 @@ from scrapy.http import JsonRequest, TextResponse
 
 from locations.dict_parser import DictParser
 from locations.items import Feature
+from locations.pagination import PageFanOutMixin, remaining_pages
 
 
-class AlgoliaSpider(Spider):
+class AlgoliaSpider(PageFanOutMixin, Spider):
     """
     Documentation of the Algolia API is available at:
     https://www.algolia.com/doc/rest-api/search/
@@ -18,6 +19,9 @@ class AlgoliaSpider(Spider):
     Override post_process_item to extract attributes from each object.
     Optionally set `referer` as the HTTP Referer header of the store search
     page.
+
+    All pages after the first are requested at once, with up to
+    `pages_per_request` pages combined into each multiple queries request.
     """
 
     dataset_attributes: dict = {"source": "api", "api": "algolia"}
@@ -26,14 +30,20 @@ class AlgoliaSpider(Spider):
     index_name: str
     myfilter: str | None = None
     referer: str | None = None
+    pages_per_request: int = 10
 
-    def _make_request(self, page: int | None = None) -> JsonRequest:
+    def _make_params(self, page: int | None) -> str:
         params = "hitsPerPage=1000"
         if self.myfilter is not None:
             params += f"&filters={self.myfilter}"
         if page is not None:
             params += f"&page={page}"
+        return params
 
+    def _make_request(self, page: int | None = None) -> JsonRequest:
+        return self.make_page_batch_request([page])
+
+    def make_page_batch_request(self, pages: list[int | None]) -> JsonRequest:
         headers = {"x-algolia-api-key": self.api_key, "x-algolia-application-id": self.app_id}
         if self.referer is not None:
             headers["Referer"] = self.referer
@@ -45,8 +55,9 @@ class AlgoliaSpider(Spider):
                 "requests": [
                     {
                         "indexName": self.index_name,
-                        "params": params,
+                        "params": self._make_params(page),
                     }
+                    for page in pages
                 ],
             },
         )
@@ -55,14 +66,14 @@ class AlgoliaSpider(Spider):
         yield self._make_request(None)
 
     def parse(self, response: TextResponse) -> Iterable[Feature | JsonRequest]:
-        result = response.json()["results"][0]
-        for feature in result["hits"]:
-            self.pre_process_data(feature)
-            item = DictParser.parse(feature)
-            yield from self.post_process_item(item, response, feature) or []
-
-        if result["page"] + 1 < result["nbPages"]:
-            yield self._make_request(result["page"] + 1)
+        results = response.json()["results"]
+        for result in results:
+            for feature in result["hits"]:
+                self.pre_process_data(feature)
+                item = DictParser.parse(feature)
+                yield from self.post_process_item(item, response, feature) or []
+
+        yield from self.fan_out_pages(response, remaining_pages(results[0]["page"], results[0]["nbPages"]))
 
     def pre_process_data(self, location: dict) -> None:
         """Override with any pre-processing on the item."""
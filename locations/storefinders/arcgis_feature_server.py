@@ -4,6 +4,7 @@ from urllib.parse import quote_plus
 
 from scrapy import Spider
 from scrapy.http import JsonRequest, TextResponse
+from twisted.python.failure import Failure
 
 from locations.dict_parser import DictParser
 from locations.items import Feature
@@ -53,7 +54,8 @@ class ArcGISFeatureServerSpider(Spider):
 
     Different ArcGIS Feature Servers will have varied maximum record counts
     configured to be returned per query. This class will automatically detect
-    the maximum record counts and request all features, batch by batch.
+    the maximum record counts, count the features in the layer and then
+    request all batches of features concurrently.
 
     Warnings will raised if any of the following conditions occur:
       1. Source data has a last data modification timestamp greater than 365
@@ -144,22 +146,57 @@ class ArcGISFeatureServerSpider(Spider):
                 output_field_names.append(field_name)
             output_fields = ",".join(output_field_names)
 
-        max_record_count_fields = ""
-        if max_record_count := layer_details["maxRecordCount"]:
-            max_record_count_fields = f"&resultOffset=0&resultRecordCount={max_record_count}"
-
         where_query_urlencoded = quote_plus(self.where_query)
+        additional_parameters_str = "".join(
+            [
+                f"&{parameter_name}={parameter_value}"
+                for parameter_name, parameter_value in self.additional_parameters.items()
+            ]
+        )
+        query_url = f"https://{self.host}/{self.context_path}/rest/services/{self.service_id}/{self.server_type}/{self.layer_id}/query?where={where_query_urlencoded}"
 
-        query_url = f"https://{self.host}/{self.context_path}/rest/services/{self.service_id}/{self.server_type}/{self.layer_id}/query?where={where_query_urlencoded}&outFields={output_fields}&outSR=4326{max_record_count_fields}&f=geojson"
-        if len(self.additional_parameters.keys()) > 0:
-            additional_parameters_str = "".join(
-                [
-                    f"&{parameter_name}={parameter_value}"
-                    for parameter_name, parameter_value in self.additional_parameters.items()
-                ]
+        if max_record_count := layer_details["maxRecordCount"]:
+            # Count the features first so that every page of features can be
+            # requested at once rather than one page after another.
+            page_url = f"{query_url}&outFields={output_fields}&outSR=4326&resultOffset=0&resultRecordCount={max_record_count}&f=geojson{additional_parameters_str}"
+            yield JsonRequest(
+                url=f"{query_url}&returnCountOnly=true&f=json{additional_parameters_str}",
+                meta={"page_url": page_url, "max_record_count": max_record_count},
+                callback=self.parse_feature_count,
+                errback=self.parse_feature_count_failed,
+            )
+        else:
+            yield JsonRequest(
+                url=f"{query_url}&outFields={output_fields}&outSR=4326&f=geojson{additional_parameters_str}",
+                callback=self.parse_features,
             )
-            query_url = query_url + additional_parameters_str
-        yield JsonRequest(url=query_url, callback=self.parse_features)
+
+    def parse_feature_count(self, response: TextResponse) -> Iterable[JsonRequest]:
+        page_url = response.meta["page_url"]
+        max_record_count = response.meta["max_record_count"]
+        feature_count = response.json().get("count")
+        if feature_count is None:
+            # Count unavailable, fall back to requesting one page after
+            # another until a page is not full.
+            yield JsonRequest(url=page_url, callback=self.parse_features)
+            return
+
+        last_offset = max(feature_count - 1, 0) // max_record_count * max_record_count
+        for offset in range(0, last_offset + max_record_count, max_record_count):
+            yield JsonRequest(
+                url=page_url.replace("&resultOffset=0&", f"&resultOffset={offset}&"),
+                # Only the last page continues to the next page if it is full,
+                # in case features were added since they were counted.
+                meta={"follow_next_page": offset == last_offset},
+                callback=self.parse_features,
+                dont_filter=True,
+            )
+
+    def parse_feature_count_failed(self, failure: Failure) -> Iterable[JsonRequest]:
+        # Not all servers support counting features, fall back to requesting
+        # one page after another until a page is not full.
+        self.logger.warning(f"Failed to count features, requesting pages one after another: {failure.value}")
+        yield JsonRequest(url=failure.request.meta["page_url"], callback=self.parse_features)
 
     def parse_features(self, response: TextResponse) -> Iterable[Feature]:
         features = response.json()["features"]
@@ -181,7 +218,7 @@ class ArcGISFeatureServerSpider(Spider):
 
             yield from self.post_process_item(item, response, feature)
 
-        if "&resultRecordCount=" in response.url:
+        if "&resultRecordCount=" in response.url and response.meta.get("follow_next_page", True):
             request = response.request
             if not request:
                 raise RuntimeError(
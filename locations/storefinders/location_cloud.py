@@ -4,11 +4,12 @@ from scrapy import Spider
 from scrapy.http import Request, Response
 
 from locations.items import Feature
+from locations.pagination import PageFanOutMixin, remaining_offsets
 
 # https://location-cloud.navitime.co.jp/
 
 
-class LocationCloudSpider(Spider):
+class LocationCloudSpider(PageFanOutMixin, Spider):
     dataset_attributes: dict = {"source": "api"}
 
     api_endpoint: str
@@ -24,6 +25,9 @@ class LocationCloudSpider(Spider):
             meta={"offset": offset},
         )
 
+    def make_page_request(self, page: int) -> Request:
+        return self._get_page(page)
+
     def parse(self, response: Response, **kwargs: Any) -> Any:
         data = response.json()  # ty: ignore[unresolved-attribute]
 
@@ -39,8 +43,9 @@ class LocationCloudSpider(Spider):
 
             yield from self.post_process_feature(item, location)
 
-        if data["count"]["offset"] + data["count"]["limit"] < data["count"]["total"]:
-            yield self._get_page(data["count"]["limit"] + response.meta["offset"])
+        yield from self.fan_out_pages(
+            response, remaining_offsets(response.meta["offset"], data["count"]["limit"], data["count"]["total"])
+        )
 
     def post_process_feature(self, item: Feature, source_feature: dict, **kwargs) -> Iterable[Feature]:
         yield item
@@ -6,10 +6,11 @@ from scrapy.http import JsonRequest, TextResponse
 from locations.dict_parser import DictParser
 from locations.hours import DAYS, OpeningHours
 from locations.items import Feature
+from locations.pagination import PageFanOutMixin, remaining_pages
 from locations.pipelines.address_clean_up import merge_address_lines
 
 
-class WoosmapSpider(Spider):
+class WoosmapSpider(PageFanOutMixin, Spider):
     """
     Documentation available at:
     https://developers.woosmap.com/products/search-api/get-started/
@@ -25,13 +26,16 @@ class WoosmapSpider(Spider):
     key: str
     origin: str
 
-    async def start(self) -> AsyncIterator[JsonRequest]:
-        yield JsonRequest(
-            url=f"https://api.woosmap.com/stores?key={self.key}&stores_by_page=300&page=1",
+    def make_page_request(self, page: int) -> JsonRequest:
+        return JsonRequest(
+            url=f"https://api.woosmap.com/stores?key={self.key}&stores_by_page=300&page={page}",
             headers={"Origin": self.origin},
             meta={"referrer_policy": "no-referrer"},
         )
 
+    async def start(self) -> AsyncIterator[JsonRequest]:
+        yield self.make_page_request(1)
+
     def parse(self, response: TextResponse) -> Iterable[Feature | JsonRequest]:
         if features := response.json()["features"]:
             for feature in features:
@@ -58,14 +62,10 @@ class WoosmapSpider(Spider):
                 yield from self.parse_item(item, feature) or []
 
         if pagination := response.json()["pagination"]:
-            current_page = int(pagination["page"])
-            total_pages = int(pagination["pageCount"])
-            if current_page < total_pages:
-                yield JsonRequest(
-                    url=f"https://api.woosmap.com/stores?key={self.key}&stores_by_page=300&page={current_page + 1}",
-                    headers={"Origin": self.origin},
-                    meta={"referrer_policy": "no-referrer"},
-                )
+            # Pages are numbered from one.
+            yield from self.fan_out_pages(
+                response, remaining_pages(int(pagination["page"]), int(pagination["pageCount"]) + 1)
+            )
 
     def parse_item(self, item: Feature, feature: dict) -> Iterable[Feature]:
         yield item
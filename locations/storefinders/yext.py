@@ -8,10 +8,11 @@ from locations.categories import Extras, PaymentMethods, apply_yes_no
 from locations.dict_parser import DictParser
 from locations.hours import OpeningHours
 from locations.items import Feature
+from locations.pagination import PageFanOutMixin, remaining_offsets
 from locations.structured_data_spider import clean_facebook
 
 
-class YextSpider(Spider):
+class YextSpider(PageFanOutMixin, Spider):
     """
     Documentation for the Yext API is available at:
       1. https://hitchhikers.yext.com/docs/contentdeliveryapis/introduction/overview-policies-and-conventions/
@@ -40,6 +41,9 @@ class YextSpider(Spider):
             meta={"offset": next_offset},
         )
 
+    def make_page_request(self, page: int) -> JsonRequest:
+        return self.make_request(page)
+
     async def start(self) -> AsyncIterator[JsonRequest]:
         if not self.api_version:
             now = datetime.datetime.now()
@@ -98,9 +102,9 @@ class YextSpider(Spider):
 
             yield from self.parse_item(item, location) or []
 
-        next_offset = response.meta["offset"] + self.page_limit
-        if next_offset < response.json()["response"]["count"]:
-            yield self.make_request(next_offset)
+        yield from self.fan_out_pages(
+            response, remaining_offsets(response.meta["offset"], self.page_limit, response.json()["response"]["count"])
+        )
 
     @staticmethod
     def parse_opening_hours(hours: dict) -> OpeningHours:
@@ -6,11 +6,12 @@ from scrapy.http import JsonRequest, TextResponse
 from locations.dict_parser import DictParser
 from locations.hours import OpeningHours
 from locations.items import Feature
+from locations.pagination import PageFanOutMixin, remaining_offsets
 from locations.pipelines.address_clean_up import merge_address_lines
 from locations.storefinders.yext_answers import YextAnswersSpider
 
 
-class YextSearchSpider(Spider):
+class YextSearchSpider(PageFanOutMixin, Spider):
     dataset_attributes: dict = {"source": "api", "api": "yext"}
     custom_settings: dict = {"ROBOTSTXT_OBEY": False}
 
@@ -20,6 +21,9 @@ class YextSearchSpider(Spider):
     def make_request(self, offset: int) -> JsonRequest:
         return JsonRequest("{}/search?r=250000&per={}&offset={}".format(self.host, self.page_size, offset))
 
+    def make_page_request(self, page: int) -> JsonRequest:
+        return self.make_request(page)
+
     async def start(self) -> AsyncIterator[Request]:
         yield self.make_request(0)
 
@@ -85,8 +89,9 @@ class YextSearchSpider(Spider):
         pager = response.json()["queryParams"]
         offset = int(pager["offset"][0])
         page_size = int(pager["per"][0])
-        if offset + page_size < response.json()["response"]["count"]:
-            yield self.make_request(offset + page_size)
+        yield from self.fan_out_pages(
+            response, remaining_offsets(offset, page_size, response.json()["response"]["count"])
+        )
 
     def parse_opening_hours(self, hours: dict, **kwargs: Any) -> OpeningHours:
         oh = OpeningHours()
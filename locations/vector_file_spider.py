@@ -1,6 +1,7 @@
 from typing import Iterable
 
-from geopandas import read_file
+import shapely
+from pyogrio import open_arrow
 from scrapy import Spider
 from scrapy.http import Response
 
@@ -37,15 +38,33 @@ class VectorFileSpider(Spider):
     methods can be used extract additional non-standard fields which
     DictParser doesn't automatically extract, or to clean up fields of data
     that are incorrect or formatted incorrectly.
+
+    Features are read as Arrow record batches of `batch_size` features, so
+    only one batch of features is held in memory as Python objects at a time.
     """
 
+    batch_size: int = 10000
+
     def parse(self, response: Response) -> Iterable[Feature]:
-        feature_collection = read_file(response.body).to_geo_dict()
-        for feature in feature_collection["features"]:
-            feature.update(feature.pop("properties"))
-            self.pre_process_data(feature)
-            item = DictParser.parse(feature)
-            yield from self.post_process_item(item, response, feature)
+        with open_arrow(response.body, batch_size=self.batch_size, use_pyarrow=True) as (meta, reader):
+            geometry_column = meta["geometry_name"] or "wkb_geometry"
+            feature_id = 0
+            for batch in reader:
+                geometries = shapely.from_wkb(batch.column(geometry_column).to_numpy(zero_copy_only=False))
+                properties = batch.drop_columns([geometry_column]).to_pylist()
+                for row, geometry in zip(properties, geometries):
+                    # The same keys as a feature of GeoDataFrame.to_geo_dict()
+                    # flattened with its properties.
+                    feature = {
+                        "id": str(feature_id),
+                        "type": "Feature",
+                        "geometry": geometry.__geo_interface__ if geometry is not None else None,
+                    }
+                    feature.update(row)
+                    feature_id += 1
+                    self.pre_process_data(feature)
+                    item = DictParser.parse(feature)
+                    yield from self.post_process_item(item, response, feature)
 
     def pre_process_data(self, feature: dict) -> None:
         """Override with any pre-processing on the data, ie normalising key names for DictParser."""
@@ -0,0 +1,89 @@
+import json
+
+from scrapy.http import JsonRequest, TextResponse
+from scrapy.spidermiddlewares.httperror import HttpError
+from twisted.python.failure import Failure
+
+from locations.storefinders.arcgis_feature_server import ArcGISFeatureServerSpider
+
+QUERY_URL = "https://example.com/arcgis/rest/services/Stores/FeatureServer/0/query?where=1%3D1"
+PAGE_URL = f"{QUERY_URL}&outFields=*&outSR=4326&resultOffset=0&resultRecordCount=100&f=geojson"
+
+
+class ExampleArcGISFeatureServerSpider(ArcGISFeatureServerSpider):
+    name = "example_arcgis_feature_server"
+    host = "example.com"
+    context_path = "arcgis"
+    service_id = "Stores"
+    layer_id = "0"
+
+
+def count_request() -> JsonRequest:
+    return JsonRequest(
+        url=f"{QUERY_URL}&returnCountOnly=true&f=json",
+        meta={"page_url": PAGE_URL, "max_record_count": 100},
+    )
+
+
+def count_response(data: dict) -> TextResponse:
+    request = count_request()
+    return TextResponse(url=request.url, body=json.dumps(data).encode(), request=request)
+
+
+def pages(requests: list[JsonRequest]) -> list[tuple[int, bool]]:
+    return [
+        (int(request.url.split("&resultOffset=", 1)[1].split("&", 1)[0]), request.meta.get("follow_next_page"))
+        for request in requests
+    ]
+
+
+def test_parse_feature_count():
+    spider = ExampleArcGISFeatureServerSpider()
+
+    assert pages(list(spider.parse_feature_count(count_response({"count": 250})))) == [
+        (0, False),
+        (100, False),
+        (200, True),
+    ]
+    # Only the last page continues if it is full.
+    assert pages(list(spider.parse_feature_count(count_response({"count": 200})))) == [(0, False), (100, True)]
+    assert pages(list(spider.parse_feature_count(count_response({"count": 100})))) == [(0, True)]
+    assert pages(list(spider.parse_feature_count(count_response({"count": 1})))) == [(0, True)]
+    assert pages(list(spider.parse_feature_count(count_response({"count": 0})))) == [(0, True)]
+
+
+def test_parse_feature_count_without_count():
+    spider = ExampleArcGISFeatureServerSpider()
+
+    requests = list(spider.parse_feature_count(count_response({"error": {"code": 400}})))
+
+    assert [request.url for request in requests] == [PAGE_URL]
+    assert requests[0].callback == spider.parse_features
+    assert "follow_next_page" not in requests[0].meta
+
+
+def test_parse_feature_count_failed():
+    spider = ExampleArcGISFeatureServerSpider()
+    request = count_request()
+    response = TextResponse(url=request.url, status=500, body=b"", request=request)
+    failure = Failure(HttpError(response))
+    failure.request = request
+
+    requests = list(spider.parse_feature_count_failed(failure))
+
+    assert [request.url for request in requests] == [PAGE_URL]
+    assert requests[0].callback == spider.parse_features
+
+
+def test_parse_layer_details_counts_features():
+    spider = ExampleArcGISFeatureServerSpider()
+    layer_details = {"capabilities": "Query", "supportedQueryFormats": "JSON, geoJSON", "maxRecordCount": 100}
+    url = "https://example.com/arcgis/rest/services/Stores/FeatureServer/0?f=json"
+    response = TextResponse(url=url, body=json.dumps(layer_details).encode(), request=JsonRequest(url))
+
+    requests = list(spider.parse_layer_details(response))
+
+    assert [request.url for request in requests] == [count_request().url]
+    assert requests[0].meta["page_url"] == PAGE_URL
+    assert requests[0].callback == spider.parse_feature_count
+    assert requests[0].errback == spider.parse_feature_count_failed
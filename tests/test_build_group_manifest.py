@@ -163,3 +163,24 @@ def test_never_run_spider_absent(tmp_path):
     )
 
     assert "new_spider" not in manifest["spiders"]
+
+
+def test_changes_are_linked(tmp_path):
+    stats_dir = tmp_path / "stats"
+    stats_dir.mkdir()
+    (stats_dir / "mcdonalds.json").write_text(json.dumps({"item_scraped_count": 100}))
+    changes = {"spiders": {"mcdonalds": {"added": 1, "changed": 2, "removed": 3}}}
+
+    manifest = build_manifest(
+        group="brands",
+        run_id="2026-04-16-14-00-00",
+        run_url_prefix="https://example.com/runs/brands/2026-04-16-14-00-00",
+        spider_names=["mcdonalds"],
+        stats_dir=stats_dir,
+        previous_manifest=None,
+        changes=changes,
+    )
+
+    entry = manifest["spiders"]["mcdonalds"]
+    assert entry["changes_url"] == "https://example.com/runs/brands/2026-04-16-14-00-00/changes/mcdonalds.ndgeojson"
+    assert entry["changes"] == {"added": 1, "changed": 2, "removed": 3}
@@ -0,0 +1,69 @@
+import json
+
+from ci.build_results_json import build_results, count_output_lines
+
+
+def test_build_results(tmp_path):
+    stats_dir = tmp_path / "stats"
+    stats_dir.mkdir()
+    (stats_dir / "mcdonalds.json").write_text(
+        json.dumps(
+            {
+                "item_scraped_count": 100,
+                "log_count/ERROR": 1,
+                "elapsed_time_seconds": 42.5,
+                "atp/profile/peak_rss_bytes": 1000,
+                "atp/profile/peak_children_rss_bytes": 500,
+                "atp/profile/cpu_user_seconds": 10.5,
+                "atp/profile/cpu_system_seconds": 0.5,
+                "atp/profile/pipeline_seconds/DuplicatesPipeline": 1.5,
+            }
+        )
+    )
+    (stats_dir / "burger_king.json").write_text(
+        json.dumps({"elapsed_time_seconds": 3, "atp/profile/pipeline_seconds/DuplicatesPipeline": 0.5})
+    )
+    (stats_dir / "broken.json").write_text("{")
+
+    results = build_results(
+        {
+            "mcdonalds": "locations/spiders/mcdonalds.py",
+            "burger_king": "locations/spiders/burger_king.py",
+            "broken": "locations/spiders/broken.py",
+            "missing": "locations/spiders/missing.py",
+        },
+        stats_dir,
+    )
+
+    assert results["count"] == 4
+    assert results["results"] == [
+        {
+            "spider": "mcdonalds",
+            "filename": "locations/spiders/mcdonalds.py",
+            "errors": 1,
+            "features": 100,
+            "elapsed_time": 42.5,
+            "peak_rss_bytes": 1500,
+            "cpu_time": 11.0,
+        },
+        {
+            "spider": "burger_king",
+            "filename": "locations/spiders/burger_king.py",
+            "errors": 0,
+            "features": 0,
+            "elapsed_time": 3,
+            "peak_rss_bytes": 0,
+            "cpu_time": 0,
+        },
+    ]
+    assert results["pipeline_seconds"] == {"DuplicatesPipeline": 2.0}
+    assert results["peak_rss_bytes"] == 1500
+    assert results["cpu_time"] == 11.0
+
+
+def test_count_output_lines(tmp_path):
+    (tmp_path / "a.geojson").write_text('{"type":"FeatureCollection","features":[\n{}\n]}\n')
+    (tmp_path / "b.geojson").write_text("{}")
+    (tmp_path / "a.ndgeojson").write_text("{}\n{}\n")
+
+    assert count_output_lines(tmp_path) == 3
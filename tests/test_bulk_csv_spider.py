@@ -0,0 +1,46 @@
+import pyarrow
+from scrapy.utils.test import get_crawler
+
+from locations.spiders.addresses.be.wal.best_wal_addresses_be import BeSTWalAddressesBESpider
+
+
+def get_spider() -> BeSTWalAddressesBESpider:
+    spider = BeSTWalAddressesBESpider()
+    spider.crawler = get_crawler()
+    return spider
+
+
+def test_filter_batch():
+    spider = get_spider()
+    batch = pyarrow.RecordBatch.from_pydict(
+        {
+            "address_id": ["1", "2", "3", "4"],
+            "status": ["current", "retired", "current", "retired"],
+        }
+    )
+    assert spider.filter_batch(batch).column("address_id").to_pylist() == ["1", "3"]
+    assert spider.crawler.stats.get_value("best_wal_addresses_be/skipped_status/retired") == 2
+
+
+def test_map_row():
+    spider = get_spider()
+    row = {
+        "address_id": "1234",
+        "EPSG:4326_lat": "50.4",
+        "EPSG:4326_lon": "4.4",
+        "region_code": "BE-WAL",
+        "house_number": "12",
+        "box_number": "",
+        "postcode": "6000",
+        "municipality_name_fr": "Charleroi",
+        "streetname_fr": "Rue de la Montagne",
+        "postname_fr": "Charleroi",
+    }
+    item = next(spider.post_process_item(spider.map_row(row), row))
+    assert item["ref"] == "1234"
+    assert item["housenumber"] == "12"
+    assert item["postcode"] == "6000"
+    assert item["city"] == "Charleroi"
+    assert item["street"] == "Rue de la Montagne"
+    assert "unit" not in item["extras"]
+    assert item["extras"]["addr:city:fr"] == "Charleroi"
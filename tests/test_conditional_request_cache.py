@@ -0,0 +1,56 @@
+from scrapy import Request
+from scrapy.http import HtmlResponse, Response
+from scrapy.utils.spider import DefaultSpider
+from scrapy.utils.test import get_crawler
+
+from locations.middlewares.conditional_request_cache import ConditionalRequestCacheMiddleware, is_unchanged
+
+
+def get_middleware(tmp_path) -> ConditionalRequestCacheMiddleware:
+    crawler = get_crawler(
+        DefaultSpider,
+        {"CONDITIONAL_CACHE_ENABLED": True, "CONDITIONAL_CACHE_DB": str(tmp_path / "cache.sqlite")},
+    )
+    crawler.spider = crawler._create_spider()
+    middleware = ConditionalRequestCacheMiddleware(crawler)
+    middleware.spider_opened()
+    return middleware
+
+
+def test_not_modified_is_replaced_with_stored_response(tmp_path):
+    middleware = get_middleware(tmp_path)
+    url = "https://example.com/stores"
+
+    request = Request(url)
+    middleware.process_request(request)
+    assert b"If-None-Match" not in request.headers
+    response = HtmlResponse(url, body=b"<html>stores</html>", headers={"ETag": '"abc"'}, request=request)
+    response = middleware.process_response(request, response)
+    assert not is_unchanged(response)
+
+    request = Request(url)
+    middleware.process_request(request)
+    assert request.headers[b"If-None-Match"] == b'"abc"'
+    response = middleware.process_response(request, Response(url, status=304, request=request))
+    assert response.status == 200
+    assert response.body == b"<html>stores</html>"
+    assert isinstance(response, HtmlResponse)
+    assert is_unchanged(response)
+    middleware.spider_closed()
+
+
+def test_unchanged_body_hash(tmp_path):
+    middleware = get_middleware(tmp_path)
+    url = "https://example.com/stores.json"
+
+    for expected in [False, True]:
+        request = Request(url)
+        middleware.process_request(request)
+        response = middleware.process_response(request, Response(url, body=b"[]", request=request))
+        assert is_unchanged(response) == expected
+
+    request = Request(url)
+    middleware.process_request(request)
+    response = middleware.process_response(request, Response(url, body=b"[{}]", request=request))
+    assert not is_unchanged(response)
+    middleware.spider_closed()
@@ -0,0 +1,156 @@
+from scrapy import Request
+from scrapy.http import Response
+from scrapy.utils.spider import DefaultSpider
+from scrapy.utils.test import get_crawler
+
+from locations.items import Feature
+from locations.middlewares import content_hash_replay
+from locations.middlewares.conditional_request_cache import ConditionalRequestCacheMiddleware
+from locations.middlewares.content_hash_replay import (
+    ContentHashDownloaderMiddleware,
+    ContentHashReplayMiddleware,
+    spider_code_version,
+)
+from locations.settings import DOWNLOADER_MIDDLEWARES
+from locations.spiders.paul_fr import PaulFRSpider
+from locations.storefinders.arcgis_feature_server import ArcGISFeatureServerSpider
+
+
+def crawl_once(crawler, downloader_middleware, spider_middleware, body: bytes, calls: list) -> list:
+    def callback():
+        calls.append(True)
+        yield Feature(ref="1", name="Example")
+
+    url = "https://example.com/stores.json"
+    request = Request(url)
+    response = downloader_middleware.process_response(request, Response(url, body=body, request=request))
+    return list(spider_middleware.process_spider_output(response, callback()))
+
+
+def test_unchanged_response_is_replayed(tmp_path):
+    crawler = get_crawler(
+        DefaultSpider,
+        {"CONTENT_HASH_REPLAY_ENABLED": True, "CONTENT_HASH_REPLAY_DB": str(tmp_path / "replay.sqlite")},
+    )
+    crawler.spider = crawler._create_spider()
+    downloader_middleware = ContentHashDownloaderMiddleware.from_crawler(crawler)
+    spider_middleware = ContentHashReplayMiddleware.from_crawler(crawler)
+    downloader_middleware.spider_opened(crawler.spider)
+
+    calls = []
+    first = crawl_once(crawler, downloader_middleware, spider_middleware, b"[1]", calls)
+    second = crawl_once(crawler, downloader_middleware, spider_middleware, b"[1]", calls)
+    assert len(calls) == 1
+    assert first == second == [Feature(ref="1", name="Example")]
+
+    crawl_once(crawler, downloader_middleware, spider_middleware, b"[2]", calls)
+    assert len(calls) == 2
+    crawler.content_hash_replay_store.close()
+
+
+def test_requests_to_the_same_url_are_kept_apart(tmp_path):
+    crawler = get_crawler(
+        DefaultSpider,
+        {"CONTENT_HASH_REPLAY_ENABLED": True, "CONTENT_HASH_REPLAY_DB": str(tmp_path / "replay.sqlite")},
+    )
+    crawler.spider = crawler._create_spider()
+    downloader_middleware = ContentHashDownloaderMiddleware.from_crawler(crawler)
+    spider_middleware = ContentHashReplayMiddleware.from_crawler(crawler)
+    downloader_middleware.spider_opened(crawler.spider)
+    url = "https://example.com/search"
+
+    def parse_page(ref: str):
+        yield Feature(ref=ref)
+
+    def parse_other(ref: str):
+        yield Feature(ref=ref, name="Other")
+
+    def crawl(request: Request, ref: str) -> list:
+        # The server returns the same body for every request.
+        response = downloader_middleware.process_response(request, Response(url, body=b"[]", request=request))
+        return list(spider_middleware.process_spider_output(response, request.callback(ref)))
+
+    for _ in range(2):
+        assert crawl(Request(url, method="POST", body=b"page=1", callback=parse_page), "1") == [Feature(ref="1")]
+        assert crawl(Request(url, method="POST", body=b"page=2", callback=parse_page), "2") == [Feature(ref="2")]
+        assert crawl(Request(url, method="POST", body=b"page=1", callback=parse_other), "3") == [
+            Feature(ref="3", name="Other")
+        ]
+    assert crawler.stats.get_value("atp/content_hash_replay/replayed_responses") == 3
+    crawler.content_hash_replay_store.close()
+
+
+def test_not_modified_response_is_replayed(tmp_path):
+    settings = {
+        "CONTENT_HASH_REPLAY_ENABLED": True,
+        "CONTENT_HASH_REPLAY_DB": str(tmp_path / "replay.sqlite"),
+        "CONDITIONAL_CACHE_ENABLED": True,
+        "CONDITIONAL_CACHE_DB": str(tmp_path / "cache.sqlite"),
+    }
+    crawler = get_crawler(DefaultSpider, settings)
+    crawler.spider = crawler._create_spider()
+    middlewares = {
+        ConditionalRequestCacheMiddleware: ConditionalRequestCacheMiddleware.from_crawler(crawler),
+        ContentHashDownloaderMiddleware: ContentHashDownloaderMiddleware.from_crawler(crawler),
+    }
+    # Downloader middleware process_response methods are called from the
+    # highest priority to the lowest.
+    priorities = {cls: DOWNLOADER_MIDDLEWARES[f"{cls.__module__}.{cls.__name__}"] for cls in middlewares}
+    response_chain = [middlewares[cls] for cls in sorted(middlewares, key=priorities.get, reverse=True)]
+    spider_middleware = ContentHashReplayMiddleware.from_crawler(crawler)
+    middlewares[ConditionalRequestCacheMiddleware].spider_opened()
+    middlewares[ContentHashDownloaderMiddleware].spider_opened(crawler.spider)
+    url = "https://example.com/stores.json"
+
+    calls = []
+
+    def callback():
+        calls.append(True)
+        yield Feature(ref="1", name="Example")
+
+    results = []
+    for status in [200, 304]:
+        request = Request(url)
+        middlewares[ConditionalRequestCacheMiddleware].process_request(request)
+        body = b"[1]" if status == 200 else b""
+        response = Response(url, status=status, body=body, headers={"ETag": '"abc"'}, request=request)
+        for middleware in response_chain:
+            response = middleware.process_response(request, response)
+        results.append(list(spider_middleware.process_spider_output(response, callback())))
+
+    assert len(calls) == 1
+    assert results[0] == results[1] == [Feature(ref="1", name="Example")]
+    middlewares[ConditionalRequestCacheMiddleware].spider_closed()
+    crawler.content_hash_replay_store.close()
+
+
+def test_output_of_other_code_versions_is_not_replayed(tmp_path, monkeypatch):
+    crawler = get_crawler(
+        DefaultSpider,
+        {"CONTENT_HASH_REPLAY_ENABLED": True, "CONTENT_HASH_REPLAY_DB": str(tmp_path / "replay.sqlite")},
+    )
+    crawler.spider = crawler._create_spider()
+    downloader_middleware = ContentHashDownloaderMiddleware.from_crawler(crawler)
+    spider_middleware = ContentHashReplayMiddleware.from_crawler(crawler)
+
+    calls = []
+    for code_version in ["1", "1", "2"]:
+        monkeypatch.setattr(content_hash_replay, "spider_code_version", lambda spider_cls: code_version)
+        downloader_middleware.spider_opened(crawler.spider)
+        crawl_once(crawler, downloader_middleware, spider_middleware, b"[1]", calls)
+        crawler.content_hash_replay_store.close()
+    assert len(calls) == 2
+
+    # Output recorded by the first version was deleted.
+    downloader_middleware.spider_opened(crawler.spider)
+    assert crawler.content_hash_replay_store.connection.execute(
+        "SELECT DISTINCT code_version FROM callback_outputs"
+    ).fetchall() == [("2",)]
+    crawler.content_hash_replay_store.close()
+
+
+def test_spider_code_version():
+    assert spider_code_version(PaulFRSpider) == spider_code_version(PaulFRSpider)
+    assert spider_code_version(PaulFRSpider) != spider_code_version(ArcGISFeatureServerSpider)
+    # Neither the spider nor its parent classes are defined in this project.
+    assert spider_code_version(DefaultSpider) == spider_code_version(type("Other", (DefaultSpider,), {}))
@@ -0,0 +1,116 @@
+import json
+from pathlib import Path
+
+from ci.diff_spider_output import diff_outputs, diff_spider, previous_sources
+
+
+def feature(feature_id: str, name: str) -> dict:
+    return {
+        "type": "Feature",
+        "id": feature_id,
+        "properties": {"ref": feature_id, "name": name},
+        "geometry": {"type": "Point", "coordinates": [1.5, 2.5]},
+    }
+
+
+def write_geojson(path: Path, features: list[dict], collection_time: str = "2026-01-01T00:00:00") -> None:
+    # As written by GeoJsonExporter
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        '{"type":"FeatureCollection","dataset_attributes":'
+        + json.dumps({"@spider": path.stem, "spider:collection_time": collection_time})
+        + ',"features":[\n'
+        + ",\n".join(json.dumps(f) for f in features)
+        + "\n]}\n"
+    )
+
+
+def read_changes(path: Path) -> list[tuple[str, str]]:
+    return [(f["change"], f["id"]) for f in map(json.loads, path.read_text().splitlines())]
+
+
+def test_diff_spider(tmp_path: Path):
+    write_geojson(tmp_path / "previous" / "example.geojson", [feature("a", "A"), feature("b", "B"), feature("c", "C")])
+    write_geojson(
+        tmp_path / "current" / "example.geojson",
+        [feature("a", "A"), feature("b", "B2"), feature("d", "D")],
+        collection_time="2026-01-08T00:00:00",
+    )
+    changes_path = tmp_path / "example.ndgeojson"
+
+    stats = diff_spider(
+        tmp_path / "current" / "example.geojson", tmp_path / "previous" / "example.geojson", changes_path
+    )
+
+    assert stats == {"previous": 3, "current": 3, "added": 1, "changed": 1, "removed": 1, "unchanged": 1}
+    assert read_changes(changes_path) == [("changed", "b"), ("added", "d"), ("removed", "c")]
+    changes = [json.loads(line) for line in changes_path.read_text().splitlines()]
+    assert changes[0]["properties"]["name"] == "B2"
+    assert changes[0]["dataset_attributes"]["spider:collection_time"] == "2026-01-08T00:00:00"
+    assert changes[2]["properties"]["name"] == "C"
+    assert changes[2]["dataset_attributes"]["spider:collection_time"] == "2026-01-01T00:00:00"
+
+
+def test_diff_spider_without_previous_output(tmp_path: Path):
+    write_geojson(tmp_path / "example.geojson", [feature("a", "A")])
+    changes_path = tmp_path / "example.ndgeojson"
+
+    stats = diff_spider(tmp_path / "example.geojson", None, changes_path)
+
+    assert stats == {"previous": 0, "current": 1, "added": 1, "changed": 0, "removed": 0, "unchanged": 0}
+    assert read_changes(changes_path) == [("added", "a")]
+
+
+def test_previous_sources():
+    previous_manifest = {
+        "spiders": {
+            "example": {
+                "run_id": "2026-01-01-00-00-00",
+                "geojson_url": "https://example.com/runs/2026-01-01-00-00-00/output/example.geojson",
+            }
+        }
+    }
+
+    assert previous_sources(
+        ["example", "other"], previous_manifest, "https://example.com/runs/2026-01-08-00-00-00"
+    ) == {
+        "example": ("https://example.com/runs/2026-01-01-00-00-00/output/example.geojson", "2026-01-01-00-00-00"),
+        "other": ("https://example.com/runs/2026-01-08-00-00-00/output/other.geojson", "2026-01-08-00-00-00"),
+    }
+    assert previous_sources(["example", "other"], previous_manifest) == {
+        "example": ("https://example.com/runs/2026-01-01-00-00-00/output/example.geojson", "2026-01-01-00-00-00")
+    }
+
+
+def test_diff_outputs(tmp_path: Path):
+    write_geojson(tmp_path / "previous" / "output" / "example.geojson", [feature("a", "A")])
+    write_geojson(tmp_path / "current" / "example.geojson", [feature("a", "A")])
+    write_geojson(tmp_path / "current" / "new.geojson", [feature("a", "A")])
+    (tmp_path / "current" / "empty.geojson").write_text("")
+
+    results = diff_outputs(
+        tmp_path / "current", tmp_path / "changes", previous_run=str(tmp_path / "previous"), workers=1
+    )
+
+    assert results == {
+        "example": {
+            "previous": 1,
+            "current": 1,
+            "added": 0,
+            "changed": 0,
+            "removed": 0,
+            "unchanged": 1,
+            "previous_run_id": "previous",
+        },
+        "new": {
+            "previous": 0,
+            "current": 1,
+            "added": 1,
+            "changed": 0,
+            "removed": 0,
+            "unchanged": 0,
+            "previous_run_id": None,
+        },
+    }
+    assert (tmp_path / "changes" / "example.ndgeojson").read_text() == ""
+    assert read_changes(tmp_path / "changes" / "new.ndgeojson") == [("added", "a")]
@@ -7,9 +7,12 @@ from locations.geo import (
     convert_gj2008_to_rfc7946_point_geometry,
     country_iseadgg_centroids,
     extract_geojson_point_geometry,
+    get_transformer,
+    haversine_distance,
     make_subdivisions,
     point_locations,
     postal_regions,
+    transform_coordinates,
 )
 
 
@@ -326,3 +329,24 @@ def test_bbox_split():
         ((80.05, 179.9), (74.95, -169.9)),
         ((75.05, 179.9), (69.95, -169.9)),
     ]
+
+
+def test_haversine_distance():
+    assert haversine_distance(0, 0, 0, 0) == 0
+    assert round(haversine_distance(0, 0, 0, 1)) == 111
+    assert round(haversine_distance(0, 179.5, 0, -179.5)) == 111
+
+
+def test_get_transformer():
+    assert get_transformer(2056) is get_transformer(2056)
+    assert get_transformer(2056) is not get_transformer(2056, 3857)
+
+
+def test_transform_coordinates():
+    eastings = [2600000, 2683000]
+    northings = [1200000, 1248000]
+    lats, lons = transform_coordinates(eastings, northings, 2056)
+    for easting, northing, lat, lon in zip(eastings, northings, lats, lons):
+        assert (lat, lon) == get_transformer(2056).transform(easting, northing)
+    assert round(lats[0], 2) == 46.95 and round(lons[0], 2) == 7.44
+    assert transform_coordinates([], [], 2056) == ([], [])
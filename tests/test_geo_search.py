@@ -0,0 +1,123 @@
+import math
+
+from scrapy import Request, Spider
+from scrapy.http import Response
+from scrapy.utils.test import get_crawler
+
+from locations.geo_search import AdaptiveGeoSearchMixin, CentroidScheduler, SearchCell, initial_search_cells
+
+
+class BboxSearchSpider(AdaptiveGeoSearchMixin, Spider):
+    name = "bbox_search"
+    search_bounds = (0.0, 0.0, 4.0, 4.0)
+    search_initial_tiles = 2
+    search_result_cap = 10
+    search_max_depth = 2
+
+    def make_search_request(self, cell: SearchCell) -> Request:
+        return Request("https://example.com/?bbox={},{},{},{}".format(*cell.bounds))
+
+
+def get_spider(spider_class):
+    crawler = get_crawler(spider_class)
+    crawler.spider = crawler._create_spider()
+    return crawler.spider
+
+
+def respond(request: Request) -> Response:
+    return Response(request.url, request=request)
+
+
+def test_initial_search_cells_antimeridian():
+    cells = initial_search_cells((170.0, -50.0, -170.0, -30.0))
+    assert [cell.bounds for cell in cells] == [(170.0, -50.0, 180.0, -30.0), (-180.0, -50.0, -170.0, -30.0)]
+
+
+def test_refine_search_subdivides_capped_cells_only():
+    spider = get_spider(BboxSearchSpider)
+    requests = list(spider.initial_search_requests())
+    assert len(requests) == 4
+
+    assert list(spider.refine_search(respond(requests[0]), 3)) == []
+
+    quadrants = list(spider.refine_search(respond(requests[1]), 10))
+    assert [r.meta["geo_search_cell"].bounds for r in quadrants] == [
+        (0.0, 2.0, 1.0, 3.0),
+        (1.0, 2.0, 2.0, 3.0),
+        (0.0, 3.0, 1.0, 4.0),
+        (1.0, 3.0, 2.0, 4.0),
+    ]
+
+    # search_max_depth reached
+    assert list(spider.refine_search(respond(list(spider.refine_search(respond(quadrants[0]), 10))[0]), 10)) == []
+    assert spider.crawler.stats.get_value("atp/geo_search/truncated") == 1
+
+
+def test_radius_search_skips_covered_quadrants():
+    class RadiusSearchSpider(BboxSearchSpider):
+        search_by_radius = True
+
+    spider = get_spider(RadiusSearchSpider)
+    requests = list(spider.initial_search_requests())
+    # A large uncapped search around the first cell covers part of its neighbour.
+    spider._completed_searches.append((1.0, 1.0, 400.0))
+    quadrants = list(spider.refine_search(respond(requests[1]), 10))
+    assert len(quadrants) < 4
+    assert spider.crawler.stats.get_value("atp/geo_search/skipped") == 4 - len(quadrants)
+
+
+def test_centroid_scheduler_skips_centroids_within_complete_circle():
+    # Centroids roughly 11km apart along the equator.
+    centroids = [(0.0, i / 10) for i in range(10)]
+    scheduler = CentroidScheduler(centroids, 10, 50)
+
+    assert scheduler.next_centroids(1) == [(0.0, 0.0)]
+    # Capped, but the furthest of the distance ranked results is 35km away.
+    scheduler.record(0.0, 0.0, 50, 35)
+
+    # Centroids up to 25km away are skipped, those overlapping the complete
+    # circle are deprioritised.
+    assert scheduler.skipped_count == 2
+    assert scheduler.next_centroids(3) == [(0.0, 0.5), (0.0, 0.6), (0.0, 0.7)]
+    assert scheduler.next_centroids(10) == [(0.0, 0.8), (0.0, 0.9), (0.0, 0.3), (0.0, 0.4)]
+    assert scheduler.pending_count == 0
+    assert scheduler.requested_count == 8
+
+
+def test_centroid_scheduler_not_distance_ranked():
+    centroids = [(0.0, i / 10) for i in range(10)]
+    scheduler = CentroidScheduler(centroids, 10, 50, distance_ranked=False)
+
+    scheduler.next_centroids(1)
+    scheduler.record(0.0, 0.0, 50, 35)
+    assert scheduler.skipped_count == 0
+
+    scheduler.next_centroids(1)
+    scheduler.record(0.0, 0.1, 20, 35)
+    assert scheduler.skipped_count == 0
+    assert scheduler.pending_count == 8
+
+
+def test_centroid_scheduler_skips_centroids_within_union_of_complete_circles():
+    # A centroid surrounded by six others 8km away, all searched within 10km.
+    offset = 8 / 111.2
+    neighbours = [
+        (round(offset * math.sin(math.radians(angle)), 6), round(offset * math.cos(math.radians(angle)), 6))
+        for angle in range(0, 360, 60)
+    ]
+    stats = get_crawler(Spider).stats
+    scheduler = CentroidScheduler(neighbours + [(0.0, 0.0)], 10, 50, distance_ranked=False, stats=stats)
+
+    for lat, lon in scheduler.next_centroids(5):
+        scheduler.record(lat, lon, 20)
+    assert scheduler.skipped_count == 0
+
+    # The last neighbour closes the only gap around the centroid.
+    assert scheduler.next_centroids(1) == [neighbours[5]]
+    scheduler.record(*neighbours[5], 20)
+    assert scheduler.skipped_count == 1
+    assert scheduler.pending_count == 0
+    assert stats.get_value("atp/centroid_scheduler/requested") == 6
+    assert stats.get_value("atp/centroid_scheduler/skipped") == 1
+    # The centroid and the last neighbour each overlap the first five circles.
+    assert stats.get_value("atp/centroid_scheduler/deprioritised") == 10
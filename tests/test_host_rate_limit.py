@@ -0,0 +1,86 @@
+import asyncio
+
+from scrapy import Request
+from scrapy.http import Response
+from scrapy.utils.spider import DefaultSpider
+from scrapy.utils.test import get_crawler
+
+from locations.middlewares.host_rate_limit import HostRateCoordinator, HostRateLimitDownloadHandler
+from locations.settings import DOWNLOAD_HANDLERS, DOWNLOADER_MIDDLEWARES
+
+
+def test_reservations_are_shared(tmp_path):
+    first = HostRateCoordinator(str(tmp_path))
+    second = HostRateCoordinator(str(tmp_path))
+
+    assert first.reserve("cdn.yextapis.com", 10) == 0
+    assert 9 < second.reserve("cdn.yextapis.com", 10) <= 10
+    assert 19 < first.reserve("cdn.yextapis.com", 10) <= 20
+    assert second.reserve("example.algolia.net", 10) == 0
+
+
+class RecordingDownloadHandler:
+    lazy = False
+
+    def __init__(self):
+        self.requests = []
+        self.closed = False
+
+    async def download_request(self, request: Request) -> Response:
+        self.requests.append(request)
+        return Response(request.url, request=request)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def get_handler(settings: dict) -> HostRateLimitDownloadHandler:
+    crawler = get_crawler(
+        DefaultSpider,
+        {
+            "HOST_RATE_LIMIT_DOWNLOAD_HANDLERS": {"https": "tests.test_host_rate_limit.RecordingDownloadHandler"},
+            **settings,
+        },
+    )
+    crawler.spider = crawler._create_spider()
+    return HostRateLimitDownloadHandler.from_crawler(crawler)
+
+
+def test_download_handlers():
+    # Requests are throttled as they leave the downloader slot queue, where
+    # DOWNLOAD_DELAY holds them back, rather than as they join it.
+    assert DOWNLOAD_HANDLERS["https"] == "locations.middlewares.host_rate_limit.HostRateLimitDownloadHandler"
+    assert not any("host_rate_limit" in middleware for middleware in DOWNLOADER_MIDDLEWARES)
+
+
+def test_not_configured():
+    handler = get_handler({})
+    response = asyncio.run(handler.download_request(Request("https://abc-dsn.algolia.net/1/indexes/stores/query")))
+
+    assert response.url == "https://abc-dsn.algolia.net/1/indexes/stores/query"
+    assert handler.crawler.stats.get_value("atp/host_rate_limit/request_count") is None
+
+
+def test_download_request(tmp_path):
+    handler = get_handler(
+        {"HOST_RATE_LIMIT_DIR": str(tmp_path), "HOST_RATE_LIMITS": {"*.algolia.net": 30, "example.com": 60}}
+    )
+
+    assert handler.interval("abc-dsn.algolia.net") == 30
+    assert handler.interval("www.example.com") is None
+
+    asyncio.run(handler.download_request(Request("https://ABC-dsn.algolia.net/1/indexes/stores/query")))
+    asyncio.run(handler.download_request(Request("https://www.example.com/stores")))
+
+    assert [request.url for request in handler.handler("https").requests] == [
+        "https://abc-dsn.algolia.net/1/indexes/stores/query",
+        "https://www.example.com/stores",
+    ]
+    assert handler.crawler.stats.get_value("atp/host_rate_limit/request_count") == 1
+    assert handler.crawler.stats.get_value("atp/host_rate_limit/delayed_request_count") is None
+    assert 29 < HostRateCoordinator(str(tmp_path)).reserve("abc-dsn.algolia.net", 30) <= 30
+
+    asyncio.run(handler.close())
+    assert handler.handler("https").closed
+    # Schemes without a handler given default to Scrapy's.
+    assert type(handler.handler("http")).__name__ == "HTTP11DownloadHandler"
@@ -0,0 +1,43 @@
+import pickle
+
+from locations.items import CompactFeature, Feature
+
+
+def test_compact_feature():
+    item = CompactFeature(ref="1", lat=1.0)
+    assert isinstance(item, Feature)
+    assert dict(item) == {"ref": "1", "lat": 1.0}
+
+    item["extras"]["addr:unit"] = "2"
+    item.set_tag("addr:floor", "3")
+    assert dict(item) == {"ref": "1", "lat": 1.0, "extras": {"addr:unit": "2", "addr:floor": "3"}}
+
+    copied = item.copy()
+    assert isinstance(copied, CompactFeature)
+    assert dict(copied) == dict(item)
+    assert dict(pickle.loads(pickle.dumps(item))) == dict(item)
+
+
+def test_compact_feature_unknown_field():
+    item = CompactFeature()
+    try:
+        item["unknown"] = "value"
+        assert False
+    except KeyError:
+        pass
+    try:
+        item["unknown"]
+        assert False
+    except KeyError:
+        pass
+
+
+def test_compact_feature_contains():
+    item = CompactFeature(ref="1")
+    assert "ref" in item
+    assert "extras" not in item
+    assert "name" not in item
+    assert dict(item) == {"ref": "1"}
+
+    item.set_tag("addr:unit", "2")
+    assert "extras" in item
@@ -0,0 +1,88 @@
+from scrapy.http import HtmlResponse, Request
+
+from locations.js_object_utils import cached_find_js_text, extract_js_object, find_js_text
+from locations.spiders.paul_fr import PaulFRSpider
+
+BODY = """<html><head>
+<script>var config = {markers: "none"};</script>
+<script>
+  window.storeLocator = {"url": "https:\\/\\/example.com", markers: [{name: 'Café A', lat: 1.5}, {name: "B", lat: 2}]};
+</script>
+</head><body><div data-x="markers: [1]"></div></body></html>"""
+
+
+def make_response() -> HtmlResponse:
+    url = "https://example.com/stores"
+    return HtmlResponse(url=url, body=BODY.encode("utf-8"), encoding="utf-8", request=Request(url))
+
+
+def test_find_js_text():
+    response = make_response()
+    expected = response.xpath('//script[contains(text(), "storeLocator")]/text()').get().split("markers:", 1)[1]
+
+    assert find_js_text(response, ["storeLocator", "markers:"]) == expected
+    assert find_js_text(response, ["storeLocator", "markers:"], max_length=8) == expected[:8]
+    assert find_js_text(response, "markers:").startswith(' "none"')
+
+
+def test_find_js_text_missing():
+    response = make_response()
+
+    assert find_js_text(response, "stores:") is None
+    # The second marker must be in the same script as the first.
+    assert find_js_text(response, ["config", "storeLocator"]) is None
+
+
+def test_extract_js_object():
+    response = make_response()
+
+    assert extract_js_object(response, ["storeLocator", "markers:"]) == [
+        {"name": "Café A", "lat": 1.5},
+        {"name": "B", "lat": 2},
+    ]
+    assert extract_js_object(response, "stores:") is None
+
+
+def test_cached_extract_js_object():
+    response = make_response()
+
+    first = extract_js_object(response, ["storeLocator", "markers:"], cached=True)
+    first[0]["name"] = "Changed"
+    second = extract_js_object(response, ["storeLocator", "markers:"], cached=True)
+
+    assert second[0]["name"] == "Café A"
+    assert cached_find_js_text(response, ["storeLocator", "markers:"]) is cached_find_js_text(
+        response, ["storeLocator", "markers:"]
+    )
+
+
+def test_find_js_text_markers_in_any_order():
+    response = make_response()
+
+    # Like splitting the text of the script containing the first marker.
+    assert find_js_text(response, ["markers: [", "storeLocator"]) == find_js_text(response, "storeLocator")
+    assert find_js_text(response, ['"url"', "storeLocator"]).startswith(" = {")
+
+
+def test_find_js_text_undecodable_bytes():
+    url = "https://example.com/stores"
+    body = b"<script>var stores = [{name: 'Caf\xe9'}];</script>"
+    response = HtmlResponse(url=url, body=body, encoding="utf-8", request=Request(url))
+
+    assert find_js_text(response, "stores = ") == "[{name: 'Caf�'}];"
+    assert find_js_text(response, "stores = ", max_length=12) == "[{name: 'Caf"
+    assert extract_js_object(response, "stores = ") == [{"name": "Caf�"}]
+
+
+def test_paul_fr_markers():
+    # The store locator component of the paul.fr store page, trimmed to two
+    # stores, with its markers before the template name.
+    url = "https://www.paul.fr/stores/"
+    with open("./tests/data/paul_fr.html", "rb") as f:
+        response = HtmlResponse(url=url, body=f.read(), request=Request(url))
+
+    items = list(PaulFRSpider().parse(response))
+
+    assert [item["branch"] for item in items] == ["Paris Gare du Nord", "Lille Façade de l'Esplanade"]
+    assert items[1]["email"] == "lille@paul.fr"
+    assert items[1]["street_address"] == "4 Façade de l'Esplanade"
@@ -0,0 +1,51 @@
+import json
+
+from scrapy.http import Request, TextResponse
+
+from locations.json_blob_spider import JSONBlobSpider
+
+
+class ExampleJSONBlobSpider(JSONBlobSpider):
+    name = "example_json_blob"
+    start_urls = ["https://example.com/stores.json"]
+    locations_key = ["data", "stores"]
+
+
+class ExampleStreamedJSONBlobSpider(ExampleJSONBlobSpider):
+    stream_json = True
+
+
+def make_response(data) -> TextResponse:
+    url = ExampleJSONBlobSpider.start_urls[0]
+    return TextResponse(url=url, body=json.dumps(data).encode(), request=Request(url))
+
+
+def test_stream_json_array():
+    stores = [{"id": str(i), "name": "Store {}".format(i), "lat": 51.5, "lng": -0.1 * i} for i in range(3)]
+    response = make_response({"meta": {"stores": []}, "data": {"count": 3, "stores": stores}})
+
+    items = list(ExampleStreamedJSONBlobSpider().parse(response))
+    expected = list(ExampleJSONBlobSpider().parse(response))
+
+    assert [item["ref"] for item in items] == ["0", "1", "2"]
+    assert items == expected
+    assert isinstance(items[2]["lon"], float)
+
+
+def test_stream_json_dict():
+    stores = {"a": {"name": "Store A"}, "b": {"id": "store-b", "name": "Store B"}}
+    response = make_response({"data": {"stores": stores}})
+
+    items = list(ExampleStreamedJSONBlobSpider().parse(response))
+
+    assert items == list(ExampleJSONBlobSpider().parse(response))
+    assert [item["ref"] for item in items] == ["a", "store-b"]
+
+
+def test_stream_json_missing_key():
+    response = make_response({"data": {"shops": []}})
+    try:
+        list(ExampleStreamedJSONBlobSpider().parse(response))
+        assert False
+    except KeyError:
+        pass
@@ -1,10 +1,32 @@
+import json
+import os
 import shutil
+import time
 from pathlib import Path
 
+import duckdb
 import psutil
+import pyarrow.parquet as pq
 from pandas import read_parquet
 
-from ci.ndgeojsons_to_parquet import cgroup_memory_limit_bytes, duckdb_memory_limit, to_parquet
+from ci.ndgeojsons_to_parquet import (
+    cgroup_memory_limit_bytes,
+    collection_time,
+    columnar_property_keys,
+    dataset_attributes_column,
+    duckdb_memory_limit,
+    evict_staged_files,
+    file_digest,
+    hilbert_boundaries,
+    hilbert_range_filter,
+    index_path,
+    properties_columns,
+    to_parquet,
+    to_ranges,
+    worker_count,
+    worker_memory_limit,
+    write_output,
+)
 
 
 def _patch_cgroup_v2_path(monkeypatch, cgroup_v2_file: Path):
@@ -75,6 +97,185 @@ def test_to_parquet(tmp_path: Path):
 
     assert len(result_df) == 4
     columns = result_df.columns.tolist()
-    expected_top_level_columns = ["id", "type", "dataset_attributes", "properties", "geom", "bbox"]
+    expected_top_level_columns = ["id", "type", "@spider", "dataset_attributes", "properties", "geom", "bbox"]
     assert all(col in columns for col in expected_top_level_columns)
+    assert "hilbert" not in columns
+    assert json.loads(index_path(output_parquet).read_text())["spiders"] == {"dixy_ru": [[0, 0]]}
     # TODO: better GeoParquet file validation
+
+
+def test_to_parquet_reuses_staged_files(tmp_path: Path):
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    input_file = input_dir / "dixy_ru.ndgeojson"
+    shutil.copy(Path("./tests/data/dixy_ru.ndgeojson").absolute(), input_file)
+    staging_dir = tmp_path / "staged"
+    staging_dir.mkdir()
+    (staging_dir / "stale.parquet").write_bytes(b"")
+    os.utime(staging_dir / "stale.parquet", (0, 0))
+    (staging_dir / "other.parquet").write_bytes(b"")
+    (staging_dir / "other.123.tmp").write_bytes(b"")
+
+    to_parquet(input_dir, tmp_path / "first.parquet", staging_dir=staging_dir, workers=2)
+    staged_path = staging_dir / f"{file_digest(input_file)}.parquet"
+    # Recently used files, perhaps by runs of other spiders, are kept.
+    assert sorted(staging_dir.iterdir()) == sorted(
+        [staged_path, staging_dir / "other.parquet", staging_dir / "other.123.tmp"]
+    )
+    staged_size = staged_path.stat().st_size
+
+    # The next crawl differs only in its collection time.
+    input_file.write_text(input_file.read_text().replace("2025-12-21T22:28:30.616361", "2025-12-28T22:28:30.616361"))
+    to_parquet(input_dir, tmp_path / "second.parquet", staging_dir=staging_dir, workers=2)
+    assert sorted(staging_dir.glob("*.parquet")) == sorted([staged_path, staging_dir / "other.parquet"])
+    assert staged_path.stat().st_size == staged_size
+    first = read_parquet(tmp_path / "first.parquet")
+    second = read_parquet(tmp_path / "second.parquet")
+    assert first.drop(columns=["dataset_attributes"]).equals(second.drop(columns=["dataset_attributes"]))
+    assert {dict(attributes)["spider:collection_time"] for attributes in second["dataset_attributes"]} == {
+        "2025-12-28T22:28:30.616361"
+    }
+
+
+def test_worker_count():
+    assert worker_count(64 * 1024**3, cpu_count=8) == 8
+    assert worker_count(3 * 1024**3, cpu_count=8) == 3
+    assert worker_count(512 * 1024**2, cpu_count=8) == 1
+    assert worker_memory_limit(4 * 1024**3, 4) == "768MB"
+
+
+def test_file_digest(tmp_path: Path):
+    (tmp_path / "a.ndgeojson").write_text("{}\n")
+    (tmp_path / "b.ndgeojson").write_text("{}\n")
+    (tmp_path / "c.ndgeojson").write_text("[]\n")
+
+    assert file_digest(tmp_path / "a.ndgeojson") == file_digest(tmp_path / "b.ndgeojson")
+    assert file_digest(tmp_path / "a.ndgeojson") != file_digest(tmp_path / "c.ndgeojson")
+
+
+def test_file_digest_ignores_collection_time(tmp_path: Path):
+    for name, value in [("a", "2026-01-01T00:00:00"), ("b", "2026-01-08T00:00:00")]:
+        (tmp_path / f"{name}.ndgeojson").write_text(
+            json.dumps({"dataset_attributes": {"@spider": "example", "spider:collection_time": value}}) + "\n"
+        )
+    (tmp_path / "c.ndgeojson").write_text(json.dumps({"dataset_attributes": {"@spider": "other"}}) + "\n")
+
+    assert file_digest(tmp_path / "a.ndgeojson") == file_digest(tmp_path / "b.ndgeojson")
+    assert file_digest(tmp_path / "a.ndgeojson") != file_digest(tmp_path / "c.ndgeojson")
+    assert collection_time(tmp_path / "b.ndgeojson") == "2026-01-08T00:00:00"
+    assert collection_time(tmp_path / "c.ndgeojson") is None
+
+
+def test_dataset_attributes_column(tmp_path: Path):
+    with duckdb.connect() as con:
+        for name in ["a", "b"]:
+            con.execute(
+                f"COPY (SELECT MAP {{'@spider': '{name}'}} AS dataset_attributes) TO '{tmp_path}/{name}.parquet'"
+            )
+        staged_paths = [tmp_path / "a.parquet", tmp_path / "b.parquet"]
+        collection_times = {staged_paths[0]: "2026-01-08T00:00:00", staged_paths[1]: None}
+
+        assert con.execute(f"""
+            SELECT {dataset_attributes_column(collection_times)}
+            FROM read_parquet(['{staged_paths[0]}', '{staged_paths[1]}'], filename=true)
+            ORDER BY filename
+        """).fetchall() == [({"@spider": "a", "spider:collection_time": "2026-01-08T00:00:00"},), ({"@spider": "b"},)]
+    assert dataset_attributes_column({staged_paths[1]: None}) == "dataset_attributes"
+
+
+def test_evict_staged_files(tmp_path: Path):
+    for name in ["used", "recent", "old"]:
+        (tmp_path / f"{name}.parquet").write_bytes(b"")
+    (tmp_path / "old.123.tmp").write_bytes(b"")
+    old = time.time() - 60
+    for name in ["used.parquet", "old.parquet", "old.123.tmp"]:
+        os.utime(tmp_path / name, (old, old))
+
+    evict_staged_files(tmp_path, [tmp_path / "used.parquet"], max_age=30)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["old.123.tmp", "recent.parquet", "used.parquet"]
+
+
+def test_hilbert_boundaries(tmp_path: Path):
+    with duckdb.connect() as con:
+        for i in range(2):
+            con.execute(
+                f"COPY (SELECT range AS hilbert FROM range({i * 50}, {(i + 1) * 50})) TO '{tmp_path}/{i}.parquet'"
+            )
+        staged_paths = sorted(tmp_path.glob("*.parquet"))
+
+        assert hilbert_boundaries(con, staged_paths, 1) == []
+        assert hilbert_boundaries(con, staged_paths, 4) == [24, 49, 74]
+
+
+def test_hilbert_range_filter():
+    assert hilbert_range_filter(None, None) == "(true OR hilbert IS NULL)"
+    assert hilbert_range_filter(None, 10) == "hilbert < 10"
+    assert hilbert_range_filter(10, 20) == "hilbert >= 10 AND hilbert < 20"
+    assert hilbert_range_filter(20, None) == "(hilbert >= 20 OR hilbert IS NULL)"
+
+
+def test_write_output(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr("ci.ndgeojsons_to_parquet.TARGET_ROW_GROUP_BYTES", 1)
+    monkeypatch.setattr("ci.ndgeojsons_to_parquet.READ_BATCH_ROWS", 2)
+    with duckdb.connect() as con:
+        for i, spiders in enumerate([["a", "b", "a", "a"], ["c", "a"]]):
+            con.execute(f"""
+            COPY (
+                SELECT
+                    i::VARCHAR AS id,
+                    spider AS "@spider",
+                    {{'xmin': i::DOUBLE, 'ymin': 0.0, 'xmax': i::DOUBLE, 'ymax': 1.0}} AS bbox,
+                    i::UINTEGER AS hilbert
+                FROM (SELECT unnest(range({i * 10}, {i * 10 + len(spiders)})) AS i, unnest({spiders}) AS spider)
+            ) TO '{tmp_path}/batch_{i}.parquet'
+            """)
+    output_path = tmp_path / "output.parquet"
+
+    index = write_output(
+        [tmp_path / "batch_0.parquet", tmp_path / "batch_1.parquet"], output_path, {"primary_column": "geom"}
+    )
+
+    assert index["row_groups"] == [
+        {"num_rows": 2, "hilbert": [0, 1], "bbox": [0.0, 0.0, 1.0, 1.0]},
+        {"num_rows": 2, "hilbert": [2, 3], "bbox": [2.0, 0.0, 3.0, 1.0]},
+        {"num_rows": 2, "hilbert": [10, 11], "bbox": [10.0, 0.0, 11.0, 1.0]},
+    ]
+    assert index["spiders"] == {"a": [[0, 2]], "b": [[0, 0]], "c": [[2, 2]]}
+
+    parquet_file = pq.ParquetFile(output_path)
+    assert parquet_file.schema_arrow.names == ["id", "@spider", "bbox"]
+    assert json.loads(parquet_file.schema_arrow.metadata[b"geo"]) == {"primary_column": "geom"}
+    assert parquet_file.metadata.num_row_groups == 3
+    row_group = parquet_file.metadata.row_group(1)
+    assert row_group.column(1).statistics.min == "a"
+    assert row_group.column(2).statistics.max == 3.0
+    assert row_group.column(2).has_column_index
+
+
+def test_to_ranges():
+    assert to_ranges([]) == []
+    assert to_ranges([0, 1, 2, 5, 7, 8]) == [[0, 2], [5, 5], [7, 8]]
+
+
+def test_columnar_properties():
+    keys = columnar_property_keys()
+    assert {"ref", "addr:country", "brand:wikidata", "shop", "amenity"} <= set(keys)
+    assert len(keys) == len(set(keys))
+
+    with duckdb.connect() as con:
+        result = con.execute(f"""
+            SELECT {properties_columns(["addr:country", "shop"])}
+            FROM (SELECT MAP {{'addr:country': 'GB', 'brand': 'Example'}} AS properties)
+        """)
+        assert [column[0] for column in result.description] == ["addr:country", "shop", "properties"]
+        assert result.fetchall() == [("GB", None, {"brand": "Example"})]
+
+    assert properties_columns([]) == "properties"
+
+
+def test_file_digest_includes_property_columns(tmp_path: Path):
+    (tmp_path / "a.ndgeojson").write_text("{}\n")
+
+    assert file_digest(tmp_path / "a.ndgeojson") == file_digest(tmp_path / "a.ndgeojson", [])
+    assert file_digest(tmp_path / "a.ndgeojson") != file_digest(tmp_path / "a.ndgeojson", ["shop"])
@@ -0,0 +1,64 @@
+import hashlib
+import io
+import zipfile
+from pathlib import Path
+
+from ci.package_output import PrecompressedZipWriter, compress_files, dos_date_time, package_directory
+
+COMPLETE_GEOJSON = b'{"type":"FeatureCollection","features":[\n{}\n]}\n'
+
+
+def test_package_directory(tmp_path: Path):
+    output_dir = tmp_path / "output"
+    (output_dir / "nested").mkdir(parents=True)
+    (output_dir / "complete.geojson").write_bytes(COMPLETE_GEOJSON)
+    (output_dir / "empty.geojson").write_bytes(b"")
+    (output_dir / "truncated.geojson").write_bytes(COMPLETE_GEOJSON[:-4])
+    (output_dir / "nested" / "log.txt").write_bytes(b"example\n" * 100_000)
+    zip_path = tmp_path / "output.zip"
+
+    manifest = package_directory(output_dir, zip_path, workers=2)
+
+    assert manifest["size_bytes"] == zip_path.stat().st_size
+    assert manifest["sha256"] == hashlib.sha256(zip_path.read_bytes()).hexdigest()
+    assert manifest["incomplete"] == ["output/truncated.geojson"]
+    assert manifest["files"]["output/complete.geojson"] == {
+        "size_bytes": len(COMPLETE_GEOJSON),
+        "sha256": hashlib.sha256(COMPLETE_GEOJSON).hexdigest(),
+    }
+    with zipfile.ZipFile(zip_path) as z:
+        assert z.testzip() is None
+        assert z.namelist() == [
+            "output/complete.geojson",
+            "output/empty.geojson",
+            "output/nested/log.txt",
+            "output/truncated.geojson",
+        ]
+        assert z.read("output/nested/log.txt") == b"example\n" * 100_000
+        assert z.getinfo("output/nested/log.txt").compress_size < 100_000
+    assert not list(tmp_path.glob("tmp*"))
+
+
+def test_zip64_offsets(tmp_path: Path):
+    (tmp_path / "a.geojson").write_bytes(COMPLETE_GEOJSON)
+    (tmp_path / "b.geojson").write_bytes(COMPLETE_GEOJSON)
+    f = io.BytesIO()
+    writer = PrecompressedZipWriter(f)
+    # As if 4 GiB of members had already been written, so that the offsets
+    # of those following need zip64 records. zipfile allows for the missing
+    # bytes as it would for data prepended to the zip file.
+    writer.offset = 2**32
+    for member in compress_files(
+        [(tmp_path / "a.geojson", "a.geojson"), (tmp_path / "b.geojson", "b.geojson")], tmp_path, workers=1
+    ):
+        writer.add(member)
+    writer.close()
+
+    with zipfile.ZipFile(f) as z:
+        assert z.testzip() is None
+        assert z.read("b.geojson") == COMPLETE_GEOJSON
+
+
+def test_dos_date_time():
+    assert dos_date_time((2026, 1, 2, 3, 4, 5)) == (46 << 9 | 1 << 5 | 2, 3 << 11 | 4 << 5 | 2)
+    assert dos_date_time((1970, 1, 1, 0, 0, 0)) == (1 << 5 | 1, 0)
@@ -0,0 +1,42 @@
+from scrapy import Request, Spider
+from scrapy.http import Response
+
+from locations.pagination import PageFanOutMixin, remaining_offsets, remaining_pages
+
+
+class PagedSpider(PageFanOutMixin, Spider):
+    name = "paged"
+
+    def make_page_request(self, page: int) -> Request:
+        return Request(f"https://example.com/?page={page}")
+
+
+class BatchedSpider(PagedSpider):
+    pages_per_request = 2
+
+    def make_page_batch_request(self, pages: list[int]) -> Request:
+        return Request("https://example.com/?pages={}".format(",".join(map(str, pages))))
+
+
+def test_remaining_pages_and_offsets():
+    assert list(remaining_pages(0, 3)) == [1, 2]
+    assert list(remaining_pages(1, 4)) == [2, 3]
+    assert list(remaining_offsets(0, 50, 120)) == [50, 100]
+    assert list(remaining_offsets(0, 50, 50)) == []
+
+
+def test_fan_out_from_first_page_only():
+    spider = PagedSpider()
+    first = Response("https://example.com/?page=0", request=Request("https://example.com/?page=0"))
+    requests = list(spider.fan_out_pages(first, remaining_pages(0, 3)))
+    assert [r.url for r in requests] == ["https://example.com/?page=1", "https://example.com/?page=2"]
+
+    second = Response(requests[0].url, request=requests[0])
+    assert list(spider.fan_out_pages(second, remaining_pages(1, 3))) == []
+
+
+def test_fan_out_batches():
+    spider = BatchedSpider()
+    first = Response("https://example.com/", request=Request("https://example.com/"))
+    requests = list(spider.fan_out_pages(first, remaining_pages(0, 4)))
+    assert [r.url for r in requests] == ["https://example.com/?pages=1,2", "https://example.com/?pages=3"]
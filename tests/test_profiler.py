@@ -0,0 +1,95 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.spider import DefaultSpider
+from scrapy.utils.test import get_crawler
+
+from locations.extensions.profiler import CPROFILE, SAMPLE, TIMERS, ProfilerExtension, StackSampler, parse_profile_modes
+
+
+def test_parse_profile_modes():
+    assert parse_profile_modes("") == set()
+    assert parse_profile_modes("false") == set()
+    assert parse_profile_modes("1") == {TIMERS}
+    assert parse_profile_modes(True) == {TIMERS}
+    assert parse_profile_modes("timers, CPROFILE,sample") == {TIMERS, CPROFILE, SAMPLE}
+    try:
+        parse_profile_modes("timers,perf")
+        assert False
+    except ValueError:
+        pass
+
+
+def test_not_configured():
+    try:
+        ProfilerExtension.from_crawler(get_crawler(DefaultSpider))
+        assert False
+    except NotConfigured:
+        pass
+
+
+def test_output_path(tmp_path):
+    crawler = get_crawler(DefaultSpider, {"ATP_PROFILE": "sample", "LOGSTATS_FILE": str(tmp_path / "example.json")})
+    ext = ProfilerExtension.from_crawler(crawler)
+    assert ext.output_path(".folded") == tmp_path / "example.folded"
+
+    crawler = get_crawler(DefaultSpider, {"ATP_PROFILE": "sample", "ATP_PROFILE_DIR": str(tmp_path)})
+    crawler.spider = crawler._create_spider()
+    ext = ProfilerExtension.from_crawler(crawler)
+    assert ext.output_path(".prof") == tmp_path / "default.prof"
+
+
+def busy_wait(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_stack_sampler(tmp_path):
+    sampler = StackSampler(0.001)
+    sampler.start()
+    busy_wait(0.2)
+    sampler.stop()
+    sampler.write_folded(tmp_path / "example.folded")
+
+    lines = (tmp_path / "example.folded").read_text().splitlines()
+    assert lines
+    assert any("test_stack_sampler" in line and "busy_wait" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+class SlowMiddleware:
+    async def process_spider_output(self, response, result):
+        async for x in result:
+            busy_wait(0.05)
+            yield x
+
+
+class ExampleSpiderMiddlewareManager:
+    def __init__(self):
+        self.methods = defaultdict(deque)
+        self.methods["process_spider_output"].append(SlowMiddleware().process_spider_output)
+
+
+def test_spider_middleware_timers():
+    crawler = get_crawler(DefaultSpider, {"ATP_PROFILE": "timers"})
+    crawler.spider = crawler._create_spider()
+    ext = ProfilerExtension.from_crawler(crawler)
+    spidermw = ExampleSpiderMiddlewareManager()
+    ext.wrap_spider_middlewares(spidermw)
+
+    async def slow_callback():
+        for i in range(2):
+            busy_wait(0.1)
+            yield i
+
+    async def collect():
+        return [x async for x in spidermw.methods["process_spider_output"][0](response=None, result=slow_callback())]
+
+    assert asyncio.run(collect()) == [0, 1]
+    ext.spider_closed()
+
+    # Time spent in the callback is excluded.
+    assert 0.1 <= crawler.stats.get_value("atp/profile/spider_middleware_seconds/SlowMiddleware") < 0.2
@@ -1,6 +1,6 @@
 import array
 
-from locations.react_server_components import parse_rsc
+from locations.react_server_components import LazyRSC, parse_rsc
 
 
 def test_parse_rsc():
@@ -16,3 +16,15 @@ def test_parse_rsc():
         (1, {"x": "No preceding newline"}),
         (0, array.array("B", b"Byte array")),
     ]
+
+
+def test_lazy_rsc():
+    data_raw = b"""1:I["chunk"]
+2:{"stores":[{"id":1}]}
+1:I["replaced"]
+3:T4,text"""
+    rsc = LazyRSC(data_raw)
+    assert list(rsc) == [1, 2, 3]
+    assert rsc[2] == {"stores": [{"id": 1}]}
+    assert rsc[1] == ["replaced"]
+    assert dict(rsc) == dict(parse_rsc(data_raw))
@@ -1,7 +1,8 @@
 import json
 from pathlib import Path
 
-from ci.repair_truncated_geojson import repair_directory, repair_spider_output
+from ci import repair_truncated_geojson
+from ci.repair_truncated_geojson import needs_repair, repair_directory, repair_spider_output, worker_count
 
 FEATURE_A = {
     "type": "Feature",
@@ -152,3 +153,37 @@ def test_repair_directory_processes_every_spider(tmp_path: Path):
 
     rebuilt = json.loads((tmp_path / "broken.geojson").read_text())
     assert [f["id"] for f in rebuilt["features"]] == ["a", "b"]
+
+
+def test_only_the_last_ndgeojson_line_is_checked(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(repair_truncated_geojson, "TAIL_READ_BYTES", 16)
+    geojson_path = tmp_path / "example.geojson"
+    ndgeojson_path = tmp_path / "example.ndgeojson"
+
+    _write_complete_geojson(geojson_path, [FEATURE_A, FEATURE_B])
+    # Only a process killed mid-crawl leaves a malformed line, and only ever
+    # as the last line, so earlier lines are never read.
+    _write_ndgeojson(ndgeojson_path, ['{"type":"Feature","id":"x', json.dumps(FEATURE_A), json.dumps(FEATURE_B), ""])
+    assert not needs_repair(geojson_path, ndgeojson_path)
+
+    _write_ndgeojson(ndgeojson_path, [json.dumps(FEATURE_A), json.dumps(FEATURE_B), '{"type":"Feature","id":"c'])
+    assert needs_repair(geojson_path, ndgeojson_path)
+
+    repair_spider_output(geojson_path, ndgeojson_path)
+
+    assert ndgeojson_path.read_text() == json.dumps(FEATURE_A) + "\n" + json.dumps(FEATURE_B) + "\n"
+    assert not needs_repair(geojson_path, ndgeojson_path)
+
+
+def test_repair_directory_skips_complete_output(tmp_path: Path, monkeypatch):
+    _write_ndgeojson(tmp_path / "good.ndgeojson", [json.dumps(FEATURE_A)])
+    _write_complete_geojson(tmp_path / "good.geojson", [FEATURE_A])
+    monkeypatch.setattr(repair_truncated_geojson, "ProcessPoolExecutor", None)
+
+    repair_directory(tmp_path)
+
+
+def test_worker_count():
+    assert worker_count(64 * 1024**3, cpu_count=8) == 8
+    assert worker_count(1024**3, cpu_count=8) == 4
+    assert worker_count(128 * 1024**2, cpu_count=8) == 1
@@ -0,0 +1,114 @@
+import asyncio
+from collections import defaultdict, deque
+
+from scrapy import Request
+from scrapy.http import Response
+from scrapy.pipelines import ItemPipelineManager
+from scrapy.utils.spider import DefaultSpider
+from scrapy.utils.test import get_crawler
+
+from locations.extensions.resource_profile import CallbackProfileMiddleware, ResourceProfileExtension
+from locations.items import Feature
+
+
+class ExamplePipeline:
+    def process_item(self, item):
+        item["name"] = "Example"
+        return item
+
+
+class ExampleItemProcessor:
+    def __init__(self):
+        self.methods = defaultdict(deque)
+        self.methods["process_item"].append(ExamplePipeline().process_item)
+        self._mw_methods_requiring_spider = set()
+
+    def process_item(self, item):
+        for method in self.methods["process_item"]:
+            item = method(item)
+        return item
+
+
+def get_crawler_with_spider():
+    crawler = get_crawler(DefaultSpider)
+    crawler.spider = crawler._create_spider()
+    return crawler
+
+
+def test_pipeline_seconds_and_histograms():
+    crawler = get_crawler_with_spider()
+    ext = ResourceProfileExtension(crawler)
+    itemproc = ExampleItemProcessor()
+    ext.wrap_pipelines(itemproc)
+
+    assert itemproc.process_item(Feature())["name"] == "Example"
+    ext.response_received()
+    ext.item_scraped()
+    ext.item_scraped()
+    ext.start_time -= 120
+    ext.item_scraped()
+    ext.spider_closed()
+
+    stats = crawler.stats.get_stats()
+    assert stats["atp/profile/pipeline_seconds/ExamplePipeline"] >= 0
+    assert stats["atp/profile/items_per_minute"] == [2, 0, 1]
+    assert stats["atp/profile/responses_per_minute"] == [1]
+    assert stats["atp/profile/peak_rss_bytes"] > 0
+    assert stats["atp/profile/cpu_user_seconds"] > 0
+
+
+def test_wrap_item_pipeline_manager():
+    # Pins the internals of Scrapy's ItemPipelineManager which wrap_pipelines
+    # relies on.
+    crawler = get_crawler(DefaultSpider, {"ITEM_PIPELINES": {"tests.test_resource_profile.ExamplePipeline": 100}})
+    crawler.spider = crawler._create_spider()
+    itemproc = ItemPipelineManager.from_crawler(crawler)
+    ext = ResourceProfileExtension(crawler)
+    ext.wrap_pipelines(itemproc)
+
+    assert asyncio.run(itemproc.process_item_async(Feature()))["name"] == "Example"
+    assert ext.pipeline_seconds["ExamplePipeline"] >= 0
+
+
+def test_wrap_unexpected_item_processor():
+    crawler = get_crawler_with_spider()
+    ext = ResourceProfileExtension(crawler)
+    itemproc = ExampleItemProcessor()
+    del itemproc._mw_methods_requiring_spider
+    ext.wrap_pipelines(itemproc)
+
+    assert itemproc.process_item(Feature())["name"] == "Example"
+    assert ext.pipeline_seconds == {}
+
+
+def test_callback_seconds():
+    crawler = get_crawler_with_spider()
+    middleware = CallbackProfileMiddleware.from_crawler(crawler)
+
+    def parse_store(response):
+        yield Feature(ref="1")
+        yield Feature(ref="2")
+
+    request = Request("https://example.com/store", callback=parse_store)
+    response = Response(request.url, request=request)
+    items = list(middleware.process_spider_output(response, parse_store(response)))
+
+    assert [item["ref"] for item in items] == ["1", "2"]
+    assert crawler.stats.get_value("atp/profile/callback_seconds/parse_store") > 0
+
+
+def test_async_callback_seconds():
+    crawler = get_crawler_with_spider()
+    middleware = CallbackProfileMiddleware.from_crawler(crawler)
+
+    async def parse(response):
+        yield Feature(ref="1")
+
+    async def collect(result):
+        return [x async for x in result]
+
+    response = Response("https://example.com/", request=Request("https://example.com/"))
+    items = asyncio.run(collect(middleware.process_spider_output_async(response, parse(response))))
+
+    assert [item["ref"] for item in items] == ["1"]
+    assert crawler.stats.get_value("atp/profile/callback_seconds/parse") > 0
@@ -0,0 +1,118 @@
+import json
+import sys
+from argparse import ArgumentTypeError
+
+import pytest
+from scrapy import Spider
+
+from ci.schedule_spiders import (
+    BROWSER,
+    HTTP,
+    PROXY,
+    Job,
+    class_limit,
+    classify_spider,
+    load_runtimes,
+    predict_runtimes,
+    run,
+    simulate,
+)
+from locations.camoufox_spider import CamoufoxSpider
+from locations.settings import DEFAULT_PLAYWRIGHT_SETTINGS
+
+
+def test_load_runtimes(tmp_path):
+    (tmp_path / "_results.json").write_text(
+        json.dumps(
+            {
+                "count": 2,
+                "results": [
+                    {"spider": "slow", "elapsed_time": 3600.5},
+                    {"spider": "broken", "elapsed_time": 0},
+                ],
+            }
+        )
+    )
+    stats_dir = tmp_path / "stats"
+    stats_dir.mkdir()
+    (stats_dir / "slow.json").write_text(json.dumps({"elapsed_time_seconds": 1800}))
+    (stats_dir / "fast.json").write_text(json.dumps({"elapsed_time_seconds": 10}))
+    (stats_dir / "_insights.json").write_text(json.dumps({"elapsed_time_seconds": 99}))
+
+    runtimes = load_runtimes([str(tmp_path / "_results.json"), str(tmp_path / "missing.json")], stats_dir)
+
+    assert runtimes == {"slow": [3600.5, 1800.0], "fast": [10.0]}
+
+
+def test_classify_spider():
+    class ExampleSpider(Spider):
+        name = "example"
+
+    class ExampleProxySpider(Spider):
+        name = "example_proxy"
+        requires_proxy = "US"
+
+    class ExampleCamoufoxSpider(CamoufoxSpider):
+        name = "example_camoufox"
+        requires_proxy = True
+
+    class ExamplePlaywrightSettingsSpider(Spider):
+        name = "example_playwright"
+        custom_settings = DEFAULT_PLAYWRIGHT_SETTINGS
+
+    assert classify_spider(ExampleSpider) == HTTP
+    assert classify_spider(ExampleProxySpider) == PROXY
+    assert classify_spider(ExampleCamoufoxSpider) == BROWSER
+    assert classify_spider(ExamplePlaywrightSettingsSpider) == BROWSER
+
+
+def test_predict_runtimes():
+    spider_classes = {"a": HTTP, "b": HTTP, "c": HTTP, "new": HTTP, "new_browser": BROWSER}
+    runtimes = {"a": [10, 30, 20], "b": [100], "c": [40, 60]}
+
+    assert predict_runtimes(spider_classes, runtimes) == {"a": 20, "b": 100, "c": 50, "new": 50, "new_browser": 0.0}
+
+
+def test_simulate_longest_first():
+    jobs = [Job(str(i), HTTP, seconds, "") for i, seconds in enumerate([1, 1, 1, 1, 1, 1, 6])]
+
+    # In list order the longest job would start last, finishing at 9.
+    assert simulate(jobs, 2, {}) == 6
+
+
+def test_simulate_class_limits():
+    jobs = [Job("b{}".format(i), BROWSER, 10, "") for i in range(2)] + [
+        Job("h{}".format(i), HTTP, 5, "") for i in range(4)
+    ]
+
+    assert simulate(jobs, 3, {}) == 15
+    assert simulate(jobs, 3, {BROWSER: 1}) == 20
+
+
+def test_run(tmp_path):
+    command = '"{}" -c "import sys; open(sys.argv[1], \'a\').write(sys.argv[2])" {} {{}}'.format(
+        sys.executable, tmp_path / "order.txt"
+    )
+    jobs = [Job(spider, HTTP, seconds, command.format(spider)) for spider, seconds in [("a", 1), ("b", 3), ("c", 2)]]
+
+    report = run(jobs, 1, {})
+
+    assert (tmp_path / "order.txt").read_text() == "bca"
+    assert [job["spider"] for job in report["jobs"]] == ["b", "c", "a"]
+    assert report["predicted_makespan_seconds"] == 6
+    assert report["actual_makespan_seconds"] >= 0
+
+
+def test_limits_below_one():
+    jobs = [Job("b", BROWSER, 10, ""), Job("h", HTTP, 5, "")]
+
+    for parallelism, class_limits in [(3, {BROWSER: 0}), (0, {})]:
+        with pytest.raises(ValueError, match="must be at least 1"):
+            simulate(jobs, parallelism, class_limits)
+        with pytest.raises(ValueError, match="must be at least 1"):
+            run(jobs, parallelism, class_limits)
+
+    assert class_limit("browser=2") == (BROWSER, 2)
+    for value in ["browser=0", "browser", "browser=x"]:
+        with pytest.raises(ArgumentTypeError):
+            class_limit(value)
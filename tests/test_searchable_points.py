@@ -0,0 +1,58 @@
+import pytest
+
+from locations import searchable_points
+from locations.geo import point_locations
+from locations.searchable_points import PACKED_POINTS_MAGIC, parse_points_csv, read_packed_points, write_packed_points
+
+
+def test_packed_points(tmp_path):
+    filenames = ["us_centroids_100mile_radius_state.csv", "iseadgg/nz_centroids_iseadgg_94km_radius.csv"]
+    path = str(tmp_path / "searchable_points.bin")
+    write_packed_points(filenames, path)
+
+    for filename in filenames:
+        assert read_packed_points(filename, path) == parse_points_csv(filename)
+    assert read_packed_points("us_centroids_100mile_radius.csv", path) is None
+
+
+def test_area_points():
+    table = parse_points_csv("us_centroids_100mile_radius_state.csv")
+    assert table.area_runs is not None
+    ny_points = table.area_points(["NY"])
+    assert 0 < len(ny_points) < len(table.points)
+    assert set(table.area_points(["NY", "NJ"])) == set(ny_points) | set(table.area_points(["NJ"]))
+    assert parse_points_csv("us_centroids_100mile_radius.csv").area_runs is None
+
+
+def test_corrupt_packed_points(tmp_path):
+    filename = "us_centroids_100mile_radius_state.csv"
+    path = tmp_path / "searchable_points.bin"
+    write_packed_points([filename], str(path))
+    assert [p.name for p in tmp_path.iterdir()] == ["searchable_points.bin"]
+    data = path.read_bytes()
+
+    corrupt = {
+        # Cut at an 8 byte boundary, within the points.
+        "truncated.bin": data[:-16],
+        # Cut within a point.
+        "truncated_within_point.bin": data[:-3],
+        # Cut within the JSON index.
+        "truncated_index.bin": data[:40],
+        # Cut within the length of the JSON index.
+        "truncated_length.bin": data[: len(PACKED_POINTS_MAGIC) + 4],
+        "corrupt_index.bin": data.replace(b'"count"', b'"cOunt"', 1),
+    }
+    for name, content in corrupt.items():
+        (tmp_path / name).write_bytes(content)
+        assert read_packed_points(filename, str(tmp_path / name)) is None, name
+
+
+def test_area_field_filter_requires_areas(tmp_path, monkeypatch):
+    (tmp_path / "points.csv").write_text("latitude,longitude,country\n1.0,2.0,GB\n3.0,4.0,\n")
+    monkeypatch.setattr(searchable_points, "get_searchable_points_path", lambda filename: str(tmp_path / filename))
+
+    table = parse_points_csv("points.csv")
+    assert table.area_points(["GB"]) == [(1.0, 2.0)]
+    assert list(point_locations("points.csv")) == [(1.0, 2.0), (3.0, 4.0)]
+    with pytest.raises(Exception, match="does not support area field filters"):
+        list(point_locations("points.csv", "GB"))
@@ -0,0 +1,23 @@
+import re
+
+from locations.commands.sitemap import MySitemapSpider, SitemapPatternMatcher, required_literal
+
+
+def test_required_literal():
+    assert required_literal(r"/stores/[-\w]+$") == "/stores/"
+    assert required_literal(r"/\w\w/[^/]+/[^/]+(?<!-sc)\.html") == ".html"
+    assert required_literal(r"[0-9]+$") == ""
+    assert required_literal(r"/(?:us|ca)/\w\w/[^/]+/[^/]+$") == "/"
+
+
+def test_matcher_agrees_with_re_search():
+    matcher = SitemapPatternMatcher(MySitemapSpider.common_sitemap_patterns)
+    for url in [
+        "https://stores.example.com/ny/new-york/123-main-st.html",
+        "https://www.example.co.uk/stores/123-high-street",
+        "https://locations.example.com/us/ca/los-angeles/1",
+        "https://example.com/de/filialen/berlin",
+        "https://example.com/ab/foo/bar-sc.html",
+        "https://example.com/",
+    ]:
+        assert matcher.matches(url) == [p for p in MySitemapSpider.common_sitemap_patterns if re.search(p, url)]
@@ -0,0 +1,33 @@
+import json
+
+from scrapy.http import Request, TextResponse
+
+from locations.vector_file_spider import VectorFileSpider
+
+
+class ExampleVectorFileSpider(VectorFileSpider):
+    name = "example_vector_file"
+    start_urls = ["https://example.com/points.geojson"]
+    batch_size = 2
+
+
+def test_parse_across_batches():
+    features = [
+        {
+            "type": "Feature",
+            "properties": {"name": "Site {}".format(i), "street_address": "{} Example Street".format(i)},
+            "geometry": {"type": "Point", "coordinates": [150.0 + i, -33.0]},
+        }
+        for i in range(5)
+    ]
+    response = TextResponse(
+        url=ExampleVectorFileSpider.start_urls[0],
+        body=json.dumps({"type": "FeatureCollection", "features": features}).encode(),
+        request=Request(ExampleVectorFileSpider.start_urls[0]),
+    )
+    items = list(ExampleVectorFileSpider().parse(response))
+
+    assert [item["ref"] for item in items] == ["0", "1", "2", "3", "4"]
+    assert [item["name"] for item in items] == ["Site {}".format(i) for i in range(5)]
+    assert items[4]["street_address"] == "4 Example Street"
+    assert list(items[4]["geometry"]["coordinates"]) == [154, -33]